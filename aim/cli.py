@@ -0,0 +1,52 @@
+""" aim command line """
+
+import argparse
+import logging
+
+from aim.news.database import NEWS_DB_PATH
+from aim.news.dedupe import DEDUPE_INDEX_PATH, NearDuplicateIndex
+from aim.news.export import CHUNK_SIZE, EXPORT_PATH, export_parquet
+from aim.news.related import RELATED_INDEX_DIR, RelatedIndex
+
+
+def export(args: argparse.Namespace) -> None:
+    export_parquet(args.db, args.out, args.chunk_size)
+
+
+def dedupe_index(args: argparse.Namespace) -> None:
+    index = NearDuplicateIndex.load(args.index)
+    index.update_from_db(args.db)
+    index.save(args.index)
+
+
+def related_index(args: argparse.Namespace) -> None:
+    RelatedIndex(args.index).update_from_db(args.db, changed=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="aim")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export news.db to Parquet partitioned by year and outlet")
+    export_parser.add_argument("--db", default=NEWS_DB_PATH)
+    export_parser.add_argument("--out", default=EXPORT_PATH)
+    export_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows read from the database at a time")
+    export_parser.set_defaults(func=export)
+
+    dedupe_parser = commands.add_parser("dedupe-index", help="Add stories archived since the last run to the near-duplicate index")
+    dedupe_parser.add_argument("--db", default=NEWS_DB_PATH)
+    dedupe_parser.add_argument("--index", default=DEDUPE_INDEX_PATH)
+    dedupe_parser.set_defaults(func=dedupe_index)
+
+    related_parser = commands.add_parser("related-index", help="Add stories archived or changed since the last run to the related stories index")
+    related_parser.add_argument("--db", default=NEWS_DB_PATH)
+    related_parser.add_argument("--index", default=RELATED_INDEX_DIR)
+    related_parser.set_defaults(func=related_index)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Optional, Dict, List, Any
+from typing import Dict, List, Any
 import os
 import asyncio
 import uvloop
@@ -9,6 +9,7 @@ from datetime import datetime
 
 from aim.news import BEScraper, JEPScraper
 from aim.news.models import NewsStory, Advert, TopImage
+from aim.news.text import first_sentence
 from aim.weather.gov_je import GovJeWeather
 from aim.family_notices import FamilyNotices
 
@@ -48,10 +49,5 @@ class Email:
         """Render the email template with the current data."""
         return self.template.render(asdict(data))
 
-    @staticmethod
-    def first_sentence(text: Optional[str]) -> str:
-        """Extract the first sentence from a string, for passing to Jinja"""
-        if not text:
-            return ""
-        first = text.split(".")[0]
-        return first + "." if first and not first.endswith(".") else first
\ No newline at end of file
+    # shared with the backend's story summaries, so a summary matches what the template shows
+    first_sentence = staticmethod(first_sentence)
\ No newline at end of file
@@ -1 +1,2 @@
-from aim.family_notices.family_notices import FamilyNotices
\ No newline at end of file
+from aim.family_notices.family_notices import FamilyNotices
+from aim.family_notices.index import NoticeIndex
\ No newline at end of file
@@ -2,13 +2,20 @@ import aiohttp
 import aiolimiter
 import asyncio
 from bs4 import BeautifulSoup
+from bs4.element import Tag
 from datetime import datetime, timedelta
 from dataclasses import dataclass
+import logging
 import re
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from aim.news.models import FamilyNotice
 
+if TYPE_CHECKING:
+    from aim.family_notices.index import NoticeIndex
+
+logger = logging.getLogger(__name__)
+
 HEADERS = {
     "Accept": "application/json, text/plain, */*",
     "Accept-Language": "en-US,en;q=0.9",
@@ -25,12 +32,55 @@ HEADERS = {
 }
 
 BASE_URL = "https://familynotices.jerseyeveningpost.com/wp-admin/admin-ajax.php"
+POSTS_PER_PAGE = 40
+MAX_PAGES = 50 # per date range, the busiest day has never needed more than a handful
+SYNC_TIMEOUT = 10 # seconds a build waits on the site before serving what is already indexed
+SYNC_MAX_AGE = 15 * 60 # seconds before a build re-fetches the latest synced day
+CATEGORY = "in-sympathy"
+FUNERAL_DIRECTORS = {
+    "Pitcher & Le Quesne": "Pitcher & Le Quesne Funeral Directors",
+    "Maillards": "Maillards Funeral Directors",
+    "De Gruchy's Funeral": "De Gruchy's Funeral Care",
+}
+MONTHS = "January|February|March|April|May|June|July|August|September|October|November|December"
+SERVICE_DATE_RE = re.compile(
+    rf"(?:(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday),?\s+)?"
+    rf"\d{{1,2}}(?:st|nd|rd|th)?\s+(?:{MONTHS})(?:,?\s+\d{{4}})?"
+    rf"(?:,?\s+at\s+\d{{1,2}}(?:[.:]\d{{2}})?\s*(?:am|pm|noon))?",
+    re.IGNORECASE
+)
+VENUE_RE = re.compile(
+    r"\b(?:at|in)\s+((?:the\s+)?[A-Z][\w'.&-]*(?:\s+[\w'.&-]+){0,6}?\s+"
+    r"(?:Church|Chapel|Crematorium|Cemetery|Methodist|Tabernacle|Hall))\b"
+)
+FUNERAL_DIRECTOR_RE = re.compile(r"\b([A-Z][\w'&.]*(?:\s+[A-Z&][\w'&.]*){0,4}\s+Funeral\s+(?:Directors|Care|Services))")
+
+@dataclass
+class NoticeDetails:
+    """Details extracted from a notice's own page."""
+    funeral_director: str = ''
+    service_date: str = ''
+    venue: str = ''
+
+    @property
+    def additional_text(self) -> str:
+        if self.venue and self.service_date:
+            return f"Service at {self.venue} on {self.service_date}"
+        if self.venue:
+            return f"Service at {self.venue}"
+        if self.service_date:
+            return f"Service on {self.service_date}"
+        return ''
 
 # Asynchronous Scraper Class
 class FamilyNotices:
-    def __init__(self):
+    def __init__(self, page_window: int = 2, index: Optional["NoticeIndex"] = None):
         self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None))
         self.limiter = aiolimiter.AsyncLimiter(100, 1)
+        self.page_window = page_window
+        self.index = index
+        # notice url -> details, persisted in the index when there is one
+        self.details_cache: dict[str, NoticeDetails] = {}
 
     async def fetch(self, url, params):
         """Fetch data with provided parameters."""
@@ -39,28 +89,138 @@ class FamilyNotices:
                 response.raise_for_status()
                 return await response.json()
 
+    async def fetch_html(self, url: str) -> str:
+        """Fetch a notice page."""
+        async with self.limiter:
+            async with self.session.get(url, headers={"User-Agent": HEADERS["User-Agent"]}) as response:
+                response.raise_for_status()
+                return await response.text()
+
     async def close(self):
         await self.session.close()
         
-    async def get_notices(self, start_date: datetime = None, end_date: datetime = None) -> list[FamilyNotice]:
-        """Fetch notices for a given date range (YYYY-MM-DD format)."""
+    async def get_notices(self, start_date: datetime = None, end_date: datetime = None, chunk_days: int = 1, enrich: bool = False) -> list[FamilyNotice]:
+        """Get notices for a given date range (YYYY-MM-DD format), from the local index if one is configured."""
         # default to today if not provided
         end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        if isinstance(end_date, datetime):
+            end_date = end_date.strftime("%Y-%m-%d")
         start_date = start_date or (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
         if isinstance(start_date, datetime):
             start_date = start_date.strftime("%Y-%m-%d")
-        if isinstance(end_date, datetime):
-            end_date = end_date.strftime("%Y-%m-%d")
-        # php request params
-        params = {
+        if self.index is not None:
+            # the scheduled sync (python -m aim.family_notices.index) keeps the index current, a build only
+            # tops it up and never waits long on, or fails because of, the notices site
+            try:
+                await asyncio.wait_for(self.index.sync(self, start_date, end_date, max_age=SYNC_MAX_AGE), SYNC_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Family notices sync failed, serving indexed notices: {e!r}")
+            notices = self.index.query(start_date, end_date)
+        else:
+            notices = await self.fetch_notices(start_date, end_date, chunk_days)
+        # the same person often has notices on several days, newest notice kept
+        notices = self.dedupe_names(notices)
+        if enrich:
+            notices = await self.enrich(notices)
+        return notices
+
+    async def enrich(self, notices: list[FamilyNotice]) -> list[FamilyNotice]:
+        """Fill funeral director and service details from each notice's page, fetching only uncached notices."""
+        urls = [n.url for n in notices]
+        details = {url: self.details_cache[url] for url in urls if url in self.details_cache}
+        if self.index is not None:
+            details.update(self.index.get_details([url for url in urls if url not in details]))
+        missing = list(dict.fromkeys(url for url in urls if url not in details))
+        responses = await asyncio.gather(*(self.fetch_html(url) for url in missing), return_exceptions=True)
+        fetched = {}
+        for url, response in zip(missing, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"Failed to fetch notice {url}: {response}")
+                continue
+            fetched[url] = self.parse_details(BeautifulSoup(response, "html.parser"))
+        if fetched and self.index is not None:
+            self.index.put_details(fetched)
+        details.update(fetched)
+        self.details_cache.update(details)
+        for notice in notices:
+            notice_details = details.get(notice.url)
+            if notice_details is None:
+                continue
+            notice.funeral_director = notice_details.funeral_director or notice.funeral_director
+            notice.additional_text = notice.additional_text or notice_details.additional_text
+        return notices
+
+    def parse_details(self, soup: BeautifulSoup) -> NoticeDetails:
+        """Extract the funeral director, service date and venue from a notice page."""
+        content = soup.find("div", class_="entry-content") or soup.find("article") or soup
+        text = " ".join(content.get_text(" ").split())
+        details = NoticeDetails()
+        for key, funeral_director in FUNERAL_DIRECTORS.items():
+            if key in text:
+                details.funeral_director = funeral_director
+                break
+        else:
+            match = FUNERAL_DIRECTOR_RE.search(text)
+            if match:
+                details.funeral_director = match.group(1)
+        match = SERVICE_DATE_RE.search(text)
+        if match:
+            details.service_date = match.group(0)
+        match = VENUE_RE.search(text)
+        if match:
+            details.venue = match.group(1)
+        return details
+
+    async def fetch_notices(self, start_date: str, end_date: str, chunk_days: int = 1) -> list[FamilyNotice]:
+        """
+        Fetch notices from the site, split into chunks of chunk_days fetched concurrently.
+        A name is kept once per chunk, so a notice on an earlier day is still returned for the index.
+        """
+        chunks = self.date_chunks(start_date, end_date, chunk_days)
+        # fetch every chunk concurrently, newest first to match the site ordering
+        results = await asyncio.gather(*(self.fetch_chunk(start, end) for start, end in chunks))
+        # return parsed notices, single day chunks give each notice its date
+        notices = []
+        for (start, end), cards in zip(chunks, results):
+            notice_date = start if start == end else ''
+            notices.extend(self.parse_cards(cards, notice_date=notice_date))
+        return notices
+
+    @staticmethod
+    def dedupe_names(notices: list[FamilyNotice]) -> list[FamilyNotice]:
+        """Keep the first notice for each name."""
+        seen = set()
+        unique = []
+        for notice in notices:
+            if notice.name in seen:
+                continue
+            seen.add(notice.name)
+            unique.append(notice)
+        return unique
+
+    @staticmethod
+    def date_chunks(start_date: str, end_date: str, chunk_days: int) -> list[tuple[str, str]]:
+        """Split an inclusive date range into (start, end) chunks of chunk_days, newest first."""
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        chunks = []
+        while end >= start:
+            chunk_start = max(start, end - timedelta(days=chunk_days - 1))
+            chunks.append((chunk_start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")))
+            end = chunk_start - timedelta(days=1)
+        return chunks
+
+    def make_params(self, start_date: str, end_date: str, page: int) -> dict:
+        """Build the ajax load more request params for one page of a date range."""
+        return {
             "action": "alm_get_posts",
             "query_type": "standard",
             "id": "alm_search",
             "post_id": "0",
             "slug": "home",
             "canonical_url": "https://familynotices.jerseyeveningpost.com/",
-            "posts_per_page": "40",
-            "page": "0",
+            "posts_per_page": str(POSTS_PER_PAGE),
+            "page": str(page),
             "offset": "0",
             "post_type": "notice",
             "repeater": "default",
@@ -71,26 +231,54 @@ class FamilyNotices:
             "facets": "false",
             "theme_repeater": "notice-card.php",
             "taxonomy": "notice-category",
-            "taxonomy_terms": "in-sympathy",
+            "taxonomy_terms": CATEGORY,
             "taxonomy_operator": "IN",
             "taxonomy_include_children": "true",
             "day": f"{start_date} to {end_date}",
             "order": "DESC",
             "orderby": "date",
         }
-        # fetch data
-        response_data = await self.fetch(BASE_URL, params)
-        # parse html response
-        soup = BeautifulSoup(response_data["html"], "html.parser")
-        # return parsed notices
-        notices = self.parse_notices(soup)
-        return notices
-    
+
+    async def fetch_page(self, start_date: str, end_date: str, page: int) -> list[Tag]:
+        """Fetch one page of notice cards for a date range."""
+        response_data = await self.fetch(BASE_URL, self.make_params(start_date, end_date, page))
+        soup = BeautifulSoup(response_data.get("html") or "", "html.parser")
+        return soup.find_all("div", class_="notice-card")
+
+    async def fetch_chunk(self, start_date: str, end_date: str) -> list[Tag]:
+        """
+        Fetch pages for a date range concurrently, page_window at a time, until a page comes back short.
+        Stops at MAX_PAGES, or when a page repeats the one before it, in case the site ignores or clamps page.
+        """
+        cards = []
+        previous = None
+        page = 0
+        while page < MAX_PAGES:
+            pages = await asyncio.gather(*(
+                self.fetch_page(start_date, end_date, p) for p in range(page, min(page + self.page_window, MAX_PAGES))
+            ))
+            for page_cards in pages:
+                notice_ids = [card.find('a').get('href') for card in page_cards]
+                if notice_ids == previous:
+                    logger.warning(f"Page repeated for {start_date} to {end_date}, stopping at {len(cards)} notices")
+                    return cards
+                previous = notice_ids
+                cards.extend(page_cards)
+                if len(page_cards) < POSTS_PER_PAGE:
+                    return cards
+            page += self.page_window
+        logger.warning(f"Stopped after {MAX_PAGES} pages for {start_date} to {end_date}")
+        return cards
+
     def parse_notices(self, soup: BeautifulSoup) -> list[FamilyNotice]:
         """Parse notices from the BeautifulSoup object."""
+        return self.parse_cards(soup.find_all("div", class_="notice-card"))
+
+    def parse_cards(self, cards: list[Tag], seen: Optional[set] = None, notice_date: str = '') -> list[FamilyNotice]:
+        """Parse notice cards, skipping names already seen."""
         notices = []
-        seen = set()
-        for notice in soup.find_all("div", class_="notice-card"):
+        seen = set() if seen is None else seen
+        for notice in cards:
             name = notice.find('h3').text
             if name in seen:
                 continue
@@ -99,13 +287,19 @@ class FamilyNotices:
             # get funeral director
             text = notice.text
             funeral_director = ''
-            if 'Pitcher & Le Quesne' in text:
-                funeral_director = 'Pitcher & Le Quesne Funeral Directors'
-            elif 'Maillards' in text and 'maillard' not in name.lower():
-                funeral_director = 'Maillards Funeral Directors'
-            elif "De Gruchy's Funeral" in text and 'de gruchy' not in name.lower():
-                funeral_director = "De Gruchy's Funeral Care"
-            notices.append(FamilyNotice(name=name, url=url, funeral_director=funeral_director))
+            for key, director in FUNERAL_DIRECTORS.items():
+                # the firms are family names, a card for a Maillard or a De Gruchy isn't necessarily theirs
+                family = key.split("'")[0].removesuffix("s").lower()
+                if key in text and family not in name.lower():
+                    funeral_director = director
+                    break
+            notices.append(FamilyNotice(
+                name=name,
+                url=url,
+                funeral_director=funeral_director,
+                notice_date=notice_date,
+                category=CATEGORY
+            ))
         return notices
     
 
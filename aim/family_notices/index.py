@@ -0,0 +1,177 @@
+""" Local SQLite index of family notices with incremental sync """
+
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional
+
+from aim.news.models import FamilyNotice
+from aim.family_notices.family_notices import FamilyNotices, NoticeDetails
+
+logger = logging.getLogger(__name__)
+
+NOTICES_DB_PATH = os.path.join(os.getcwd(), "family_notices.db")
+
+
+class NoticeIndex:
+    """
+    Family notices stored by url with an index on notice date.
+
+    The synced range is tracked as a low and high watermark, only days outside it are fetched from the site.
+    The high watermark day is re-fetched as notices may still be added to it, unless synced within max_age.
+    """
+
+    def __init__(self, db_path: str = NOTICES_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.create_tables()
+
+    def create_tables(self) -> None:
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS notices (
+                    url TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    funeral_director TEXT,
+                    additional_text TEXT,
+                    notice_date TEXT NOT NULL,
+                    category TEXT
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_notices_date ON notices (notice_date)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS notice_details (
+                    url TEXT PRIMARY KEY,
+                    funeral_director TEXT,
+                    service_date TEXT,
+                    venue TEXT
+                )
+            ''')
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_state(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO sync_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (key, value)
+            )
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """Latest synced day."""
+        return self.get_state("synced_to")
+
+    def upsert(self, notices: list[FamilyNotice]) -> int:
+        """Insert or update notices by url."""
+        rows = [
+            (n.url, n.name, n.funeral_director, n.additional_text, n.notice_date, n.category)
+            for n in notices if n.notice_date
+        ]
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO notices (url, name, funeral_director, additional_text, notice_date, category)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    name = excluded.name,
+                    funeral_director = excluded.funeral_director,
+                    notice_date = excluded.notice_date,
+                    category = excluded.category
+            ''', rows)
+        return len(rows)
+
+    def get_details(self, urls: list[str]) -> dict[str, NoticeDetails]:
+        """Get cached notice page details by url."""
+        if not urls:
+            return {}
+        placeholders = ",".join("?" * len(urls))
+        rows = self.conn.execute(
+            f'SELECT url, funeral_director, service_date, venue FROM notice_details WHERE url IN ({placeholders})', urls
+        ).fetchall()
+        return {url: NoticeDetails(funeral_director, service_date, venue) for url, funeral_director, service_date, venue in rows}
+
+    def put_details(self, details: dict[str, NoticeDetails]) -> None:
+        """Cache notice page details by url."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO notice_details (url, funeral_director, service_date, venue) VALUES (?, ?, ?, ?)',
+                [(url, d.funeral_director, d.service_date, d.venue) for url, d in details.items()]
+            )
+
+    def query(self, start_date: str, end_date: str) -> list[FamilyNotice]:
+        """Get notices between two dates inclusive (YYYY-MM-DD), newest first."""
+        rows = self.conn.execute('''
+            SELECT name, url, funeral_director, additional_text, notice_date, category
+            FROM notices
+            WHERE notice_date BETWEEN ? AND ?
+            ORDER BY notice_date DESC, rowid
+        ''', (start_date, end_date)).fetchall()
+        return [
+            FamilyNotice(
+                name=name,
+                url=url,
+                funeral_director=funeral_director,
+                additional_text=additional_text,
+                notice_date=notice_date,
+                category=category
+            )
+            for name, url, funeral_director, additional_text, notice_date, category in rows
+        ]
+
+    async def sync(self, scraper: FamilyNotices, start_date: str, end_date: Optional[str] = None, max_age: float = 0) -> int:
+        """Fetch the days between start_date and end_date that are not already in the index."""
+        end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        synced_from, synced_to = self.get_state("synced_from"), self.get_state("synced_to")
+        synced_at = self.get_state("synced_at")
+        fresh = synced_at is not None and (datetime.now() - datetime.fromisoformat(synced_at)).total_seconds() < max_age
+        ranges = []
+        if synced_from is None:
+            ranges.append((start_date, end_date))
+        else:
+            if start_date < synced_from:
+                day_before = (datetime.strptime(synced_from, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+                ranges.append((start_date, day_before))
+            if end_date > synced_to or (end_date == synced_to and not fresh):
+                ranges.append((synced_to, end_date))
+        if not ranges:
+            return 0
+        # chunk by day so every notice gets its date
+        results = await asyncio.gather(*(scraper.fetch_notices(start, end, chunk_days=1) for start, end in ranges))
+        count = sum(self.upsert(notices) for notices in results)
+        self.set_state("synced_from", min(start_date, synced_from or start_date))
+        self.set_state("synced_to", max(end_date, synced_to or end_date))
+        if end_date >= (synced_to or end_date):
+            self.set_state("synced_at", datetime.now().isoformat(timespec="seconds"))
+        logger.info(f"Synced {count} family notices for {ranges}")
+        return count
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Sync recent family notices into the local index.")
+    parser.add_argument("--days", type=int, default=7, help="Days to backfill if the index is empty")
+    parser.add_argument("--db", default=NOTICES_DB_PATH)
+    args = parser.parse_args()
+
+    async def main():
+        index = NoticeIndex(args.db)
+        scraper = FamilyNotices(index=index)
+        start = index.watermark or (datetime.now() - timedelta(days=args.days)).strftime("%Y-%m-%d")
+        await index.sync(scraper, start)
+        # pay the notice page cost here rather than during an email build
+        await scraper.enrich(index.query(start, datetime.now().strftime("%Y-%m-%d")))
+        await scraper.close()
+        index.close()
+
+    asyncio.run(main())
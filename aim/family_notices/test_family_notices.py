@@ -0,0 +1,186 @@
+import aiohttp
+import pytest
+from bs4 import BeautifulSoup
+
+from aim.family_notices.family_notices import FamilyNotices, MAX_PAGES, POSTS_PER_PAGE
+from aim.family_notices.index import NoticeIndex
+from aim.news.models import FamilyNotice
+
+def notice_cards(day: str, page: int, count: int) -> str:
+    return "".join(
+        f'<div class="notice-card"><a href="https://familynotices.jerseyeveningpost.com/notice/{day}-{page}-{i}/">'
+        f'<h3>Person{i}, {day} {page}</h3></a><p>Maillards</p></div>'
+        for i in range(count)
+    )
+
+class FakeFamilyNotices(FamilyNotices):
+    """Serves notices from memory, 2025-06-02 has one and a half pages of notices, other days one notice."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    async def fetch(self, url, params):
+        start, end = params["day"].split(" to ")
+        page = int(params["page"])
+        self.requests.append((start, end, page))
+        if start == "2025-06-02":
+            count = [POSTS_PER_PAGE, POSTS_PER_PAGE // 2][page] if page < 2 else 0
+        else:
+            count = 1 if page == 0 else 0
+        html = notice_cards(start, page, count)
+        # same person appears again on the following day
+        if start == "2025-06-01":
+            html += notice_cards("2025-06-02", 0, 1)
+        return {"html": html}
+
+def test_date_chunks():
+    assert FamilyNotices.date_chunks("2025-06-01", "2025-06-10", 7) == [
+        ("2025-06-04", "2025-06-10"),
+        ("2025-06-01", "2025-06-03"),
+    ]
+
+@pytest.mark.asyncio
+async def test_get_notices_paginates_and_dedupes():
+    scraper = FakeFamilyNotices()
+    notices = await scraper.get_notices("2025-06-01", "2025-06-03")
+    await scraper.close()
+    # 1 + 60 + 1, the repeat from 2025-06-01 is dropped
+    assert len(notices) == 2 + POSTS_PER_PAGE + POSTS_PER_PAGE // 2
+    assert len({n.name for n in notices}) == len(notices)
+    assert notices[0].url.endswith("2025-06-03-0-0/")
+    assert notices[0].funeral_director == "Maillards Funeral Directors"
+    assert ("2025-06-02", "2025-06-02", 1) in scraper.requests
+
+@pytest.mark.asyncio
+async def test_notice_index_incremental_sync(tmp_path):
+    index = NoticeIndex(str(tmp_path / "notices.db"))
+    scraper = FakeFamilyNotices()
+    scraper.index = index
+
+    notices = await scraper.get_notices("2025-06-02", "2025-06-03")
+    assert len(notices) == 1 + POSTS_PER_PAGE + POSTS_PER_PAGE // 2
+    assert {n.notice_date for n in notices} == {"2025-06-02", "2025-06-03"}
+    assert index.watermark == "2025-06-03"
+
+    # only the watermark day and the new day are fetched
+    scraper.requests.clear()
+    await scraper.get_notices("2025-06-03", "2025-06-04")
+    assert {start for start, _, _ in scraper.requests} == {"2025-06-03", "2025-06-04"}
+
+    # already synced, served entirely from the index
+    scraper.requests.clear()
+    notices = await scraper.get_notices("2025-06-02", "2025-06-02")
+    assert scraper.requests == []
+    assert len(notices) == POSTS_PER_PAGE + POSTS_PER_PAGE // 2
+    await scraper.close()
+    index.close()
+
+NOTICE_PAGE = """
+<html><body><nav>Maillards</nav><div class="entry-content">
+<p>Passed away peacefully at home. The funeral service will take place at St Brelade's Parish Church on
+Friday 13th June at 11.30am, followed by interment. Enquiries to Le Sueur Funeral Services.</p>
+</div></body></html>
+"""
+
+class FakeNoticePages(FakeFamilyNotices):
+
+    async def fetch_html(self, url):
+        self.requests.append(url)
+        return NOTICE_PAGE
+
+@pytest.mark.asyncio
+async def test_enrich_notices_cached_by_url(tmp_path):
+    index = NoticeIndex(str(tmp_path / "notices.db"))
+    scraper = FakeNoticePages()
+    scraper.index = index
+    notices = await scraper.get_notices("2025-06-03", "2025-06-03", enrich=True)
+    assert notices[0].funeral_director == "Le Sueur Funeral Services"
+    assert notices[0].additional_text == "Service at St Brelade's Parish Church on Friday 13th June at 11.30am"
+    await scraper.close()
+
+    # a new scraper picks the details up from the index without fetching the page
+    scraper = FakeNoticePages()
+    scraper.index = index
+    notices = await scraper.get_notices("2025-06-03", "2025-06-03", enrich=True)
+    assert not [r for r in scraper.requests if isinstance(r, str)]
+    assert notices[0].funeral_director == "Le Sueur Funeral Services"
+    await scraper.close()
+    index.close()
+
+class RepeatNameNotices(FamilyNotices):
+    """The same person has a notice with its own url on each day."""
+
+    async def fetch(self, url, params):
+        start, _ = params["day"].split(" to ")
+        if params["page"] != "0":
+            return {"html": ""}
+        return {"html": f'<div class="notice-card"><a href="https://x/{start}/"><h3>Jane Doe</h3></a></div>'}
+
+@pytest.mark.asyncio
+async def test_index_results_dedupe_names(tmp_path):
+    direct = RepeatNameNotices()
+    direct_notices = await direct.get_notices("2025-06-01", "2025-06-02")
+    await direct.close()
+
+    index = NoticeIndex(str(tmp_path / "notices.db"))
+    indexed = RepeatNameNotices(index=index)
+    notices = await indexed.get_notices("2025-06-01", "2025-06-02")
+    await indexed.close()
+    # both days are stored, the dedupe only applies to what a build gets back
+    assert len(index.query("2025-06-01", "2025-06-02")) == 2
+    index.close()
+    assert [n.url for n in notices] == [n.url for n in direct_notices] == ["https://x/2025-06-02/"]
+
+class ClampedPageNotices(FamilyNotices):
+    """Ignores page and serves the same full page for every request, or a fresh full page when endless."""
+
+    def __init__(self, endless: bool = False):
+        super().__init__()
+        self.endless = endless
+        self.pages = []
+
+    async def fetch(self, url, params):
+        page = int(params["page"]) if self.endless else 0
+        self.pages.append(int(params["page"]))
+        return {"html": notice_cards("2025-06-01", page, POSTS_PER_PAGE)}
+
+@pytest.mark.asyncio
+async def test_fetch_chunk_stops_on_repeated_page():
+    scraper = ClampedPageNotices()
+    cards = await scraper.fetch_chunk("2025-06-01", "2025-06-01")
+    await scraper.close()
+    assert len(cards) == POSTS_PER_PAGE
+    assert max(scraper.pages) < 2 * scraper.page_window
+
+@pytest.mark.asyncio
+async def test_fetch_chunk_stops_at_max_pages():
+    scraper = ClampedPageNotices(endless=True)
+    cards = await scraper.fetch_chunk("2025-06-01", "2025-06-01")
+    await scraper.close()
+    assert len(cards) == MAX_PAGES * POSTS_PER_PAGE
+    assert sorted(scraper.pages) == list(range(MAX_PAGES))
+
+class DownNotices(FamilyNotices):
+
+    async def fetch(self, url, params):
+        raise aiohttp.ClientConnectionError("notices site is down")
+
+@pytest.mark.asyncio
+async def test_index_serves_notices_when_site_down(tmp_path):
+    index = NoticeIndex(str(tmp_path / "notices.db"))
+    index.upsert([FamilyNotice(name="Jane Doe", url="https://x/1/", funeral_director="", notice_date="2025-06-01", category="in-sympathy")])
+    scraper = DownNotices(index=index)
+    notices = await scraper.get_notices("2025-06-01", "2025-06-02")
+    await scraper.close()
+    index.close()
+    assert [n.url for n in notices] == ["https://x/1/"]
+
+@pytest.mark.asyncio
+async def test_parse_cards_funeral_directors():
+    cards = [("John Maillard", "Maillards"), ("Ann Smith", "Maillards"), ("Bob De Gruchy", "De Gruchy's Funeral"), ("Di Roe", "Pitcher & Le Quesne")]
+    html = "".join(f'<div class="notice-card"><a href="https://x/{i}/"><h3>{name}</h3></a>{text}</div>' for i, (name, text) in enumerate(cards))
+    scraper = FamilyNotices()
+    notices = scraper.parse_cards(BeautifulSoup(html, "html.parser").find_all("div"))
+    await scraper.close()
+    assert [n.funeral_director for n in notices] == ["", "Maillards Funeral Directors", "", "Pitcher & Le Quesne Funeral Directors"]
@@ -9,6 +9,7 @@ from streamlit.components.v1 import html
 
 from aim.news.jep_scraper import JEPScraper
 from aim.news.models import NewsStory, Foreword, ForewordAuthor
+from aim.news.serialize import stories_to_dataframe
 from aim.emailer.base import EmailBuilder
 
 logger = logging.getLogger(__name__)
@@ -64,24 +65,6 @@ class AIMPremiumEmailData:
 if EMAIL_DATA_KEY not in st.session_state:
     st.session_state[EMAIL_DATA_KEY] = AIMPremiumEmailData()
 
-def stories_to_dataframe(stories: list[NewsStory]) -> pd.DataFrame:
-    """Convert stories to editable dataframe"""
-    if not stories:
-        # Create empty dataframe with NewsStory fields
-        columns = [field.name for field in fields(NewsStory)]
-        return pd.DataFrame(columns=columns)
-    
-    # Convert stories to list of dictionaries using dataclass fields
-    data = []
-    for story in stories:
-        story_dict = {field.name: getattr(story, field.name) for field in fields(story)}
-        data.append(story_dict)
-    
-    df = pd.DataFrame(data)
-    if 'order' in df.columns:
-        df = df.sort_values('order')
-    return df
-
 def df_to_stories(df: pd.DataFrame) -> list[NewsStory]:
     """Convert dataframe back to stories"""
     stories = []
@@ -1,9 +1,12 @@
 import os
 import logging
+from typing import Iterator
 
 import streamlit as st
 from openai import OpenAI
 
+from aim.nlp.llm_cache import create_chat_completion, stream_chat_completion
+
 logger = logging.getLogger(__name__)
 
 TITLE = "AutoArticle (Alpha)"
@@ -49,17 +52,20 @@ if st.session_state['logged_in'] is False:
 
 else:
 
-    def generate_article(article_notes: str, n_words: int) -> str:
+    def generate_article(article_notes: str, n_words: int) -> Iterator[str]:
+        """
+        Stream the article as it is generated.
+        """
         client = OpenAI(api_key=OPENAI_KEY)
         user_prompt = f'write a {n_words} word news article on the following notes: {article_notes}'
-        response = client.chat.completions.create(
+        return stream_chat_completion(
+            client,
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt},
             ],
             model=MODEL
         )
-        return response.choices[0].message.content
     
     def format_article(article: str):
         """
@@ -74,7 +80,8 @@ else:
     def change_article_length(article: str, type: str) -> str:
         if type == "shorter":
             client = OpenAI(api_key=OPENAI_KEY)
-            response = client.chat.completions.create(
+            response = create_chat_completion(
+                client,
                 messages=[
                     {"role": "user", "content": f"Make the following article slightly shorter: {article}"},
                 ],
@@ -83,7 +90,8 @@ else:
             return response.choices[0].message.content
         elif type == "longer":
             client = OpenAI(api_key=OPENAI_KEY)
-            response = client.chat.completions.create(
+            response = create_chat_completion(
+                client,
                 messages=[
                     {"role": "user", "content": f"Make the following article slightly longer: {article}"},
                 ],
@@ -104,10 +112,14 @@ else:
 
     # Button to generate article
     if st.button("Generate Article"):
-        with st.spinner("Generating Article..."):
-            article = generate_article(article_notes, n_words)
-            formatted_article = format_article(article)
-            st.session_state['article'] = formatted_article
+        # render the article as it streams in, the editable box below takes over once it is complete
+        placeholder = st.empty()
+        article = ""
+        for delta in generate_article(article_notes, n_words):
+            article += delta
+            placeholder.markdown(format_article(article))
+        placeholder.empty()
+        st.session_state['article'] = format_article(article)
     
     # Editable text box for article
     article_text = st.text_area("Article", value=st.session_state.get('article', ""))
@@ -9,9 +9,10 @@ import pandas as pd
 from streamlit.components.v1 import html
 
 from aim.news.bailiwick_express_scraper import BEScraper
-from aim.weather.gov_je import GovJeWeather
-from aim.family_notices import FamilyNotices
+from aim.weather.providers import HedgedWeather
+from aim.family_notices import FamilyNotices, NoticeIndex
 from aim.news.models import NewsStory, FamilyNotice, TopImage, Advert
+from aim.news.serialize import stories_to_dataframe
 from aim.emailer.base import EmailBuilder
 
 logger = logging.getLogger(__name__)
@@ -82,23 +83,6 @@ class BEEmailData:
 if EMAIL_DATA_KEY not in st.session_state:
     st.session_state[EMAIL_DATA_KEY] = BEEmailData()
 
-def stories_to_dataframe(stories: list[NewsStory]) -> pd.DataFrame:
-    data = []
-    for s in stories:
-        data.append({
-            "order": s.order,
-            "headline": s.headline,
-            "text": s.text,
-            "author": s.author,
-            "date": s.date,
-            "url": s.url,
-            "image_url": s.image_url,
-        })
-    df =  pd.DataFrame(data)
-    if 'order' in df.columns:
-        df.sort_values('order', inplace=True)
-    return df
-
 def df_to_stories(df: pd.DataFrame) -> list[NewsStory]:
     stories = []
     
@@ -390,8 +374,8 @@ async def get_email_data(
 ) -> BEEmailData:
     """Fetch all data for email asynchronously"""
     news_scraper = BEScraper()
-    weather_scraper = GovJeWeather()
-    deaths_scraper = FamilyNotices()
+    weather_scraper = HedgedWeather.jersey()
+    deaths_scraper = FamilyNotices(index=NoticeIndex())
 
     tasks = {
         "news_stories": news_scraper.get_n_stories_for_region("jsy", num_news),
@@ -401,11 +385,12 @@ async def get_email_data(
         "podcast_stories": news_scraper.get_n_stories_for_region("jsy_podcasts", num_podcast),
         # "connect_cover_image": news_scraper.get_jsy_connect_cover(),
         "weather": weather_scraper.get_to_email(),
-        "family_notices": deaths_scraper.get_notices(deaths_start, deaths_end)
+        "family_notices": deaths_scraper.get_notices(deaths_start, deaths_end, enrich=True)
     }
     values = await asyncio.gather(*tasks.values())
     results = dict(zip(tasks.keys(), values))
-    await asyncio.gather(news_scraper.close(), deaths_scraper.close())
+    await asyncio.gather(news_scraper.close(), deaths_scraper.close(), weather_scraper.close())
+    deaths_scraper.index.close()
 
     params = {}
     for k,v in results.items():
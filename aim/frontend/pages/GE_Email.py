@@ -9,9 +9,10 @@ import pandas as pd
 from streamlit.components.v1 import html
 
 from aim.news.bailiwick_express_scraper import BEScraper
-from aim.weather.gov_ge import GovGeWeather
+from aim.weather.providers import HedgedWeather
 from aim.family_notices import FamilyNotices
 from aim.news.models import NewsStory, FamilyNotice, TopImage, Advert
+from aim.news.serialize import stories_to_dataframe
 from aim.emailer.base import EmailBuilder
 
 logger = logging.getLogger(__name__)
@@ -81,23 +82,6 @@ class GEEmailData:
 if EMAIL_DATA_KEY not in st.session_state:
     st.session_state[EMAIL_DATA_KEY] = GEEmailData()
 
-def stories_to_dataframe(stories: list[NewsStory]) -> pd.DataFrame:
-    data = []
-    for s in stories:
-        data.append({
-            "order": s.order,
-            "headline": s.headline,
-            "text": s.text,
-            "author": s.author,
-            "date": s.date,
-            "url": s.url,
-            "image_url": s.image_url,
-        })
-    df =  pd.DataFrame(data)
-    if 'order' in df.columns:
-        df.sort_values('order', inplace=True)
-    return df
-
 def df_to_stories(df: pd.DataFrame) -> list[NewsStory]:
     stories = []
     if 'order' not in df.columns:
@@ -169,7 +153,7 @@ async def get_email_data(
 ) -> GEEmailData:
     """Fetch all data for email asynchronously"""
     news_scraper = BEScraper()
-    weather_scraper = GovGeWeather()
+    weather_scraper = HedgedWeather.guernsey()
 
     tasks = {
         "news_stories": news_scraper.get_n_stories_for_region("gsy", num_news),
@@ -182,7 +166,7 @@ async def get_email_data(
     }
     values = await asyncio.gather(*tasks.values())
     results = dict(zip(tasks.keys(), values))
-    await news_scraper.close()
+    await asyncio.gather(news_scraper.close(), weather_scraper.close())
 
     params = {}
     for k,v in results.items():
@@ -11,6 +11,7 @@ from streamlit.components.v1 import html
 from aim.news.jep_scraper import JEPScraper
 from aim.emailer.base import EmailBuilder
 from aim.news.models import NewsStory, Advert
+from aim.news.serialize import stories_to_dataframe
 from aim.emailer.base import EmailBuilder
 
 logger = logging.getLogger(__name__)
@@ -74,23 +75,6 @@ class JEPEmailData:
 if EMAIL_DATA_KEY not in st.session_state:
     st.session_state[EMAIL_DATA_KEY] = JEPEmailData()
 
-def stories_to_dataframe(stories: list[NewsStory]) -> pd.DataFrame:
-    data = []
-    for s in stories:
-        data.append({
-            "order": s.order,
-            "headline": s.headline,
-            "text": s.text,
-            "author": s.author,
-            "date": s.date,
-            "url": s.url,
-            "image_url": s.image_url,
-        })
-    df =  pd.DataFrame(data)
-    if 'order' in df.columns:
-        df.sort_values('order', inplace=True)
-    return df
-
 def df_to_stories(df: pd.DataFrame) -> list[NewsStory]:
     stories = []
     if 'order' not in df.columns:
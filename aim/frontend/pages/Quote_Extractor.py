@@ -1,24 +1,18 @@
 import os
+import asyncio
 import logging
 import json
 import requests
 
 import streamlit as st
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from aim.nlp.quotes import Quote, extract_quotes
 
 logger = logging.getLogger(__name__)
 
 TITLE = "Quote Extractor"
 
-SYSTEM_PROMPT = (
-    "You are a text analysis assistant. "
-    "Extract the most important and key quotes from the provided text. "
-    "Do not include any additional commentary, do not invent anything, only use exact quotes from the text."
-    "Respond on plain text format separated by new lines. "
-)
-
-MODEL = "gpt-4.1-mini"
-
 # ---------------------------
 # Load Secrets
 # ---------------------------
@@ -48,23 +42,17 @@ if not OPENAI_KEY:
 if "logged_in" not in st.session_state:
     st.session_state["logged_in"] = False
 
-if "openai_client" not in st.session_state:
-    st.session_state["openai_client"] = OpenAI(api_key=OPENAI_KEY)
-
 # ---------------------------
 # Helpers
 # ---------------------------
-def make_request(client: OpenAI, text: str) -> list:
+def render_quotes(placeholder, quotes: list[Quote]) -> None:
+    placeholder.markdown("\n".join(f"{i}. {q.text}" for i, q in enumerate(quotes, 1)))
+
+async def make_request(text: str, placeholder) -> list[Quote]:
+    # long documents are split into chunks sent concurrently, quotes are rendered as they stream in
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": text}
-            ]
-        )
-        content = response.choices[0].message.content
-        return content.split("\n") if content else []
+        async with AsyncOpenAI(api_key=OPENAI_KEY) as client:
+            return await extract_quotes(client, text, on_update=lambda quotes: render_quotes(placeholder, quotes))
     except Exception as e:
         logger.error("Error making request to OpenAI: %s", e)
         raise
@@ -95,12 +83,11 @@ if st.button("Extract Key Quotes"):
     if not text_block.strip():
         st.warning("Please paste some text to extract quotes.")
     else:
-        with st.spinner("Extracting quotes..."):
-            try:
-                client = st.session_state["openai_client"]
-                quotes = make_request(client, text_block)
-                st.subheader("Key Quotes")
-                for i, q in enumerate(quotes, 1):
-                    st.write(f"{i}. {q}")
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
+        st.subheader("Key Quotes")
+        placeholder = st.empty()
+        try:
+            with st.spinner("Extracting quotes..."):
+                quotes = asyncio.run(make_request(text_block, placeholder))
+            render_quotes(placeholder, quotes)
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
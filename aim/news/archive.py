@@ -0,0 +1,121 @@
+""" Write-behind archive of scraped stories into news.db """
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from aim.news.models import NewsStory
+from aim.news.database import NEWS_DB_PATH, UPSERT_SQL, connect, story_row
+from aim.news.dedupe import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveWriter:
+    """
+    Scrapers push stories onto a queue and return immediately, a single writer task drains it
+    in batches and upserts each batch into the news database in one transaction off the event loop.
+
+    The queue and writer task are created on the first push, so the writer belongs to whichever loop is running then.
+    Stories are dropped with a warning if the queue is full rather than slowing down scraping.
+    Written stories are also added to index, on the event loop so queries never see it half updated.
+    """
+
+    def __init__(
+            self,
+            db_path: str = NEWS_DB_PATH,
+            batch_size: int = 500,
+            flush_interval: float = 1.0,
+            maxsize: int = 10_000,
+            index: Optional[NearDuplicateIndex] = None
+        ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self.index = index
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def push(self, stories: Iterable[NewsStory], region: Optional[str] = None) -> None:
+        """
+        Queue stories for archiving, never blocks.
+        """
+        if self.task is None:
+            self.queue = asyncio.Queue(self.maxsize)
+            self.task = asyncio.create_task(self._run())
+        for story in stories:
+            if not isinstance(story, NewsStory):
+                continue
+            try:
+                self.queue.put_nowait((story, region))
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning(f"Archive queue full, dropped {story.url}")
+
+    async def _next_batch(self) -> list[tuple[NewsStory, Optional[str]]]:
+        """
+        Wait for a story, then keep collecting until the batch is full or flush_interval has passed.
+        """
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except TimeoutError:
+                break
+        return batch
+
+    def write(self, batch: list[tuple[NewsStory, Optional[str]]]) -> None:
+        scraped_at = datetime.now().isoformat(timespec="seconds")
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany(UPSERT_SQL, [story_row(story, region, scraped_at) for story, region in batch])
+        finally:
+            conn.close()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await asyncio.to_thread(self.write, batch)
+                self.written += len(batch)
+                if self.index is not None:
+                    self.index.add_stories(story for story, _ in batch)
+                logger.debug(f"Archived {len(batch)} stories to '{self.db_path}'")
+            except Exception as e:
+                logger.error(f"Failed to archive {len(batch)} stories: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def flush(self) -> None:
+        """
+        Wait until every queued story has been written.
+        """
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self) -> None:
+        """
+        Flush and stop the writer task.
+        """
+        if self.task is None:
+            return
+        await self.flush()
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.queue = self.task = None
@@ -3,6 +3,7 @@
 import logging
 import asyncio
 import re
+from typing import Optional
 from tenacity import retry, wait_random_exponential, stop_never, before_sleep_log
 
 from bs4 import BeautifulSoup
@@ -12,6 +13,7 @@ from selenium_driverless.types.by import By
 from urllib.parse import urljoin
 
 from aim.news.models import NewsStory
+from aim.news.archive import ArchiveWriter
 from aim.news.base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -36,8 +38,8 @@ class BEScraper(BaseScraper):
     JSY_CONNECT_COVER = "https://app.bailiwickexpress.com/t/storefront/storefront"
     GSY_CONNECT_COVER = "https://www.bailiwickexpress.com/gsy-connect/"
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, archive: Optional[ArchiveWriter] = None):
+        super().__init__(archive=archive)
     
     async def get_podcast_stories(self, n_stories_per_region: int) -> tuple[list[NewsStory], list[NewsStory]]:
         """Get first n stories for each region for daily news podcast"""
@@ -51,8 +53,8 @@ class BEScraper(BaseScraper):
         gsy_links = self.get_story_urls_from_page(gsy_soup)[:n_stories_per_region]
         # fetch and parse stories concurrently
         jsy_stories, gsy_stories = await asyncio.gather(
-            self.fetch_and_parse_stories(jsy_links),
-            self.fetch_and_parse_stories(gsy_links)
+            self.fetch_and_parse_stories(jsy_links, 'jsy'),
+            self.fetch_and_parse_stories(gsy_links, 'gsy')
         )
         return jsy_stories, gsy_stories
 
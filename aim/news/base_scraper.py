@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Union
+from typing import Optional, Union
 from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
 import time
 
@@ -13,6 +13,7 @@ import aiolimiter
 from bs4 import BeautifulSoup
 
 from aim.news.models import NewsStory
+from aim.news.archive import ArchiveWriter
 from aim import HEADERS
 
 logger = logging.getLogger(__name__)
@@ -23,11 +24,12 @@ class BaseScraper(ABC):
     # placeholder for urls for each region, will be overwritten by subclass
     URLS = {}
 
-    def __init__(self, requests_per_period: int = 100, period_seconds: int = 1): # default 100 requests per second
+    def __init__(self, requests_per_period: int = 100, period_seconds: int = 1, archive: Optional[ArchiveWriter] = None): # default 100 requests per second
         self.requests_per_period = requests_per_period
         self.period_seconds = period_seconds
         self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None))
         self.limiter = aiolimiter.AsyncLimiter(self.requests_per_period, self.period_seconds) if self.requests_per_period and self.period_seconds else nullcontext()
+        self.archive = archive # scraped stories are pushed here to be written to news.db in the background
 
     @staticmethod
     def soupify(html: str) -> BeautifulSoup:
@@ -111,7 +113,7 @@ class BaseScraper(ABC):
         soup = await self.fetch(url)
         return self.parse_story(url, soup)
 
-    async def fetch_and_parse_stories(self, links: list[str]) -> list[BeautifulSoup]:
+    async def fetch_and_parse_stories(self, links: list[str], region: Optional[str] = None) -> list[BeautifulSoup]:
         """
         Fetch and soupify all news stories from the given list of links.
         """
@@ -122,11 +124,13 @@ class BaseScraper(ABC):
                 soup = self.soupify(response)
                 story = self.parse_story(link, soup)
                 stories.append(story)
+        if self.archive is not None:
+            self.archive.push(stories, region)
         return stories
 
     async def get_n_stories_for_region(self, region: str, n: int) -> list[NewsStory]:
         """Get the first n stories for the given region"""
         soup = await self.get_home_page_soup(region)
         links = self.get_story_urls_from_page(soup)[:n]
-        stories = await self.fetch_and_parse_stories(links)
+        stories = await self.fetch_and_parse_stories(links, region)
         return stories
\ No newline at end of file
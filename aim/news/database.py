@@ -1,55 +1,271 @@
+""" SQLite archive of scraped news stories """
+
+import os
 import sqlite3
 import logging
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
 
-from typing import List, Literal
 from aim.news.models import NewsStory
 
 logger = logging.getLogger(__name__)
 
+NEWS_DB_PATH = os.path.join(os.getcwd(), "news.db")
+SCHEMA_VERSION = 1
+BATCH_SIZE = 5000 # stories per transaction
+
+# formats seen in story <time> tags, normalised to YYYY-MM-DD for the date index
+DATE_FORMATS = ("%Y-%m-%d", "%d %B %Y", "%A %d %B %Y", "%B %d, %Y", "%d/%m/%Y", "%d %b %Y")
+
+STORY_FIELDS = "headline, text, date, author, url, image_url"
+
+UPSERT_SQL = '''
+    INSERT INTO news_stories (url, headline, text, date, author, image_url, published, region, outlet, scraped_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        headline = excluded.headline,
+        text = excluded.text,
+        date = excluded.date,
+        author = excluded.author,
+        image_url = COALESCE(excluded.image_url, news_stories.image_url),
+        published = COALESCE(excluded.published, news_stories.published),
+        region = COALESCE(excluded.region, news_stories.region),
+        outlet = excluded.outlet,
+        scraped_at = excluded.scraped_at
+    WHERE news_stories.headline IS NOT excluded.headline
+        OR news_stories.text IS NOT excluded.text
+        OR news_stories.author IS NOT excluded.author
+        OR news_stories.image_url IS NULL
+        OR news_stories.region IS NULL
+'''
+
+
+def parse_story_date(date: str) -> Optional[str]:
+    """
+    Normalise a scraped story date to YYYY-MM-DD, None if the format is unknown.
+    """
+    date = (date or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def story_row(story: NewsStory, region: Optional[str], scraped_at: str) -> tuple:
+    """
+    Row for UPSERT_SQL, the outlet is the story's domain.
+    """
+    return (
+        story.url,
+        story.headline,
+        story.text,
+        story.date,
+        story.author,
+        story.image_url,
+        parse_story_date(story.date),
+        region,
+        urlsplit(story.url).netloc.removeprefix("www."),
+        scraped_at,
+    )
+
+
+def _create_v1(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE news_stories (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            headline TEXT,
+            text TEXT,
+            date TEXT,
+            author TEXT,
+            image_url TEXT,
+            published TEXT,
+            region TEXT,
+            outlet TEXT,
+            scraped_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_news_stories_published ON news_stories (published)')
+    conn.execute('CREATE INDEX idx_news_stories_region_published ON news_stories (region, published)')
+    # external content table, kept in sync by triggers so text is only stored once
+    conn.execute('''
+        CREATE VIRTUAL TABLE news_stories_fts USING fts5(
+            headline, text, content='news_stories', content_rowid='id'
+        )
+    ''')
+    # executescript would commit the migration transaction, so one statement at a time
+    conn.execute('''
+        CREATE TRIGGER news_stories_ai AFTER INSERT ON news_stories BEGIN
+            INSERT INTO news_stories_fts (rowid, headline, text) VALUES (new.id, new.headline, new.text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER news_stories_ad AFTER DELETE ON news_stories BEGIN
+            INSERT INTO news_stories_fts (news_stories_fts, rowid, headline, text) VALUES ('delete', old.id, old.headline, old.text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER news_stories_au AFTER UPDATE OF headline, text ON news_stories BEGIN
+            INSERT INTO news_stories_fts (news_stories_fts, rowid, headline, text) VALUES ('delete', old.id, old.headline, old.text);
+            INSERT INTO news_stories_fts (rowid, headline, text) VALUES (new.id, new.headline, new.text);
+        END
+    ''')
+
+
+def migrate_v1(conn: sqlite3.Connection) -> None:
+    """
+    Unique urls, image/region/outlet columns, indexes and full text search.
+    Stories from the unversioned table are copied across, the latest row wins for duplicate urls.
+    """
+    legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_stories'").fetchone()
+    if legacy:
+        conn.execute('ALTER TABLE news_stories RENAME TO news_stories_v0')
+    _create_v1(conn)
+    if legacy:
+        scraped_at = datetime.now().isoformat(timespec="seconds")
+        rows = conn.execute('''
+            SELECT headline, text, date, author, url FROM news_stories_v0
+            WHERE url IS NOT NULL ORDER BY id
+        ''')
+        stories = (
+            NewsStory(headline=h or "", text=t or "", date=d or "", author=a or "", url=u, image_url=None)
+            for h, t, d, a, u in rows
+        )
+        conn.executemany(UPSERT_SQL, (story_row(s, None, scraped_at) for s in stories))
+        conn.execute('DROP TABLE news_stories_v0')
+
+
+# schema version -> migration from the previous version
+MIGRATIONS = {
+    1: migrate_v1,
+}
+
+
+def connect(db_name: str) -> sqlite3.Connection:
+    """
+    Open the news database in WAL mode, migrating the schema to SCHEMA_VERSION if needed.
+    """
+    conn = sqlite3.connect(db_name)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < SCHEMA_VERSION:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # re-read inside the write lock in case another process migrated first
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                MIGRATIONS[target](conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                logger.info(f"Migrated '{db_name}' to schema version {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.close()
+            raise
+    return conn
+
+
 def create_news_database(db_name: str):
     """
-    Create a SQLite database with a table for news stories.
+    Create the news database or migrate an existing one, existing stories are kept.
     """
     try:
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        cursor.execute('DROP TABLE IF EXISTS news_stories')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS news_stories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                headline TEXT,
-                text TEXT,
-                date TEXT,
-                author TEXT,
-                url TEXT
-            )
-        ''')
-        conn.commit()
-        logger.info(f"Database '{db_name}' created with table 'news_stories'.")
+        conn = connect(db_name)
+        conn.close()
+        logger.info(f"Database '{db_name}' ready at schema version {SCHEMA_VERSION}.")
     except sqlite3.Error as e:
         logger.error(f"Failed to create database '{db_name}': {e}")
-    finally:
-        conn.close()
 
-def insert_news_stories(db_name: str, stories: List[NewsStory]):
+
+def insert_news_stories(db_name: str, stories: Iterable[NewsStory], region: Optional[str] = None) -> int:
     """
-    Insert a list of NewsStory objects into the database.
+    Upsert NewsStory objects by url, BATCH_SIZE stories per transaction.
+    Returns the number of stories written.
     """
+    scraped_at = datetime.now().isoformat(timespec="seconds")
+    stories = (story for story in stories if isinstance(story, NewsStory))
+    count = 0
     try:
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        # Prepare data to insert
-        data = [(story.headline, story.date, story.author, story.text, story.url) for story in stories if isinstance(story, NewsStory)]
-        # Insert data
-        cursor.executemany('''
-            INSERT INTO news_stories (headline, date, author, text, url)
-            VALUES (?, ?, ?, ?, ?)
-        ''', data)
-        conn.commit()
-        logger.info(f"Inserted {len(data)} news stories into '{db_name}'.")
+        conn = connect(db_name)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open database '{db_name}': {e}")
+        return 0
+    try:
+        while batch := list(islice(stories, BATCH_SIZE)):
+            with conn:
+                conn.executemany(UPSERT_SQL, [story_row(story, region, scraped_at) for story in batch])
+            count += len(batch)
+        logger.info(f"Upserted {count} news stories into '{db_name}'.")
     except sqlite3.Error as e:
         logger.error(f"Failed to insert stories into database '{db_name}': {e}")
     finally:
         conn.close()
+    return count
+
 
+def _to_stories(rows: list[tuple]) -> List[NewsStory]:
+    return [
+        NewsStory(headline=headline, text=text, date=date, author=author, url=url, image_url=image_url)
+        for headline, text, date, author, url, image_url in rows
+    ]
+
+
+def get_stories_by_url(db_name: str, urls: List[str]) -> List[NewsStory]:
+    """
+    Stories for the given urls in the same order, urls not in the archive are skipped.
+    """
+    if not urls:
+        return []
+    conn = connect(db_name)
+    try:
+        rows = conn.execute(
+            f'SELECT {STORY_FIELDS} FROM news_stories WHERE url IN ({",".join("?" * len(urls))})', urls
+        ).fetchall()
+    finally:
+        conn.close()
+    stories = {story.url: story for story in _to_stories(rows)}
+    return [stories[url] for url in urls if url in stories]
 
+
+def get_stories_between(db_name: str, start_date: str, end_date: str, region: Optional[str] = None) -> List[NewsStory]:
+    """
+    Stories published between two dates inclusive (YYYY-MM-DD), newest first.
+    """
+    sql = f'SELECT {STORY_FIELDS} FROM news_stories WHERE published BETWEEN ? AND ?'
+    params = [start_date, end_date]
+    if region:
+        sql += ' AND region = ?'
+        params.append(region)
+    conn = connect(db_name)
+    try:
+        return _to_stories(conn.execute(sql + ' ORDER BY published DESC, id DESC', params).fetchall())
+    finally:
+        conn.close()
+
+
+def search_news_stories(db_name: str, query: str, limit: int = 20, region: Optional[str] = None) -> List[NewsStory]:
+    """
+    Full text search over headlines and text, best matches first.
+    query uses FTS5 syntax, e.g. 'harbour AND "states assembly"'.
+    """
+    sql = f'''
+        SELECT {', '.join('s.' + f.strip() for f in STORY_FIELDS.split(','))}
+        FROM news_stories_fts f JOIN news_stories s ON s.id = f.rowid
+        WHERE news_stories_fts MATCH ?
+    '''
+    params = [query]
+    if region:
+        sql += ' AND s.region = ?'
+        params.append(region)
+    sql += ' ORDER BY bm25(news_stories_fts) LIMIT ?'
+    params.append(limit)
+    conn = connect(db_name)
+    try:
+        return _to_stories(conn.execute(sql, params).fetchall())
+    finally:
+        conn.close()
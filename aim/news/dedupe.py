@@ -0,0 +1,262 @@
+""" Near-duplicate detection for story text with MinHash LSH """
+
+import os
+import re
+import zlib
+import logging
+from collections import defaultdict
+from typing import Iterable, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from aim.news.models import NewsStory
+from aim.news.database import NEWS_DB_PATH, connect
+
+if TYPE_CHECKING:
+    # only drop_near_duplicates takes dataframes, the scrapers and emailer import this module without pandas
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_INDEX_PATH = os.path.join(os.getcwd(), "news_minhash.npz")
+
+WORD_RE = re.compile(r"\w+")
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+SHINGLE_BASE = np.uint64(1_000_003)
+EMPTY = np.iinfo(np.uint32).max # signature value for text without words
+
+
+class MinHasher:
+    """
+    MinHash signatures of word shingles.
+
+    Words are hashed with crc32, shingles combine k consecutive word hashes polynomially,
+    and each of num_perm universal hashes (a * x + b) mod p is minimised over the shingles.
+    a is kept below 2**31 so a * x + b never overflows uint64 for 32 bit shingle hashes.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        32 bit hashes of the distinct word shingles in text, case and punctuation are ignored.
+        """
+        words = np.fromiter(
+            (zlib.crc32(w.encode()) for w in WORD_RE.findall(text.lower())), dtype=np.uint64
+        )
+        if len(words) == 0:
+            return words
+        k = min(self.shingle_size, len(words))
+        n = len(words) - k + 1
+        hashes = np.zeros(n, dtype=np.uint64)
+        for i in range(k):
+            hashes = hashes * SHINGLE_BASE + words[i:i + n]
+        return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self.shingles(text)
+        if len(shingles) == 0:
+            return np.full(self.num_perm, EMPTY, dtype=np.uint32)
+        hashes = (np.outer(shingles, self.a) + self.b) % MERSENNE_PRIME
+        return (hashes.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of MinHash signatures keyed by story url.
+
+    Signatures are split into bands, stories sharing any band bucket are candidates and are
+    kept if their estimated Jaccard similarity is at least threshold.
+    32 bands of 4 rows puts the 50% detection point near a similarity of 0.42, so pairs at the default
+    threshold of 0.8 are found with probability above 0.9999.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 5, threshold: float = 0.8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+        self.keys: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.buffer = np.empty((1024, num_perm), dtype=np.uint32) # grown by doubling, rows past len(self) are unused
+        self.buckets: list[dict[bytes, list[int]]] = [defaultdict(list) for _ in range(bands)]
+        self.last_id = 0 # highest news.db id indexed
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.positions
+
+    @property
+    def signatures(self) -> np.ndarray:
+        return self.buffer[:len(self.keys)]
+
+    def band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, self.rows)]
+
+    def add_signatures(self, keys: list[str], signatures: np.ndarray) -> None:
+        new = [(k, s) for k, s in zip(keys, signatures) if k not in self.positions]
+        if not new:
+            return
+        start, end = len(self.keys), len(self.keys) + len(new)
+        if end > len(self.buffer):
+            buffer = np.empty((max(end, 2 * len(self.buffer)), self.buffer.shape[1]), dtype=np.uint32)
+            buffer[:start] = self.buffer[:start]
+            self.buffer = buffer
+        self.buffer[start:end] = [signature for _, signature in new]
+        for position, (key, signature) in enumerate(new, start):
+            self.keys.append(key)
+            self.positions[key] = position
+            # empty texts are kept by key but never match anything
+            if (signature == EMPTY).all():
+                continue
+            for band, bucket in zip(self.buckets, self.band_keys(signature)):
+                band[bucket].append(position)
+
+    def add(self, key: str, text: str) -> None:
+        """
+        Index text under key, keys already in the index are ignored.
+        """
+        self.add_signatures([key], [self.hasher.signature(text)])
+
+    def add_stories(self, stories: Iterable[NewsStory]) -> None:
+        stories = [s for s in stories if s.url not in self.positions]
+        self.add_signatures([s.url for s in stories], [self.hasher.signature(s.text) for s in stories])
+
+    def candidates(self, signature: np.ndarray) -> np.ndarray:
+        """
+        Positions of indexed signatures sharing at least one band with signature, the only ones a query compares.
+        """
+        if (signature == EMPTY).all():
+            return np.empty(0, dtype=np.int64)
+        candidates = set()
+        for band, bucket in zip(self.buckets, self.band_keys(signature)):
+            candidates.update(band.get(bucket, ()))
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+
+    def query_signature(self, signature: np.ndarray, threshold: Optional[float] = None, exclude: Optional[str] = None) -> list[tuple[str, float]]:
+        threshold = self.threshold if threshold is None else threshold
+        candidates = self.candidates(signature)
+        if len(candidates) == 0:
+            return []
+        similarity = (self.signatures[candidates] == signature).mean(axis=1)
+        keep = similarity >= threshold
+        matches = [(self.keys[i], float(s)) for i, s in zip(candidates[keep], similarity[keep]) if self.keys[i] != exclude]
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def query(self, text: str, threshold: Optional[float] = None) -> list[tuple[str, float]]:
+        """
+        Indexed keys whose text is a near duplicate of text, with estimated Jaccard similarity, most similar first.
+        """
+        return self.query_signature(self.hasher.signature(text), threshold)
+
+    def query_story(self, story: NewsStory, threshold: Optional[float] = None) -> list[tuple[str, float]]:
+        """
+        Near duplicates of a story, excluding the story itself.
+        """
+        if story.url in self.positions:
+            signature = self.signatures[self.positions[story.url]]
+        else:
+            signature = self.hasher.signature(story.text)
+        return self.query_signature(signature, threshold, exclude=story.url)
+
+    def update_from_db(self, db_path: str = NEWS_DB_PATH, chunk_size: int = 10_000) -> int:
+        """
+        Index stories added to the archive since the last update.
+        """
+        conn = connect(db_path)
+        count = 0
+        try:
+            while rows := conn.execute(
+                'SELECT id, url, text FROM news_stories WHERE id > ? ORDER BY id LIMIT ?', (self.last_id, chunk_size)
+            ).fetchall():
+                self.add_signatures([url for _, url, _ in rows], [self.hasher.signature(text or "") for _, _, text in rows])
+                self.last_id = rows[-1][0]
+                count += len(rows)
+        finally:
+            conn.close()
+        logger.info(f"Indexed {count} new stories from '{db_path}'")
+        return count
+
+    def save(self, path: str = DEDUPE_INDEX_PATH) -> None:
+        np.savez(
+            path,
+            keys=np.array(self.keys, dtype=object),
+            signatures=self.signatures,
+            params=np.array([self.hasher.num_perm, self.bands, self.hasher.shingle_size, self.seed, self.last_id]),
+            threshold=self.threshold,
+        )
+
+    @classmethod
+    def load(cls, path: str = DEDUPE_INDEX_PATH) -> "NearDuplicateIndex":
+        """
+        Load a saved index, or an empty one if none has been saved yet. Buckets are rebuilt from the signatures.
+        """
+        if not os.path.exists(path):
+            return cls()
+        data = np.load(path, allow_pickle=True)
+        num_perm, bands, shingle_size, seed, last_id = (int(v) for v in data["params"])
+        index = cls(num_perm, bands, shingle_size, float(data["threshold"]), seed)
+        index.add_signatures(list(data["keys"]), data["signatures"])
+        index.last_id = last_id
+        return index
+
+
+def dedupe_stories(stories: list[NewsStory], index: Optional[NearDuplicateIndex] = None, limit: Optional[int] = None) -> list[NewsStory]:
+    """
+    Drop stories that repeat an earlier story in the list, by url or near-identical text.
+    With limit, stop once limit stories are kept, later stories are not added to the index.
+    """
+    index = NearDuplicateIndex() if index is None else index
+    kept = []
+    for story in stories:
+        if limit is not None and len(kept) >= limit:
+            break
+        signature = index.hasher.signature(story.text)
+        if story.url in index or index.query_signature(signature):
+            logger.info(f"Dropping near duplicate story {story.url}")
+            continue
+        index.add_signatures([story.url], [signature])
+        kept.append(story)
+    return kept
+
+
+def dedupe_sections(sections: dict[str, list[NewsStory]], sizes: Optional[dict[str, int]] = None) -> dict[str, list[NewsStory]]:
+    """
+    Dedupe email sections in order, a story is kept only in the first section it appears in.
+    With sizes, each section keeps at most its size, stories fetched beyond it backfill the duplicates dropped,
+    and a section left short is logged.
+    """
+    index = NearDuplicateIndex()
+    deduped = {}
+    for name, stories in sections.items():
+        size = sizes.get(name) if sizes is not None else None
+        deduped[name] = dedupe_stories(stories, index, size)
+        if size is not None and len(deduped[name]) < size:
+            logger.warning(f"Section {name} has {len(deduped[name])} of {size} stories after dropping duplicates")
+    return deduped
+
+
+def drop_near_duplicates(stories: "pd.DataFrame", column: str = "text", threshold: float = 0.8) -> "pd.DataFrame":
+    """
+    Keep the first of each group of near-duplicate rows of a stories dataframe.
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    keep = np.ones(len(stories), dtype=bool)
+    for i, text in enumerate(stories[column].fillna("")):
+        signature = index.hasher.signature(text)
+        if index.query_signature(signature):
+            keep[i] = False
+        else:
+            index.add_signatures([str(i)], [signature])
+    logger.info(f"Dropped {(~keep).sum()} near duplicate stories of {len(stories)}")
+    return stories[keep]
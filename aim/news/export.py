@@ -0,0 +1,89 @@
+""" Export the news archive to Parquet partitioned by year and outlet """
+
+import os
+import logging
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from aim.news.database import NEWS_DB_PATH, connect
+from aim.nlp.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+EXPORT_PATH = os.path.join(os.getcwd(), "news_parquet")
+TOKEN_MODEL = "gpt-4o-mini"
+CHUNK_SIZE = 10_000
+
+COLUMNS = ("id", "url", "headline", "text", "date", "author", "image_url", "published", "region", "outlet", "scraped_at")
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("url", pa.string()),
+    ("headline", pa.string()),
+    ("text", pa.string()),
+    ("date", pa.string()),
+    ("author", pa.string()),
+    ("image_url", pa.string()),
+    ("published", pa.string()),
+    ("region", pa.string()),
+    ("outlet", pa.string()),
+    ("scraped_at", pa.string()),
+    ("n_words", pa.int32()),
+    ("n_tokens", pa.int32()),
+    ("year", pa.int16()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("outlet", pa.string())]), flavor="hive")
+
+
+def full_article(headline: str, text: str) -> str:
+    """
+    Headline and text in the format the notes prompts are sent, token counts are taken over this.
+    """
+    return f"<headline>{(headline or '').strip()}</headline>\n<text>{(text or '').strip()}</text>"
+
+
+def iter_batches(db_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Stream the archive in id order, chunk_size rows at a time, with word and token counts added.
+    """
+    conn = connect(db_path)
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM news_stories WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, chunk_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            columns = dict(zip(COLUMNS, zip(*rows)))
+            articles = [full_article(h, t) for h, t in zip(columns["headline"], columns["text"])]
+            columns["n_words"] = [len((text or "").split()) for text in columns["text"]]
+            columns["n_tokens"] = count_tokens(articles, TOKEN_MODEL)
+            # fall back to the scrape date for stories with an unparsed published date
+            columns["year"] = [int((p or s)[:4]) for p, s in zip(columns["published"], columns["scraped_at"])]
+            columns["outlet"] = [outlet or "unknown" for outlet in columns["outlet"]]
+            yield pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+    finally:
+        conn.close()
+
+
+def export_parquet(db_path: str = NEWS_DB_PATH, out_dir: str = EXPORT_PATH, chunk_size: int = CHUNK_SIZE) -> None:
+    """
+    Write the archive to out_dir as year=YYYY/outlet=domain Parquet partitions.
+    Partitions present in the archive are replaced, so re-running the export is idempotent.
+    """
+    ds.write_dataset(
+        iter_batches(db_path, chunk_size),
+        out_dir,
+        schema=SCHEMA,
+        format="parquet",
+        partitioning=PARTITIONING,
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+    logger.info(f"Exported '{db_path}' to '{out_dir}'")
@@ -3,6 +3,7 @@
 
 import logging
 from enum import Enum
+from typing import Optional
 
 from bs4 import BeautifulSoup
 from selenium_driverless import webdriver
@@ -12,6 +13,7 @@ from urllib.parse import urljoin
 
 
 from aim.news.models import NewsStory
+from aim.news.archive import ArchiveWriter
 from aim.news.base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -33,8 +35,8 @@ class JEPScraper(BaseScraper):
         Homelife = "https://app.jerseyeveningpost.com/t/storefront/homelife"
         More = "https://app.jerseyeveningpost.com/t/storefront/more_supplements"
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, archive: Optional[ArchiveWriter] = None):
+        super().__init__(archive=archive)
     
     def get_story_urls_from_page(self, soup: BeautifulSoup) -> list[str]:
         """
@@ -1,4 +1,5 @@
 """ Dataclasses for AIM objects """
+import hashlib
 import re
 from dataclasses import dataclass, field
 from enum import Enum
@@ -64,6 +65,8 @@ class FamilyNotice:
     url: str
     funeral_director: str
     additional_text: str = ''
+    notice_date: str = ''
+    category: str = ''
 
     def __post_init__(self):
         self.name = self.format_name(self.name)
@@ -111,7 +114,7 @@ class Advert:
 class AdvertSection:
     adverts: list[Advert]
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class NewsStory:
     """
     Dataclass to hold news story information.
@@ -124,6 +127,11 @@ class NewsStory:
     image_url: str
     order: int = field(default=0)
 
+    @property
+    def id(self) -> str:
+        """Stable id derived from the story url."""
+        return hashlib.sha1(self.url.encode()).hexdigest()[:16]
+
     def __str__(self):
         # Limit the preview of the text to 100 characters
         text_preview = (self.text[:100] + '...') if len(self.text) > 100 else self.text
@@ -0,0 +1,282 @@
+""" Related stories from a hashed TF-IDF index over the news archive """
+
+import os
+import re
+import json
+import zlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from aim.news.database import NEWS_DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+RELATED_INDEX_DIR = os.path.join(os.getcwd(), "news_related")
+
+WORD_RE = re.compile(r"[a-z0-9']{2,}")
+
+
+@dataclass
+class Postings:
+    """
+    Inverted index of the first n_docs rows, with the document frequencies and IDF weights it was built from.
+    """
+    n_docs: int
+    term_ptr: np.ndarray # term_ptr[t]:term_ptr[t+1] slices the postings of term t
+    docs: np.ndarray
+    weights: np.ndarray
+    df: np.ndarray
+    idf: np.ndarray
+    df_limit: float
+
+
+class RelatedIndex:
+    """
+    Cosine similarity over TF-IDF vectors of story headline and text, terms hashed into n_features buckets.
+
+    Term frequencies are stored on disk as an append-only CSR matrix (indptr, indices, data) read through np.memmap.
+    meta.json is written last and records how much of each file is committed, so an interrupted update is
+    ignored on the next open. A story whose text changes is appended again and its old row is skipped.
+    IDF weights depend on the whole archive, so document frequencies, norms and the inverted postings are
+    rebuilt by build_postings, which the caller runs on a schedule. Rows appended since the last build are
+    scored by a scan of just those rows, weighted with the IDF of the last build.
+    """
+
+    INDPTR, INDICES, DATA, URLS, META = "indptr.bin", "indices.bin", "data.bin", "urls.txt", "meta.json"
+
+    def __init__(self, path: str = RELATED_INDEX_DIR, n_features: int = 1 << 18, max_df: float = 0.5):
+        self.path = path
+        self.max_df = max_df # query terms in more than this fraction of stories are ignored
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, self.META)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"n_features": n_features, "n_docs": 0, "nnz": 0, "urls_bytes": 0, "last_id": 0, "scraped_at": ""}
+            for name in (self.INDPTR, self.INDICES, self.DATA, self.URLS):
+                open(self.file(name), "wb").close()
+            self.save_meta()
+        with open(self.file(self.URLS), "rb") as f:
+            self.urls = f.read(self.meta["urls_bytes"]).decode().splitlines()
+        # a url appended again was re-indexed, its latest row wins
+        self.positions = {url: i for i, url in enumerate(self.urls)}
+        self.dead = {i for i, url in enumerate(self.urls) if self.positions[url] != i}
+        self.postings: Optional[Postings] = None
+        self.last_scored = 0 # postings entries and delta entries the last query scored
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def save_meta(self) -> None:
+        tmp = self.file(self.META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.file(self.META))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def n_features(self) -> int:
+        return self.meta["n_features"]
+
+    def memmap(self, name: str, dtype, count: int) -> np.ndarray:
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.file(name), dtype=dtype, mode="r", shape=(count,))
+
+    def row(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Stored term ids and term frequencies of row i.
+        """
+        indptr = self.memmap(self.INDPTR, np.int64, self.meta["n_docs"])
+        start, end = (indptr[i - 1] if i else 0), indptr[i]
+        return (
+            np.array(self.memmap(self.INDICES, np.int32, self.meta["nnz"])[start:end]),
+            np.array(self.memmap(self.DATA, np.float32, self.meta["nnz"])[start:end]),
+        )
+
+    def term_frequencies(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sorted hashed term ids and sublinear term frequencies, 1 + log(count).
+        """
+        counts = Counter(zlib.crc32(word.encode()) % self.n_features for word in WORD_RE.findall(text.lower()))
+        terms = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+        tf = 1 + np.log(np.fromiter((counts[t] for t in terms), dtype=np.float32, count=len(terms)))
+        return terms, tf.astype(np.float32)
+
+    def add(self, rows: list[tuple[int, str, str]], reindex: bool = False) -> int:
+        """
+        Append (id, url, text) rows. Urls already indexed are skipped, or with reindex appended again
+        if their terms changed.
+        """
+        indptr, indices, data, urls = [], [], [], []
+        nnz = self.meta["nnz"]
+        for _, url, text in rows:
+            terms, tf = self.term_frequencies(text)
+            if url in self.positions:
+                if not reindex:
+                    continue
+                old_terms, old_tf = self.row(self.positions[url])
+                if np.array_equal(terms, old_terms) and np.array_equal(tf, old_tf):
+                    continue
+                self.dead.add(self.positions[url])
+            indices.append(terms)
+            data.append(tf)
+            nnz += len(terms)
+            indptr.append(nnz)
+            urls.append(url)
+            self.positions[url] = len(self.urls)
+            self.urls.append(url)
+        if urls:
+            with open(self.file(self.INDICES), "r+b") as f:
+                f.seek(self.meta["nnz"] * 4)
+                np.concatenate(indices).astype(np.int32).tofile(f)
+                f.truncate()
+            with open(self.file(self.DATA), "r+b") as f:
+                f.seek(self.meta["nnz"] * 4)
+                np.concatenate(data).astype(np.float32).tofile(f)
+                f.truncate()
+            with open(self.file(self.INDPTR), "r+b") as f:
+                f.seek(self.meta["n_docs"] * 8)
+                np.array(indptr, dtype=np.int64).tofile(f)
+                f.truncate()
+            with open(self.file(self.URLS), "r+b") as f:
+                f.seek(self.meta["urls_bytes"])
+                f.write("".join(url + "\n" for url in urls).encode())
+                f.truncate()
+                self.meta["urls_bytes"] = f.tell()
+        if rows and not reindex:
+            self.meta.update(last_id=max(self.meta["last_id"], rows[-1][0]))
+        if urls or (rows and not reindex):
+            self.meta.update(n_docs=len(self.urls), nnz=nnz)
+            self.save_meta()
+        return len(urls)
+
+    def update_from_db(self, db_path: str = NEWS_DB_PATH, chunk_size: int = 10_000, changed: bool = False) -> int:
+        """
+        Index stories added to the archive since the last update. With changed, also re-index stories whose
+        text was updated since, which scans the table by scraped_at so is left to scheduled refreshes.
+        """
+        conn = connect(db_path)
+        count = 0
+        try:
+            while rows := conn.execute(
+                "SELECT id, url, COALESCE(headline, '') || ' ' || COALESCE(text, '') FROM news_stories WHERE id > ? ORDER BY id LIMIT ?",
+                (self.meta["last_id"], chunk_size)
+            ).fetchall():
+                count += self.add(rows)
+            if changed:
+                scraped_at = self.meta.get("scraped_at", "")
+                # >= since scraped_at has second resolution, unchanged rows are skipped by add
+                updated = conn.execute(
+                    "SELECT id, url, COALESCE(headline, '') || ' ' || COALESCE(text, '') FROM news_stories WHERE id <= ? AND scraped_at >= ?",
+                    (self.meta["last_id"], scraped_at)
+                )
+                while rows := updated.fetchmany(chunk_size):
+                    count += self.add(rows, reindex=True)
+                latest = conn.execute("SELECT MAX(scraped_at) FROM news_stories WHERE id <= ?", (self.meta["last_id"],)).fetchone()[0]
+                if latest and latest != scraped_at:
+                    self.meta["scraped_at"] = latest
+                    self.save_meta()
+        finally:
+            conn.close()
+        if count:
+            logger.info(f"Added {count} stories to the related index")
+        return count
+
+    def build_postings(self) -> Postings:
+        """
+        Rebuild the inverted index of L2 normalised TF-IDF weights over every committed row, skipping replaced rows.
+        Slow on a large archive, run it outside the request path; queries use the previous postings until it returns.
+        """
+        n_docs, nnz = self.meta["n_docs"], self.meta["nnz"]
+        dead = np.fromiter((i for i in self.dead.copy() if i < n_docs), dtype=np.int64)
+        indptr = np.concatenate([[0], self.memmap(self.INDPTR, np.int64, n_docs)])
+        indices = self.memmap(self.INDICES, np.int32, nnz)
+        rows = np.repeat(np.arange(n_docs, dtype=np.int32), np.diff(indptr))
+        live = ~np.isin(rows, dead)
+        rows, indices = rows[live], indices[live]
+        n_live = n_docs - len(dead)
+        # terms are unique within a story, so counting indices counts documents
+        df = np.bincount(indices, minlength=self.n_features)
+        idf = (np.log((1 + n_live) / (1 + df.astype(np.float32))) + 1).astype(np.float32)
+        weights = self.memmap(self.DATA, np.float32, nnz)[live] * idf[indices]
+        norms = np.sqrt(np.bincount(rows, weights ** 2, minlength=n_docs)).astype(np.float32)
+        weights /= np.maximum(norms, 1e-12)[rows]
+        order = np.argsort(indices, kind="stable")
+        self.postings = Postings(
+            n_docs=n_docs,
+            term_ptr=np.searchsorted(indices[order], np.arange(self.n_features + 1)),
+            docs=rows[order],
+            weights=weights[order],
+            df=df,
+            idf=idf,
+            df_limit=max(1, self.max_df * n_live),
+        )
+        logger.info(f"Built related postings over {n_live} stories")
+        return self.postings
+
+    def query_vector(self, terms: np.ndarray, tf: np.ndarray, k: int, exclude: Optional[int] = None) -> list[tuple[str, float]]:
+        # only the first query after startup builds in the caller, later rebuilds are scheduled
+        postings = self.postings or self.build_postings()
+        n_docs, nnz = self.meta["n_docs"], self.meta["nnz"]
+        # rows appended since the build, scanned directly
+        delta_start = (self.memmap(self.INDPTR, np.int64, n_docs)[postings.n_docs - 1] if postings.n_docs else 0)
+        delta_indices = np.array(self.memmap(self.INDICES, np.int32, nnz)[delta_start:])
+        df = postings.df[terms]
+        keep = (df <= postings.df_limit) & ((df > 0) | np.isin(terms, delta_indices))
+        terms, q = terms[keep], tf[keep] * postings.idf[terms[keep]]
+        if len(terms) == 0:
+            return []
+        q /= np.linalg.norm(q)
+        slices = [slice(postings.term_ptr[t], postings.term_ptr[t + 1]) for t in terms]
+        candidates = np.concatenate([postings.docs[s] for s in slices])
+        self.last_scored = len(candidates) + len(delta_indices)
+        scores = np.bincount(
+            candidates,
+            np.concatenate([postings.weights[s] * w for s, w in zip(slices, q)]),
+            minlength=n_docs,
+        )
+        if n_docs > postings.n_docs:
+            delta_indptr = np.array(self.memmap(self.INDPTR, np.int64, n_docs)[postings.n_docs:]) - delta_start
+            delta_rows = np.repeat(np.arange(postings.n_docs, n_docs), np.diff(np.concatenate([[0], delta_indptr])))
+            delta_weights = np.array(self.memmap(self.DATA, np.float32, nnz)[delta_start:]) * postings.idf[delta_indices]
+            norms = np.sqrt(np.bincount(delta_rows, delta_weights ** 2, minlength=n_docs))
+            position = np.minimum(np.searchsorted(terms, delta_indices), len(terms) - 1)
+            matched = terms[position] == delta_indices
+            scores += np.bincount(
+                delta_rows[matched],
+                delta_weights[matched] * q[position[matched]] / np.maximum(norms[delta_rows[matched]], 1e-12),
+                minlength=n_docs,
+            )
+        if self.dead:
+            scores[list(self.dead)] = 0
+        if exclude is not None:
+            scores[exclude] = 0
+        k = min(k, np.count_nonzero(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(self.urls[i], float(scores[i])) for i in top]
+
+    def query_text(self, text: str, k: int = 10) -> list[tuple[str, float]]:
+        """
+        Top k stories by cosine similarity to free text, as (url, score).
+        """
+        return self.query_vector(*self.term_frequencies(text), k)
+
+    def query_url(self, url: str, k: int = 10) -> list[tuple[str, float]]:
+        """
+        Top k stories related to an indexed story, excluding the story itself.
+        """
+        if url not in self.positions:
+            raise KeyError(f"{url} is not in the related index")
+        i = self.positions[url]
+        return self.query_vector(*self.row(i), k, exclude=i)
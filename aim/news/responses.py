@@ -0,0 +1,16 @@
+""" FastAPI responses for the backend, kept apart so the emailer and Streamlit pages don't import fastapi """
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class StoryJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, content can contain NewsStory and other dataclasses directly.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,28 @@
+""" Fast serialization of NewsStory objects for the backend and Streamlit pages """
+
+from operator import attrgetter
+from typing import Iterable
+
+import orjson
+import pandas as pd
+
+from aim.news.models import NewsStory
+
+STORY_COLUMNS = ("order", "headline", "text", "author", "date", "url", "image_url")
+_story_values = attrgetter(*STORY_COLUMNS)
+
+
+def stories_to_json(stories: Iterable[NewsStory]) -> bytes:
+    """
+    Serialize stories straight to JSON bytes, orjson handles slotted dataclasses natively.
+    """
+    return orjson.dumps(list(stories))
+
+
+def stories_to_dataframe(stories: Iterable[NewsStory]) -> pd.DataFrame:
+    """
+    Build an editable dataframe of stories, sorted by order.
+    """
+    df = pd.DataFrame.from_records([_story_values(s) for s in stories], columns=STORY_COLUMNS)
+    return df.sort_values('order', kind='stable')
+
@@ -0,0 +1,39 @@
+""" In-process cache of recently scraped stories, keyed by story id """
+
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from aim.news.models import NewsStory
+
+
+class StoryCache:
+    """
+    Least recently used cache of full stories, so listings can send summaries and bodies are fetched on demand.
+    """
+
+    def __init__(self, maxsize: int = 2000):
+        self.maxsize = maxsize
+        self.stories: OrderedDict[str, NewsStory] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.stories)
+
+    def put(self, stories: Iterable[NewsStory]) -> None:
+        for story in stories:
+            self.stories[story.id] = story
+            self.stories.move_to_end(story.id)
+        while len(self.stories) > self.maxsize:
+            self.stories.popitem(last=False)
+
+    def get(self, story_id: str) -> Optional[NewsStory]:
+        story = self.stories.get(story_id)
+        if story is not None:
+            self.stories.move_to_end(story_id)
+        return story
+
+    def get_many(self, story_ids: Iterable[str]) -> list[NewsStory]:
+        return [story for story in map(self.get, story_ids) if story is not None]
+
+
+# shared by the backend endpoints
+STORY_CACHE = StoryCache()
@@ -0,0 +1,58 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from aim.news.archive import ArchiveWriter
+from aim.news.base_scraper import BaseScraper
+from aim.news.database import connect
+from aim.news.dedupe import NearDuplicateIndex
+from aim.news.models import NewsStory
+
+class FakeScraper(BaseScraper):
+    """Home page links to three stories, every story page is served from memory."""
+
+    URLS = {"jsy": "https://news/jsy"}
+
+    async def fetch(self, url, headers=None, randomize=True):
+        if url in self.URLS.values():
+            return "".join(f'<a href="https://news/story/{i}">Story {i}</a>' for i in range(3))
+        return f"<h1>{url.rsplit('/', 1)[-1]}</h1><p>Body.</p>"
+
+    def get_story_urls_from_page(self, soup: BeautifulSoup) -> list[str]:
+        return [a["href"] for a in soup.find_all("a")]
+
+    def parse_story(self, url: str, soup: BeautifulSoup) -> NewsStory:
+        return NewsStory(headline=soup.h1.text, text=soup.p.text, date="2 June 2025", author="BE", url=url, image_url=None)
+
+def archived(db: str) -> list[tuple]:
+    conn = connect(db)
+    rows = conn.execute("SELECT url, region FROM news_stories ORDER BY url").fetchall()
+    conn.close()
+    return rows
+
+@pytest.mark.asyncio
+async def test_scraped_stories_are_archived(tmp_path):
+    db = str(tmp_path / "news.db")
+    archive = ArchiveWriter(db, flush_interval=0.01, index=NearDuplicateIndex())
+    scraper = FakeScraper(archive=archive)
+    stories = await scraper.get_n_stories_for_region("jsy", 2)
+    assert len(stories) == 2
+    await archive.flush()
+    assert archived(db) == [("https://news/story/0", "jsy"), ("https://news/story/1", "jsy")]
+
+    # stories scraped without a region keep the one they were archived with
+    await scraper.fetch_and_parse_stories(["https://news/story/1", "https://news/story/2"])
+    await scraper.close()
+    await archive.close()
+    assert archived(db)[1:] == [("https://news/story/1", "jsy"), ("https://news/story/2", None)]
+    assert archive.written == 4
+    assert len(archive.index) == 3
+
+@pytest.mark.asyncio
+async def test_archive_batches_and_drops_when_full(tmp_path):
+    db = str(tmp_path / "news.db")
+    archive = ArchiveWriter(db, batch_size=10, maxsize=5)
+    stories = [NewsStory(headline=str(i), text="", date="", author="", url=f"https://news/{i}", image_url=None) for i in range(8)]
+    archive.push(stories)
+    assert archive.dropped == 3
+    await archive.close()
+    assert len(archived(db)) == 5
@@ -0,0 +1,58 @@
+import sqlite3
+
+from aim.news.models import NewsStory
+from aim.news.database import (
+    SCHEMA_VERSION, connect, create_news_database, get_stories_between, insert_news_stories, parse_story_date,
+    search_news_stories
+)
+
+def story(n: int, text: str = "Harbour works continue.", date: str = "2 June 2025") -> NewsStory:
+    return NewsStory(headline=f"Story {n}", text=text, date=date, author="BE",
+                     url=f"https://www.bailiwickexpress.com/news/{n}/", image_url=f"https://img/{n}.jpg")
+
+def test_parse_story_date():
+    assert parse_story_date("2 June 2025") == "2025-06-02"
+    assert parse_story_date("Monday 2 June 2025") == "2025-06-02"
+    assert parse_story_date("yesterday") is None
+
+def test_upsert_by_url(tmp_path):
+    db = str(tmp_path / "news.db")
+    create_news_database(db)
+    assert insert_news_stories(db, [story(1), story(2)], region="jsy") == 2
+    # re-scraped with new text and no region, region is kept
+    insert_news_stories(db, [story(1, text="Harbour reopens.")])
+    conn = connect(db)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    rows = conn.execute("SELECT url, text, region, outlet, published FROM news_stories ORDER BY id").fetchall()
+    conn.close()
+    assert len(rows) == 2
+    assert rows[0][1:] == ("Harbour reopens.", "jsy", "bailiwickexpress.com", "2025-06-02")
+    # create does not drop existing stories
+    create_news_database(db)
+    assert len(get_stories_between(db, "2025-06-01", "2025-06-30", region="jsy")) == 2
+
+def test_full_text_search_follows_updates(tmp_path):
+    db = str(tmp_path / "news.db")
+    insert_news_stories(db, [story(1), story(2, text="States Assembly debate.")])
+    assert [s.headline for s in search_news_stories(db, '"states assembly"')] == ["Story 2"]
+    insert_news_stories(db, [story(2, text="Budget approved.")])
+    assert search_news_stories(db, '"states assembly"') == []
+    assert [s.headline for s in search_news_stories(db, "budget")] == ["Story 2"]
+
+def test_migrates_legacy_table(tmp_path):
+    db = str(tmp_path / "news.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE news_stories (id INTEGER PRIMARY KEY AUTOINCREMENT, headline TEXT, text TEXT, date TEXT, author TEXT, url TEXT)")
+    conn.executemany("INSERT INTO news_stories (headline, text, date, author, url) VALUES (?, ?, ?, ?, ?)", [
+        ("Old", "Old text.", "1 June 2025", "BE", "https://be/1"),
+        ("New", "Harbour text.", "1 June 2025", "BE", "https://be/1"),
+        ("Other", "Other text.", "2 June 2025", "BE", "https://be/2"),
+    ])
+    conn.commit()
+    conn.close()
+    create_news_database(db)
+    conn = connect(db)
+    assert conn.execute("SELECT headline FROM news_stories ORDER BY url").fetchall() == [("New",), ("Other",)]
+    conn.close()
+    assert [s.url for s in search_news_stories(db, "harbour")] == ["https://be/1"]
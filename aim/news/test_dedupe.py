@@ -0,0 +1,67 @@
+import pandas as pd
+
+from aim.news.dedupe import NearDuplicateIndex, dedupe_sections, drop_near_duplicates
+from aim.news.models import NewsStory
+
+RELEASE = (
+    "The States of Jersey have announced that the harbour car park will close for resurfacing from Monday "
+    "until the end of the month, with drivers asked to use the Pier Road multi-storey instead. "
+    "A spokesperson said the work was essential and apologised for any disruption caused to residents."
+)
+REWRITE = RELEASE.replace("The States of Jersey have", "Government has").replace("residents", "local residents")
+OTHER = "Guernsey FC secured a late win at Footes Lane on Saturday after a stoppage time header from the captain."
+
+def story(url: str, text: str) -> NewsStory:
+    return NewsStory(headline=url, text=text, date="", author="", url=url, image_url=None)
+
+def test_query_finds_near_duplicates(tmp_path):
+    index = NearDuplicateIndex(threshold=0.5)
+    index.add_stories([story("be/1", RELEASE), story("be/2", OTHER)])
+    matches = index.query(REWRITE)
+    assert [key for key, _ in matches] == ["be/1"]
+    assert 0.5 <= matches[0][1] < 1
+    assert index.query_story(story("be/1", RELEASE)) == []
+    assert index.query("") == []
+
+    # round trips with buckets rebuilt
+    index.save(str(tmp_path / "index.npz"))
+    loaded = NearDuplicateIndex.load(str(tmp_path / "index.npz"))
+    assert len(loaded) == 2
+    assert [key for key, _ in loaded.query(REWRITE)] == ["be/1"]
+
+def test_query_compares_few_candidates():
+    index = NearDuplicateIndex()
+    index.add_stories([story(f"be/{i}", f"{OTHER} story number {i} {RELEASE[i:]}") for i in range(2000)])
+    # the bands narrow a query to the near duplicates, not the whole index
+    assert len(index.candidates(index.hasher.signature(REWRITE))) < len(index) // 5
+    assert len(index.candidates(index.hasher.signature("An unrelated story about the island's new library opening hours."))) < 20
+
+def test_dedupe_sections_keeps_first():
+    sections = dedupe_sections({
+        "news_stories": [story("be/1", RELEASE), story("be/2", OTHER)],
+        "business_stories": [story("jep/1", RELEASE), story("be/3", "")],
+        "podcast_stories": [story("be/2", OTHER), story("be/4", "")],
+    })
+    assert {name: [s.url for s in stories] for name, stories in sections.items()} == {
+        "news_stories": ["be/1", "be/2"],
+        "business_stories": ["be/3"],
+        "podcast_stories": ["be/4"],
+    }
+
+def test_dedupe_sections_backfills(caplog):
+    sections = dedupe_sections({
+        "news_stories": [story("be/1", RELEASE), story("be/2", OTHER), story("be/5", "")],
+        "business_stories": [story("jep/1", RELEASE), story("be/3", ""), story("be/5", "")],
+        "podcast_stories": [story("be/2", OTHER), story("be/4", "")],
+    }, sizes={"news_stories": 2, "business_stories": 2, "podcast_stories": 2})
+    # be/5 was spare in news, so it backfills business rather than being dropped as a duplicate
+    assert {name: [s.url for s in stories] for name, stories in sections.items()} == {
+        "news_stories": ["be/1", "be/2"],
+        "business_stories": ["be/3", "be/5"],
+        "podcast_stories": ["be/4"],
+    }
+    assert "podcast_stories has 1 of 2" in caplog.text
+
+def test_drop_near_duplicates():
+    df = pd.DataFrame({"text": [RELEASE, OTHER, RELEASE + " Updated.", None]})
+    assert drop_near_duplicates(df).index.tolist() == [0, 1, 3]
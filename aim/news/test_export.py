@@ -0,0 +1,41 @@
+import pandas as pd
+import tiktoken
+
+from aim.cli import main
+from aim.news.database import insert_news_stories
+from aim.news.export import full_article
+from aim.news.models import NewsStory
+
+# byte level encoding so the test needs no download
+BYTES = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={"<|endoftext|>": 256},
+)
+
+def story(n: int, outlet: str, date: str) -> NewsStory:
+    return NewsStory(headline=f"Story {n}", text="One two three.", date=date, author="BE",
+                     url=f"https://{outlet}/news/{n}/", image_url=None)
+
+def test_export_partitions(tmp_path, monkeypatch):
+    monkeypatch.setattr("aim.nlp.tokens.get_encoding", lambda model: BYTES)
+    db, out = str(tmp_path / "news.db"), str(tmp_path / "parquet")
+    insert_news_stories(db, [
+        story(1, "www.bailiwickexpress.com", "2 June 2025"),
+        story(2, "jerseyeveningpost.com", "3 June 2025"),
+        story(3, "jerseyeveningpost.com", "3 June 2024"),
+    ])
+    main(["export", "--db", db, "--out", out, "--chunk-size", "2"])
+    # exporting again replaces the partitions rather than adding files
+    main(["export", "--db", db, "--out", out, "--chunk-size", "2"])
+    assert sorted(p.relative_to(out).as_posix() for p in (tmp_path / "parquet").rglob("*.parquet")) == [
+        "year=2024/outlet=jerseyeveningpost.com/part-0.parquet",
+        "year=2025/outlet=bailiwickexpress.com/part-0.parquet",
+        "year=2025/outlet=jerseyeveningpost.com/part-0.parquet",
+    ]
+    df = pd.read_parquet(out, columns=["id", "headline", "n_words", "n_tokens"], filters=[("year", "=", 2025)])
+    assert sorted(df["headline"]) == ["Story 1", "Story 2"]
+    assert set(df["n_words"]) == {3}
+    # one token per byte of the article the fine-tuning data is built from
+    assert sorted(df["n_tokens"]) == sorted(len(full_article(h, "One two three.").encode()) for h in df["headline"])
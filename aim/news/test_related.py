@@ -0,0 +1,80 @@
+from dataclasses import replace
+
+import numpy as np
+
+from aim.news.database import insert_news_stories
+from aim.news.models import NewsStory
+from aim.news.related import RelatedIndex
+
+TOPICS = {
+    "harbour": "harbour marina boats moorings pier tide fishermen",
+    "election": "election deputies states assembly vote candidates hustings",
+    "football": "football match goal striker league fixtures supporters",
+}
+
+def story(n: int, topic: str) -> NewsStory:
+    return NewsStory(headline=f"{topic} story {n}", text=f"{TOPICS[topic]} update number {n} for the island.",
+                     date="", author="", url=f"https://be/{topic}/{n}", image_url=None)
+
+def test_related_incremental(tmp_path):
+    db, path = str(tmp_path / "news.db"), str(tmp_path / "related")
+    insert_news_stories(db, [story(i, topic) for i in range(3) for topic in TOPICS])
+    index = RelatedIndex(path)
+    assert index.update_from_db(db) == 9
+    related = [url for url, _ in index.query_url("https://be/harbour/0", k=2)]
+    assert sorted(related) == ["https://be/harbour/1", "https://be/harbour/2"]
+    assert index.query_text("who won the assembly vote", k=1)[0][0].startswith("https://be/election/")
+
+    # reopening reads the committed arrays, new stories are appended
+    insert_news_stories(db, [story(3, "football")])
+    index = RelatedIndex(path)
+    assert index.update_from_db(db) == 1
+    assert index.update_from_db(db) == 0
+    assert len(index) == 10
+    scores = dict(index.query_text(TOPICS["football"], k=10))
+    assert "https://be/football/3" in scores
+    assert all(0 < s <= 1 + 1e-6 for s in scores.values())
+
+def test_related_query_scores_postings_not_archive(tmp_path):
+    index = RelatedIndex(str(tmp_path / "related"))
+    rng = np.random.default_rng(0)
+    vocabulary = [f"word{i}" for i in range(20_000)]
+    index.add([(i, f"https://be/{i}", " ".join(rng.choice(vocabulary, 200))) for i in range(1, 2001)])
+    nnz = index.meta["nnz"]
+    # a query only touches the postings of its own terms, a small fraction of the matrix
+    for i in range(20):
+        assert index.query_url(f"https://be/{i + 1}", k=10)
+        assert 0 < index.last_scored < nnz // 20
+    # stories added since the build are scanned, but only those rows
+    index.add([(2001, "https://be/2001", " ".join(rng.choice(vocabulary, 200)))])
+    index.query_url("https://be/1", k=10)
+    assert index.last_scored < nnz // 20
+
+def test_related_updates_without_rebuild(tmp_path):
+    db, path = str(tmp_path / "news.db"), str(tmp_path / "related")
+    insert_news_stories(db, [story(i, topic) for i in range(3) for topic in TOPICS])
+    index = RelatedIndex(path)
+    index.update_from_db(db)
+    postings = index.build_postings()
+
+    # new stories are scored from their rows until the next scheduled build
+    insert_news_stories(db, [story(3, "harbour")])
+    assert index.update_from_db(db) == 1
+    assert "https://be/harbour/3" in dict(index.query_url("https://be/harbour/0", k=3))
+    assert index.postings is postings
+
+    # an upsert that changes a story's text re-indexes it, an unchanged one doesn't
+    moved = replace(story(0, "harbour"), text=TOPICS["football"])
+    insert_news_stories(db, [moved, story(1, "harbour")])
+    assert index.update_from_db(db) == 0
+    assert index.update_from_db(db, changed=True) == 1
+    assert len(index) == 10
+    for build in (False, True):
+        if build:
+            index.build_postings()
+        related = dict(index.query_url("https://be/football/0", k=4))
+        assert "https://be/harbour/0" in related
+        assert sorted(dict(index.query_url("https://be/harbour/1", k=2))) == ["https://be/harbour/2", "https://be/harbour/3"]
+
+    reopened = RelatedIndex(path)
+    assert len(reopened) == 10 and reopened.update_from_db(db, changed=True) == 0
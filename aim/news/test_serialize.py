@@ -0,0 +1,43 @@
+import orjson
+
+from aim.news.models import NewsStory
+from aim.news.responses import StoryJSONResponse
+from aim.news.serialize import STORY_COLUMNS, stories_to_dataframe, stories_to_json
+from aim.news.text import story_summary
+from aim.news.story_cache import StoryCache
+
+STORIES = [
+    NewsStory(headline="Second", text="Body two.", date="2 June 2025", author="BE", url="https://be/2", image_url=None, order=2),
+    NewsStory(headline="First", text="Body one.", date="1 June 2025", author="BE", url="https://be/1", image_url="https://img/1.jpg", order=1),
+]
+
+def test_news_story_is_slotted():
+    assert not hasattr(STORIES[0], "__dict__")
+
+def test_stories_to_json():
+    data = orjson.loads(stories_to_json(STORIES))
+    assert data[1] == {"headline": "First", "text": "Body one.", "date": "1 June 2025", "author": "BE",
+                       "url": "https://be/1", "image_url": "https://img/1.jpg", "order": 1}
+    body = orjson.loads(StoryJSONResponse({"news_stories": STORIES}).body)
+    assert body["news_stories"][0]["image_url"] is None
+
+def test_stories_to_dataframe():
+    df = stories_to_dataframe(STORIES)
+    assert tuple(df.columns) == STORY_COLUMNS
+    assert df["headline"].tolist() == ["First", "Second"]
+    assert stories_to_dataframe([]).empty
+
+def test_story_summary():
+    summary = story_summary(NewsStory(headline="H", text="One. Two.", date="", author="BE", url="https://be/3", image_url=None))
+    assert summary["first_sentence"] == "One."
+    assert "text" not in summary
+    assert summary["id"] == story_summary(NewsStory(headline="Other", text="", date="", author="", url="https://be/3", image_url=None))["id"]
+
+def test_story_cache_evicts_least_recent():
+    cache = StoryCache(maxsize=2)
+    cache.put(STORIES)
+    cache.get(STORIES[0].id)
+    cache.put([NewsStory(headline="Third", text="", date="", author="", url="https://be/3", image_url=None)])
+    assert len(cache) == 2
+    assert cache.get(STORIES[1].id) is None
+    assert cache.get_many([STORIES[0].id, "missing"]) == [STORIES[0]]
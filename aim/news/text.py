@@ -0,0 +1,30 @@
+""" Plain text views of NewsStory objects, free of web and dataframe dependencies so the emailer can use them """
+
+from typing import Optional
+
+from aim.news.models import NewsStory
+
+
+def first_sentence(text: Optional[str]) -> str:
+    """
+    First sentence of a story, also the email templates' first_sentence filter.
+    """
+    if not text:
+        return ""
+    first = text.split(".")[0]
+    return first + "." if first and not first.endswith(".") else first
+
+
+def story_summary(story: NewsStory) -> dict:
+    """
+    Listing view of a story, everything the email needs without the full text.
+    """
+    return {
+        "id": story.id,
+        "order": story.order,
+        "headline": story.headline,
+        "first_sentence": first_sentence(story.text),
+        "author": story.author,
+        "url": story.url,
+        "image_url": story.image_url,
+    }
@@ -0,0 +1,76 @@
+""" Benchmark process_stories and stratified_sample on a synthetic archive """
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from aim.nlp.get_article_summaries import N_SAMPLES, SAMPLE_SEED, TOKEN_LIMIT, WORD_LIMIT, process_stories, stratified_sample
+
+N_STORIES = 500_000
+CHUNK_SIZE = 50_000
+WORDS = np.array(["the", "states", "said", "island", "minister", "harbour", "police", "parish", "Jersey", "Guernsey"])
+PREFIXES = np.array(["", "", "", "", "", "", "Focus: ", "Gallery: ", "ART FIX ", "PLAY: "])
+
+
+def synthetic_archive(n: int = N_STORIES, seed: int = 0) -> pd.DataFrame:
+    """
+    n stories with word counts spread like the archive, n_tokens is included as in the parquet export.
+    """
+    rng = np.random.default_rng(seed)
+    n_words = np.minimum(rng.lognormal(5.8, 0.6, n).astype(int) + 1, 2 * WORD_LIMIT)
+    vocab = " ".join(rng.choice(WORDS, 4 * WORD_LIMIT))
+    # about eight characters a word, built in chunks so only one chunk is held as python strings
+    text = pd.concat(
+        [pd.Series([vocab[:8 * k] for k in n_words[i:i + CHUNK_SIZE]]) for i in range(0, n, CHUNK_SIZE)],
+        ignore_index=True
+    )
+    headline = [f"{p}Story {i} {w}" for i, (p, w) in enumerate(zip(rng.choice(PREFIXES, n), rng.choice(WORDS, n)))]
+    return pd.DataFrame({
+        "headline": headline,
+        "text": text,
+        "n_tokens": 2 * n_words, # as in the parquet export, the benchmark leaves tokenisation out
+    }).set_index(pd.RangeIndex(1, n + 1, name="id"))
+
+
+def apply_process_stories(stories: pd.DataFrame) -> pd.DataFrame:
+    """
+    The previous approach, every feature computed with a per-row apply.
+    """
+    stories = stories.copy()
+    stories['full_article'] = stories.apply(lambda x: f"<headline>{x['headline'].strip()}</headline>\n<text>{x['text'].strip()}</text>", axis=1)
+    stories = stories[stories['n_tokens'] < TOKEN_LIMIT].copy()
+    stories['n_words'] = stories['text'].apply(lambda x: len(x.split()))
+    stories = stories[stories['n_words'] < WORD_LIMIT].copy()
+    stories['n_words_round_100'] = stories['n_words'].apply(lambda x: round(x, -2)).replace(0, '<100')
+    first_words = stories['headline'].apply(lambda x: x.split()[0])
+    stories = stories[~first_words.str.endswith(":")]
+    return stories[~stories['headline'].str.contains("ART FIX")]
+
+
+def apply_stratified_sample(stories: pd.DataFrame, n_samples: int) -> pd.DataFrame:
+    return stories.groupby('n_words_round_100').apply(lambda x: x.sample(min(n_samples, len(x)), random_state=SAMPLE_SEED)).reset_index(level=0, drop=True)
+
+
+def bench(name: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {name:<24} {time.perf_counter() - start:8.2f} s")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-stories", type=int, default=N_STORIES)
+    args = parser.parse_args()
+
+    stories = synthetic_archive(args.n_stories)
+    print(f"{len(stories)} stories")
+    bench("apply process_stories", lambda: apply_process_stories(stories))
+    processed = bench("vectorized", lambda: process_stories(stories))
+    del stories
+    print(f"{len(processed)} stories after filters")
+    bench("apply stratified_sample", lambda: apply_stratified_sample(processed, N_SAMPLES))
+    bench("groupby sample", lambda: stratified_sample(processed, N_SAMPLES))
@@ -1,13 +1,41 @@
-import pandas as pd
+import os
 import json
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from aim.nlp.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = "You are a professional journalist that creates news articles based on a set of bullet pointed notes. Do not include information you are not given. Return unicode formatted articles in the format <headline>...</headline><text>...</text>."
+CSV_PATH = 'finetuning_data.csv'
 JSONL_PATH = 'finetuning_data.jsonl'
+VALIDATION_PATH = 'finetuning_validation.jsonl'
+HISTOGRAM_PATH = 'finetuning_tokens.json'
+VALIDATION_FRACTION = 0.1
+CHUNK_SIZE = 10_000
+COLUMNS = ['n_words_round_100', 'gpt_notes', 'full_article']
+TOKEN_MODEL = "gpt-4o-mini"
+TOKEN_BIN = 256 # width of the token histogram bins
+WRITE_BUFFER = 1 << 20
 
-def load_finetune_data(path: str):
-    return pd.read_csv(path)
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream the notes columns of a CSV or Parquet file chunk_size rows at a time.
+    """
+    if path.endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=COLUMNS):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=COLUMNS, chunksize=chunk_size)
 
-def format_prompt(system_prompt: str, user_prompt: str, output: str) -> str:
+def format_prompt(system_prompt: str, user_prompt: str, output: str) -> dict:
     return {
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -16,27 +44,79 @@ def format_prompt(system_prompt: str, user_prompt: str, output: str) -> str:
         ]
     }
 
-def save_to_jsonl(message: dict, path: str):
-    with open(path, 'a') as f:
-        f.write(json.dumps(message) + '\n')
-
-def main():
+def example_hash(message: dict) -> bytes:
+    return hashlib.sha256(json.dumps(message, sort_keys=True).encode()).digest()
 
-    # load data
-    stories = load_finetune_data('finetuning_data.csv')
-    stories = stories[stories['gpt_notes'].notnull()]
+def is_validation(digest: bytes, validation_fraction: float) -> bool:
+    """
+    Split on the content hash, so an example lands in the same split whatever order or file it comes from.
+    """
+    return int.from_bytes(digest[:8], 'big') < validation_fraction * 2 ** 64
 
-    # format data
-    for i in range(len(stories)):
-        story = stories.iloc[i]
-        user_prompt = f'write a {story["n_words_round_100"]} word news article on the following notes: {story["gpt_notes"]}'
-        output = story['full_article']
-        message = format_prompt(SYSTEM_PROMPT, user_prompt, output)
-        save_to_jsonl(message, JSONL_PATH)
+def build_finetuning_data(
+        path: str = CSV_PATH,
+        train_path: str = JSONL_PATH,
+        validation_path: str = VALIDATION_PATH,
+        histogram_path: str = HISTOGRAM_PATH,
+        validation_fraction: float = VALIDATION_FRACTION,
+        chunk_size: int = CHUNK_SIZE,
+        encoding=None
+    ) -> dict:
+    """
+    Stream stories with notes into train and validation JSONL files of chat examples.
 
-if __name__ == "__main__":
-    main()
+    Examples are deduplicated by content hash and split deterministically on it. The outputs are written to
+    temporary files and renamed at the end, so re-running replaces them with identical files.
+    Token counts of every example are binned into a histogram written to histogram_path.
+    """
+    seen = set()
+    counts = Counter(train=0, validation=0, duplicates=0, missing_notes=0)
+    histogram = Counter()
+    outputs = {'train': train_path, 'validation': validation_path}
+    files = {split: open(out + '.tmp', 'w', buffering=WRITE_BUFFER) for split, out in outputs.items()}
+    try:
+        for chunk in read_chunks(path, chunk_size):
+            missing = chunk['gpt_notes'].isna()
+            counts['missing_notes'] += int(missing.sum())
+            chunk = chunk[~missing]
+            user_prompts = 'write a ' + chunk['n_words_round_100'].astype(str) + ' word news article on the following notes: ' + chunk['gpt_notes']
+            tokens = count_tokens(SYSTEM_PROMPT + '\n' + user_prompts + '\n' + chunk['full_article'], TOKEN_MODEL, encoding=encoding)
+            for user_prompt, output, n_tokens in zip(user_prompts, chunk['full_article'], tokens):
+                message = format_prompt(SYSTEM_PROMPT, user_prompt, output)
+                digest = example_hash(message)
+                if digest in seen:
+                    counts['duplicates'] += 1
+                    continue
+                seen.add(digest)
+                split = 'validation' if is_validation(digest, validation_fraction) else 'train'
+                files[split].write(json.dumps(message) + '\n')
+                counts[split] += 1
+                histogram[int(n_tokens) // TOKEN_BIN * TOKEN_BIN] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    for out in outputs.values():
+        os.replace(out + '.tmp', out)
+    stats = {**counts, "token_histogram": {str(start): histogram[start] for start in sorted(histogram)}}
+    with open(histogram_path, 'w') as f:
+        json.dump(stats, f, indent=2)
+    logger.info(f"Wrote {counts['train']} train and {counts['validation']} validation examples, skipped {counts['duplicates']} duplicates")
+    return stats
 
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build fine-tuning train and validation files from generated notes")
+    parser.add_argument("path", nargs="?", default=CSV_PATH, help="CSV or Parquet file from get_article_summaries")
+    parser.add_argument("--validation-fraction", type=float, default=VALIDATION_FRACTION)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    return parser.parse_args(argv)
 
+def main():
 
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    stats = build_finetuning_data(args.path, validation_fraction=args.validation_fraction, chunk_size=args.chunk_size)
+    for start, n in stats["token_histogram"].items():
+        logger.info(f"{start:>6}+ tokens: {n}")
 
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,14 @@ import os
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 import logging
+from typing import Optional
 
 from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
 JSONL_PATH = 'finetuning_data.jsonl'
+VALIDATION_PATH = 'finetuning_validation.jsonl'
 MODEL = "gpt-4o-mini-2024-07-18"
 
 def get_openai_client() -> OpenAI:
@@ -18,8 +20,10 @@ def create_openai_file(client: OpenAI, path: str):
         response = client.files.create(file=f, purpose='fine-tune')
         return response.id
 
-def create_finetune_job(client: OpenAI, training_file: str):
-    return client.fine_tuning.jobs.create(training_file=training_file, model=MODEL)
+def create_finetune_job(client: OpenAI, training_file: str, validation_file: Optional[str] = None):
+    if validation_file is None:
+        return client.fine_tuning.jobs.create(training_file=training_file, model=MODEL)
+    return client.fine_tuning.jobs.create(training_file=training_file, validation_file=validation_file, model=MODEL)
 
 def check_finetune_jobs(client: OpenAI):
     jobs = client.fine_tuning.jobs.list()
@@ -36,8 +40,12 @@ def main():
     logging.info("Creating finetuning file.")
     file_id = create_openai_file(client, JSONL_PATH)
     logging.info(f"Created File ID: {file_id}")
+    validation_file_id = None
+    if os.path.exists(VALIDATION_PATH) and os.path.getsize(VALIDATION_PATH):
+        validation_file_id = create_openai_file(client, VALIDATION_PATH)
+        logging.info(f"Created validation File ID: {validation_file_id}")
     logging.info(f"Creating finetuning job for {file_id}")
-    create_finetune_job(client, file_id)
+    create_finetune_job(client, file_id, validation_file_id)
 
 if __name__ == "__main__":
     main()
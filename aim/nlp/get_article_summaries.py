@@ -1,17 +1,25 @@
 import asyncio
+import argparse
+import json
 from dotenv import load_dotenv, find_dotenv
 import os
 import logging
+from typing import Optional
 load_dotenv(find_dotenv())
 
 import pandas as pd
 from tqdm.auto import tqdm
 
-from openai import OpenAI
-import tiktoken
+import openai
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion
 import sqlite3
+from aiolimiter import AsyncLimiter
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential, before_sleep_log
 
-from aim.news.models import NewsStory
+from aim.news.dedupe import drop_near_duplicates
+from aim.nlp.tokens import count_tokens, get_encoding
+from aim.nlp.llm_cache import LLMCache, create_chat_completion, get_cache
 
 logger = logging.getLogger(__name__)
 logging.getLogger('httpx').setLevel(logging.WARNING)
@@ -24,51 +32,77 @@ SUMMARY_MODEL = "gpt-4o-mini"
 TOKEN_LIMIT = 5000
 WORD_LIMIT = 1600 # 99% of stories are below 1600 words
 N_SAMPLES = 10 # number of samples per word count strata
+STORY_COLUMNS = ['headline', 'text', 'n_words', 'n_tokens']
+SAMPLE_SEED = 0 # fixed so a resumed run samples the same stories
+NOTES_CHECKPOINT_PATH = 'notes_checkpoint.jsonl'
+NOTES_TOKEN_LIMIT = 4000
+NOTES_MAX_TOKENS = 1000 # completion tokens reserved against the tokens per minute limit
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+NOTES_BATCH_DIR = 'notes_batches'
+BATCH_MAX_REQUESTS = 50_000 # per batch file, the Batch API limit
+BATCH_MAX_BYTES = 190 * 1024 * 1024 # per batch file, under the Batch API's 200 MB limit
+BATCH_POLL_INTERVAL = 60
+BATCH_TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
 
 def get_openai_client(openai_key: str) -> OpenAI:
     return OpenAI(api_key=openai_key)
 
-def get_news_stories(db_path: str) -> NewsStory:
+def get_news_stories(path: str, columns: Optional[list[str]] = None, filters: Optional[list] = None) -> pd.DataFrame:
     """
-    Fetch news stories from the database.
+    Fetch news stories from a Parquet export (see `aim export`) or a news.db.
+    Parquet reads only the given columns and the partitions matching filters, e.g. [("year", ">=", 2024)], memory-mapped.
     """
-    conn = sqlite3.connect(db_path)
-    df = pd.read_sql_query("SELECT * FROM news_stories", conn).set_index('id')
-    return df
+    if path.endswith(".db"):
+        conn = sqlite3.connect(path)
+        df = pd.read_sql_query(f"SELECT {', '.join(['id'] + columns) if columns else '*'} FROM news_stories", conn).set_index('id')
+        conn.close()
+        return df
+    columns = ['id'] + [c for c in columns if c != 'id'] if columns else None
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters, memory_map=True).set_index('id')
 
 def process_stories(stories: pd.DataFrame) -> pd.DataFrame:
     """
-    Add features to news stories dataframe.
+    Add features to news stories dataframe and drop stories unsuitable for notes, vectorized over the whole frame.
     """
+    headline = stories['headline'].fillna('')
+    text = stories['text'].fillna('')
+    # get word counts, precomputed in the parquet export. str.split per story measures 3x faster than str.count(r'\S+')
+    n_words = stories['n_words'] if 'n_words' in stories else text.map(lambda x: len(x.split()))
+    keep = (
+        (n_words < WORD_LIMIT) # ignore outliers
+        # get rid of focus, gallery, play pieces etc. whose first word ends with a colon
+        & ~headline.str.match(r'\s*\S*:(?:\s|$)')
+        # get rid of ART FIX
+        & ~headline.str.contains("ART FIX", regex=False)
+    )
+    stories = stories[keep].copy()
+    stories['n_words'] = n_words[keep]
     # create full article from headline and text
-    stories['full_article'] = stories.apply(lambda x: f"<headline>{x['headline'].strip()}</headline>\n<text>{x['text'].strip()}</text>", axis=1)
-    # get n_tokens
-    stories['n_tokens'] = stories['full_article'].apply(get_tokens)
+    stories['full_article'] = "<headline>" + headline[keep].str.strip() + "</headline>\n<text>" + text[keep].str.strip() + "</text>"
+    # get n_tokens, counted only for stories that passed the cheaper filters
+    if 'n_tokens' not in stories:
+        stories['n_tokens'] = count_tokens(stories['full_article'], SUMMARY_MODEL)
     # filter stories with too many tokens
-    stories = stories[stories['n_tokens'] < TOKEN_LIMIT]   
-    # get word counts
-    stories['n_words'] = stories['text'].apply(lambda x: len(x.split()))
-    stories = stories[stories['n_words'] < WORD_LIMIT] # ignore outliers
-    stories['n_words_round_100'] = stories['n_words'].apply(lambda x: round(x, -2))
-    stories['n_words_round_100'].replace(0, '<100', inplace=True)
-    # get rid of focus, gallery, play pieces etc.
-    first_words = stories['headline'].apply(lambda x: x.split()[0])
-    stories = stories[~first_words.str.endswith(":")]
-    # get rid of ART FIX
-    stories = stories[~stories['headline'].str.contains("ART FIX")]
+    stories = stories[stories['n_tokens'] < TOKEN_LIMIT].copy()
+    rounded = stories['n_words'].round(-2)
+    stories['n_words_round_100'] = rounded.astype(object).mask(rounded == 0, '<100')
     return stories
 
 def stratified_sample(stories: pd.DataFrame, n_samples: int) -> pd.DataFrame:
     """
-    Get sample of news stories stratified by n_words_round_100.
+    Get sample of news stories stratified by n_words_round_100, up to n_samples per stratum.
     """
-    return stories.groupby('n_words_round_100').apply(lambda x: x.sample(min(n_samples, len(x)))).reset_index(drop=True)
+    # shuffle within each stratum then take the first n_samples, groupby().sample(n) fails on smaller strata.
+    # only the strata column is shuffled, the sampled rows are then taken by index
+    strata = stories['n_words_round_100']
+    shuffled = strata.groupby(strata, sort=False).sample(frac=1, random_state=SAMPLE_SEED)
+    return stories.loc[shuffled.groupby(shuffled, sort=False).head(n_samples).index]
 
 def get_tokens(input: str, model: str = SUMMARY_MODEL) -> int:
     """
     Get number of tokens for a given model in a string
     """
-    return len(tiktoken.encoding_for_model(model).encode(input))
+    return len(get_encoding(model).encode_ordinary(input))
 
 def get_news_notes(client: OpenAI, story_text: str) -> str:
     """
@@ -76,10 +110,11 @@ def get_news_notes(client: OpenAI, story_text: str) -> str:
     """
     # check tokens
     tokens = get_tokens(story_text)
-    if tokens > 4000:
+    if tokens > NOTES_TOKEN_LIMIT:
         logger.warning(f"Story too long: {tokens} tokens, skipping")
         return None
-    response = client.chat.completions.create(
+    response = create_chat_completion(
+        client,
         messages=[
             {"role": "system", "content": SUMMARY_PROMPT},
             {"role": "user", "content": story_text.strip()},
@@ -88,30 +123,327 @@ def get_news_notes(client: OpenAI, story_text: str) -> str:
     )
     return response.choices[0].message.content
 
-def main():
+class NotesGenerator:
+    """
+    Generate notes for many stories concurrently with the async client.
+
+    Requests are bounded by a semaphore and by requests per minute and tokens per minute limiters,
+    each request reserving its prompt tokens plus max_tokens. Rate limit, connection and server errors are retried.
+    Every finished story is appended to a JSONL checkpoint, so a rerun only requests stories not already in it.
+    Responses also go through the LLM cache, cached stories skip the limiters entirely.
+    """
+
+    def __init__(
+            self,
+            client: AsyncOpenAI,
+            checkpoint_path: str = NOTES_CHECKPOINT_PATH,
+            model: str = SUMMARY_MODEL,
+            rpm: int = 500,
+            tpm: int = 200_000,
+            concurrency: int = 16,
+            max_tokens: int = NOTES_MAX_TOKENS,
+            encoding=None,
+            cache: Optional[LLMCache] = None
+        ):
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.model = model
+        self.tpm = tpm
+        self.request_limiter = AsyncLimiter(rpm, 60)
+        self.token_limiter = AsyncLimiter(tpm, 60)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_tokens = max_tokens
+        self.encoding = encoding or get_encoding(model)
+        self.cache = get_cache() if cache is None else cache
+
+    def load_checkpoint(self) -> dict[str, Optional[str]]:
+        """
+        Notes already generated, by story id.
+        A line cut off by a crash is truncated away, so records appended on resume start on a fresh line.
+        """
+        done = {}
+        if not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, "rb+") as f:
+            data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                logger.warning(f"Dropping a partial line at the end of {self.checkpoint_path}")
+                f.truncate(complete)
+            for line in data[:complete].decode().splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[record["id"]] = record["notes"]
+        return done
+
+    def params(self, story_text: str) -> dict:
+        return dict(
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": story_text.strip()},
+            ],
+            model=self.model,
+            max_tokens=self.max_tokens
+        )
+
+    async def request(self, params: dict) -> str:
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            wait=wait_random_exponential(multiplier=1, max=60),
+            stop=stop_after_attempt(8),
+            before_sleep=before_sleep_log(logger, logging.INFO),
+            reraise=True
+        ):
+            with attempt:
+                response = await self.client.chat.completions.create(**params)
+        self.cache.put(params, response)
+        return response.choices[0].message.content
+
+    async def notes_for(self, story_text: str) -> Optional[str]:
+        tokens = len(self.encoding.encode_ordinary(story_text))
+        if tokens > NOTES_TOKEN_LIMIT:
+            logger.warning(f"Story too long: {tokens} tokens, skipping")
+            return None
+        params = self.params(story_text)
+        cached = self.cache.get(params)
+        if cached is not None:
+            return cached.choices[0].message.content
+        async with self.semaphore:
+            await self.request_limiter.acquire()
+            await self.token_limiter.acquire(min(tokens + self.max_tokens, self.tpm))
+            return await self.request(params)
+
+    async def run(self, stories: pd.Series) -> pd.Series:
+        """
+        Notes for each story in a Series of full articles indexed by story id, in the same order.
+        """
+        done = self.load_checkpoint()
+        todo = [(str(story_id), text) for story_id, text in stories.items() if str(story_id) not in done]
+        logger.info(f"{len(done)} stories already have notes, generating {len(todo)}")
+
+        async def generate(story_id: str, text: str) -> None:
+            notes = await self.notes_for(text)
+            done[story_id] = notes
+            # single line writes from the event loop thread, flushed so a crash loses at most in flight stories
+            checkpoint.write(json.dumps({"id": story_id, "notes": notes}) + "\n")
+            checkpoint.flush()
+            progress.update()
+
+        with open(self.checkpoint_path, "a") as checkpoint, tqdm(total=len(todo)) as progress:
+            results = await asyncio.gather(*(generate(story_id, text) for story_id, text in todo), return_exceptions=True)
+        failed = [e for e in results if isinstance(e, Exception)]
+        if failed:
+            logger.error(f"{len(failed)} stories failed, rerun to retry them: {failed[0]}")
+        return pd.Series([done.get(str(story_id)) for story_id in stories.index], index=stories.index)
+
+class BatchNotesGenerator(NotesGenerator):
+    """
+    Generate notes through the Batch API, at batch pricing with no rate limits to manage.
+
+    Requests for stories without notes are written to JSONL batch files keyed by story id as custom_id,
+    uploaded and submitted, then polled until the batch finishes and the output is merged back by custom_id.
+    Submitted batch ids are kept in the batch directory, so a rerun after a crash polls the same batches
+    rather than paying for them again. Results go to the same checkpoint and cache as NotesGenerator,
+    failed requests are left out of the checkpoint so a rerun resubmits them.
+    """
+
+    def __init__(
+            self,
+            client: AsyncOpenAI,
+            checkpoint_path: str = NOTES_CHECKPOINT_PATH,
+            batch_dir: str = NOTES_BATCH_DIR,
+            model: str = SUMMARY_MODEL,
+            max_requests: int = BATCH_MAX_REQUESTS,
+            max_bytes: int = BATCH_MAX_BYTES,
+            poll_interval: float = BATCH_POLL_INTERVAL,
+            max_tokens: int = NOTES_MAX_TOKENS,
+            encoding=None,
+            cache: Optional[LLMCache] = None
+        ):
+        super().__init__(client, checkpoint_path, model, max_tokens=max_tokens, encoding=encoding, cache=cache)
+        self.batch_dir = batch_dir
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.submitted_path = os.path.join(batch_dir, 'submitted.json')
+
+    def load_submitted(self) -> dict[str, list[str]]:
+        """
+        Batch ids not yet merged, with the story ids each covers.
+        """
+        if not os.path.exists(self.submitted_path):
+            return {}
+        with open(self.submitted_path) as f:
+            return json.load(f)
+
+    def save_submitted(self, submitted: dict[str, list[str]]) -> None:
+        tmp = self.submitted_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(submitted, f)
+        os.replace(tmp, self.submitted_path)
+
+    @staticmethod
+    def batch_line(story_id: str, params: dict) -> str:
+        return json.dumps({"custom_id": story_id, "method": "POST", "url": "/v1/chat/completions", "body": params}) + "\n"
+
+    def write_batch_file(self, path: str, requests: list[tuple[str, dict]]) -> None:
+        with open(path, 'w') as f:
+            for story_id, params in requests:
+                f.write(self.batch_line(story_id, params))
+
+    def split_requests(self, requests: list[tuple[str, dict]]) -> list[list[tuple[str, dict]]]:
+        """
+        Requests grouped into batch files of at most max_requests lines and max_bytes.
+        """
+        chunks, chunk, size = [], [], 0
+        for story_id, params in requests:
+            line_bytes = len(self.batch_line(story_id, params).encode())
+            if chunk and (len(chunk) >= self.max_requests or size + line_bytes > self.max_bytes):
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append((story_id, params))
+            size += line_bytes
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    async def submit(self, requests: list[tuple[str, dict]]) -> str:
+        """
+        Upload a batch file for the requests and start the batch, returns the batch id.
+        """
+        path = os.path.join(self.batch_dir, f'notes_{requests[0][0]}_{len(requests)}.jsonl')
+        self.write_batch_file(path, requests)
+        with open(path, 'rb') as f:
+            batch_file = await self.client.files.create(file=f, purpose='batch')
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h',
+            metadata={"description": "story notes"}
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    async def wait(self, batch_id: str):
+        """
+        Poll a batch until it reaches a terminal status.
+        """
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status in BATCH_TERMINAL_STATUSES:
+                return batch
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info(f"Batch {batch_id} {batch.status}: {counts.completed}/{counts.total} done, {counts.failed} failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def results(self, batch) -> dict[str, ChatCompletion]:
+        """
+        Completions by custom_id from a finished batch's output file. Failed requests are logged and left out.
+        """
+        if batch.status != 'completed':
+            logger.error(f"Batch {batch.id} {batch.status}: {batch.errors}")
+        completions = {}
+        if batch.output_file_id:
+            content = await self.client.files.content(batch.output_file_id)
+            for line in content.text.splitlines():
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    logger.warning(f"Story {record['custom_id']} failed in batch {batch.id}: {record.get('error') or response.get('body')}")
+                    continue
+                completions[record["custom_id"]] = ChatCompletion.model_validate(response["body"])
+        if batch.error_file_id:
+            content = await self.client.files.content(batch.error_file_id)
+            logger.warning(f"{len(content.text.splitlines())} requests failed in batch {batch.id}")
+        return completions
+
+    async def run(self, stories: pd.Series) -> pd.Series:
+        """
+        Notes for each story in a Series of full articles indexed by story id, in the same order.
+        """
+        os.makedirs(self.batch_dir, exist_ok=True)
+        done = self.load_checkpoint()
+        submitted = self.load_submitted()
+        pending = {story_id for story_ids in submitted.values() for story_id in story_ids}
+        requests = {}
+        with open(self.checkpoint_path, "a") as checkpoint:
+
+            def record(story_id: str, notes: Optional[str]) -> None:
+                done[story_id] = notes
+                checkpoint.write(json.dumps({"id": story_id, "notes": notes}) + "\n")
+
+            for story_id, text in stories.items():
+                story_id = str(story_id)
+                if story_id in done or story_id in pending:
+                    continue
+                tokens = len(self.encoding.encode_ordinary(text))
+                if tokens > NOTES_TOKEN_LIMIT:
+                    logger.warning(f"Story too long: {tokens} tokens, skipping")
+                    record(story_id, None)
+                    continue
+                params = self.params(text)
+                cached = self.cache.get(params)
+                if cached is not None:
+                    record(story_id, cached.choices[0].message.content)
+                    continue
+                requests[story_id] = params
+            checkpoint.flush()
+
+            todo = list(requests.items())
+            logger.info(f"{len(done)} stories already have notes, {len(pending)} pending in batches, submitting {len(todo)}")
+            for chunk in self.split_requests(todo):
+                batch_id = await self.submit(chunk)
+                submitted[batch_id] = [story_id for story_id, _ in chunk]
+                self.save_submitted(submitted)
+
+            for batch_id in list(submitted):
+                batch = await self.wait(batch_id)
+                for story_id, completion in (await self.results(batch)).items():
+                    # requests from a batch submitted by an earlier run are not rebuilt, so only this run's are cached
+                    if story_id in requests:
+                        self.cache.put(requests[story_id], completion)
+                    record(story_id, completion.choices[0].message.content)
+                checkpoint.flush()
+                del submitted[batch_id]
+                self.save_submitted(submitted)
+        return pd.Series([done.get(str(story_id)) for story_id in stories.index], index=stories.index)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate notes for a stratified sample of news stories")
+    parser.add_argument("--batch", action="store_true", help="Use the Batch API, slower but at batch pricing")
+    parser.add_argument("--all", action="store_true", help="Generate notes for every story rather than a stratified sample")
+    return parser.parse_args()
+
+async def main():
 
+    args = parse_args()
     logging.basicConfig(level=logging.INFO)
 
     # get news stories sample
     logger.info("Getting news stories")
-    stories = get_news_stories(db_path = '../../news.db')
+    stories = get_news_stories('../../news_parquet', columns=STORY_COLUMNS)
     stories = process_stories(stories)
-    stories = stratified_sample(stories, N_SAMPLES)
+    # syndicated press releases would otherwise be over-represented in the fine-tuning set
+    stories = drop_near_duplicates(stories)
+    if not args.all:
+        stories = stratified_sample(stories, N_SAMPLES)
 
     # get story notes
     logger.info("Getting story notes")
-    openai_key = os.getenv('OPENAI_KEY')
-    client = get_openai_client(openai_key)
-    notes = []
-    for i in tqdm(range(len(stories))):
-        story = stories.iloc[i]['full_article']
-        story_notes = get_news_notes(client, story)
-        logger.debug(f"Story: {story[:100]}, Notes: {story_notes[:100]}")
-        notes.append(story_notes)
-    stories['gpt_notes'] = notes
+    if args.batch:
+        client = AsyncOpenAI(api_key=os.getenv('OPENAI_KEY'))
+        generator = BatchNotesGenerator(client)
+    else:
+        client = AsyncOpenAI(api_key=os.getenv('OPENAI_KEY'), max_retries=0) # retries are handled by NotesGenerator
+        generator = NotesGenerator(client)
+    stories['gpt_notes'] = await generator.run(stories['full_article'])
+    await client.close()
     stories.to_csv('finetuning_data.csv')
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
 
@@ -0,0 +1,209 @@
+""" Content addressed cache of OpenAI chat completions """
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, Optional
+
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = os.path.join(os.getcwd(), "llm_cache.db")
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(params: dict) -> str:
+    """
+    sha256 of the request, model, messages and every other parameter, independent of key order.
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    Chat completions stored by request hash in SQLite.
+    When the stored responses exceed max_bytes the least recently used are evicted.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock() # streamlit runs scripts on several threads
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode = WAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)')
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, params: dict) -> Optional[ChatCompletion]:
+        key = cache_key(params)
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+        self.hits += 1
+        logger.debug(f"LLM cache hit for {params.get('model')}")
+        return ChatCompletion.model_validate_json(row[0])
+
+    def put(self, params: dict, response: ChatCompletion) -> None:
+        data = response.model_dump_json()
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                (cache_key(params), params.get("model"), data, len(data), now, now)
+            )
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Delete least recently used responses until the cache fits in max_bytes, call with the lock held.
+        """
+        excess = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        # running total over the oldest rows, everything up to the row that covers the excess goes
+        cutoff = self.conn.execute('''
+            SELECT last_used FROM (
+                SELECT last_used, SUM(size) OVER (ORDER BY last_used, key) AS freed FROM responses
+            ) WHERE freed >= ? ORDER BY last_used LIMIT 1
+        ''', (excess,)).fetchone()
+        deleted = self.conn.execute('DELETE FROM responses WHERE last_used <= ?', (cutoff[0],)).rowcount
+        logger.info(f"Evicted {deleted} responses from the LLM cache")
+
+
+@lru_cache(maxsize=None)
+def get_cache(path: str = LLM_CACHE_PATH) -> LLMCache:
+    """
+    Shared cache per path for the process.
+    """
+    return LLMCache(path)
+
+
+def create_chat_completion(client: OpenAI, cache: Optional[LLMCache] = None, **params) -> ChatCompletion:
+    """
+    client.chat.completions.create(**params) through the cache.
+    """
+    cache = get_cache() if cache is None else cache
+    response = cache.get(params)
+    if response is None:
+        response = client.chat.completions.create(**params)
+        cache.put(params, response)
+    return response
+
+
+async def acreate_chat_completion(client: AsyncOpenAI, cache: Optional[LLMCache] = None, **params) -> ChatCompletion:
+    """
+    Async client version of create_chat_completion.
+    """
+    cache = get_cache() if cache is None else cache
+    response = cache.get(params)
+    if response is None:
+        response = await client.chat.completions.create(**params)
+        cache.put(params, response)
+    return response
+
+
+def completion_from_chunks(chunks: list[ChatCompletionChunk]) -> ChatCompletion:
+    """
+    The ChatCompletion a streamed request would have returned, so streamed responses share the cache.
+    """
+    choices = [chunk.choices[0] for chunk in chunks if chunk.choices]
+    usage = next((chunk.usage for chunk in chunks if chunk.usage is not None), None)
+    return ChatCompletion(
+        id=chunks[0].id,
+        object="chat.completion",
+        created=chunks[0].created,
+        model=chunks[0].model,
+        choices=[Choice(
+            index=0,
+            finish_reason=next((c.finish_reason for c in reversed(choices) if c.finish_reason), "stop"),
+            message=ChatCompletionMessage(role="assistant", content="".join(c.delta.content or "" for c in choices)),
+        )],
+        usage=usage,
+    )
+
+
+def log_latency(params: dict, first_token: Optional[float], total: float) -> None:
+    first = f"{first_token:.2f}s" if first_token is not None else "none"
+    logger.info(f"{params.get('model')} streamed, first token {first}, total {total:.2f}s")
+
+
+def stream_chat_completion(client: OpenAI, cache: Optional[LLMCache] = None, **params) -> Iterator[str]:
+    """
+    Content deltas of a streamed completion, time to first token and total latency are logged.
+    A cached response is yielded whole, a completed stream is added to the cache under the unstreamed request.
+    """
+    cache = get_cache() if cache is None else cache
+    response = cache.get(params)
+    if response is not None:
+        yield response.choices[0].message.content or ""
+        return
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    for chunk in client.chat.completions.create(**params, stream=True, stream_options={"include_usage": True}):
+        chunks.append(chunk)
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            first_token = first_token if first_token is not None else time.perf_counter() - start
+            yield delta
+    log_latency(params, first_token, time.perf_counter() - start)
+    if chunks:
+        cache.put(params, completion_from_chunks(chunks))
+
+
+async def astream_chat_completion(client: AsyncOpenAI, cache: Optional[LLMCache] = None, **params) -> AsyncIterator[str]:
+    """
+    Async client version of stream_chat_completion.
+    """
+    cache = get_cache() if cache is None else cache
+    response = cache.get(params)
+    if response is not None:
+        yield response.choices[0].message.content or ""
+        return
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    async for chunk in await client.chat.completions.create(**params, stream=True, stream_options={"include_usage": True}):
+        chunks.append(chunk)
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            first_token = first_token if first_token is not None else time.perf_counter() - start
+            yield delta
+    log_latency(params, first_token, time.perf_counter() - start)
+    if chunks:
+        cache.put(params, completion_from_chunks(chunks))
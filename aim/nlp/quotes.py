@@ -0,0 +1,194 @@
+""" Map-reduce key quote extraction for long documents """
+
+import re
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from openai import AsyncOpenAI
+
+from aim.nlp.llm_cache import LLMCache, astream_chat_completion
+
+logger = logging.getLogger(__name__)
+
+QUOTE_MODEL = "gpt-4.1-mini"
+QUOTE_PROMPT = (
+    "You are a text analysis assistant. "
+    "Extract the most important and key quotes from the provided text. "
+    "Do not include any additional commentary, do not invent anything, only use exact quotes from the text."
+    "Respond on plain text format separated by new lines. "
+)
+CHUNK_CHARS = 12_000 # about 3000 tokens, small enough that every chunk returns quickly
+OVERLAP_CHARS = 1_000
+MAX_CONCURRENCY = 8
+
+# direct speech in straight or curly double quotes
+QUOTED_SPAN_RE = re.compile(r'"([^"\n]{8,}?)"|“([^”\n]{8,}?)”')
+# list markers and wrapping quotes the model adds around each line
+LINE_MARKER_RE = re.compile(r'^\s*(?:[-*•]|\d+[.)])?\s*["“”\']?(.*?)["“”\']?\s*$')
+NORMALISE_RE = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass
+class Quote:
+    text: str
+    position: int # offset in the normalised document, -1 if the model's wording is not found in it
+    chunks: int = 1 # number of chunks that returned the quote
+    quoted: bool = False # inside a quoted span found by the regex pass
+
+    @property
+    def score(self) -> int:
+        return self.chunks + 2 * self.quoted + 2 * (self.position >= 0)
+
+
+def normalise(text: str) -> str:
+    return NORMALISE_RE.sub(" ", text.lower()).strip()
+
+
+def find_quoted_spans(text: str) -> list[tuple[int, int]]:
+    """
+    (start, end) of every double quoted span, a local pass that needs no API call.
+    """
+    return [match.span() for match in QUOTED_SPAN_RE.finditer(text)]
+
+
+def split_chunks(
+        text: str,
+        spans: list[tuple[int, int]],
+        chunk_chars: int = CHUNK_CHARS,
+        overlap_chars: int = OVERLAP_CHARS
+    ) -> list[tuple[int, str]]:
+    """
+    Split text into (offset, chunk) pieces of at most chunk_chars overlapping by about overlap_chars.
+    Chunks start and end on whitespace and never cut a quoted span that fits in a chunk with its overlap,
+    longer spans are split like the rest of the text.
+    """
+    whole = [(s, e) for s, e in spans if e - s <= chunk_chars - overlap_chars]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start + chunk_chars // 2, end)
+            end = space if space > 0 else end
+            for span_start, span_end in whole:
+                if span_start < end < span_end:
+                    # end before the span, the next chunk starts within the overlap before it so holds it whole,
+                    # unless the span starts in this chunk's overlap, then the span fits in this chunk
+                    end = span_start if span_start > start + overlap_chars else span_end
+        chunks.append((start, text[start:end]))
+        if end >= len(text):
+            break
+        next_start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", next_start, end)
+        next_start = space + 1 if space > 0 else next_start
+        for span_start, span_end in whole:
+            if span_start < next_start < span_end and span_start > start:
+                next_start = span_start
+        start = next_start
+    return chunks
+
+
+def parse_quotes(content: Optional[str]) -> list[str]:
+    quotes = []
+    for line in (content or "").splitlines():
+        quote = LINE_MARKER_RE.match(line).group(1).strip()
+        if normalise(quote):
+            quotes.append(quote)
+    return quotes
+
+
+def normalise_source(text: str, spans: list[tuple[int, int]]) -> tuple[str, list[str]]:
+    """
+    The normalised document, padded so matches fall on word boundaries, and its normalised quoted spans.
+    """
+    return f" {normalise(text)} ", [normalise(text[start:end]) for start, end in spans]
+
+
+def merge_quotes(
+        chunk_quotes: list[list[str]],
+        text: str,
+        spans: list[tuple[int, int]],
+        source: Optional[tuple[str, list[str]]] = None
+    ) -> list[Quote]:
+    """
+    Deduplicate quotes across chunks and rank them.
+
+    Quotes are matched on normalised text, a quote contained in a longer one from an overlapping chunk is merged
+    into it. Quotes found verbatim in the document and inside quoted speech rank first, ties keep document order.
+    Pass source from normalise_source when merging the same document repeatedly, normalising it is O(document).
+    """
+    source, quoted = source if source is not None else normalise_source(text, spans)
+    merged: dict[str, Quote] = {}
+    for quotes in chunk_quotes:
+        for key in dict.fromkeys(normalise(q) for q in quotes):
+            # a chunk may repeat a quote, each chunk counts once
+            original = next(q for q in quotes if normalise(q) == key)
+            # padded so a quote only merges into one containing it as whole words, "yes" not into "yesterday"
+            match = next((k for k in merged if f" {key} " in f" {k} " or f" {k} " in f" {key} "), None)
+            if match is None:
+                merged[key] = Quote(original, -1)
+                continue
+            quote = merged.pop(match)
+            quote.chunks += 1
+            if len(key) > len(match):
+                quote.text, match = original, key
+            merged[match] = quote
+    for key, quote in merged.items():
+        quote.position = source.find(f" {key} ")
+        quote.quoted = any(f" {key} " in f" {span} " or f" {span} " in f" {key} " for span in quoted)
+    return sorted(merged.values(), key=lambda q: (-q.score, q.position if q.position >= 0 else len(source)))
+
+
+async def extract_quotes(
+        client: AsyncOpenAI,
+        text: str,
+        model: str = QUOTE_MODEL,
+        chunk_chars: int = CHUNK_CHARS,
+        overlap_chars: int = OVERLAP_CHARS,
+        concurrency: int = MAX_CONCURRENCY,
+        cache: Optional[LLMCache] = None,
+        on_update: Optional[Callable[[list[Quote]], None]] = None
+    ) -> list[Quote]:
+    """
+    Key quotes from text of any length, ranked.
+
+    The text is split into overlapping chunks which are sent concurrently, so latency follows the
+    slowest chunk rather than the document length. A chunk that fails is logged and skipped.
+    Completions are streamed, on_update is called with the ranking so far each time a chunk finishes a line.
+    """
+    spans = find_quoted_spans(text)
+    source = normalise_source(text, spans) # once, not on every streamed line
+    chunks = split_chunks(text, spans, chunk_chars, overlap_chars)
+    semaphore = asyncio.Semaphore(concurrency)
+    logger.info(f"Extracting quotes from {len(chunks)} chunks, {len(spans)} quoted spans found")
+
+    partial: list[list[str]] = [[] for _ in chunks]
+
+    async def extract(i: int, chunk: str) -> list[str]:
+        content = ""
+        async with semaphore:
+            async for delta in astream_chat_completion(
+                client,
+                cache,
+                model=model,
+                messages=[
+                    {"role": "system", "content": QUOTE_PROMPT},
+                    {"role": "user", "content": chunk}
+                ]
+            ):
+                content += delta
+                if on_update is not None and "\n" in delta:
+                    partial[i] = parse_quotes(content[:content.rfind("\n")])
+                    on_update(merge_quotes(partial, text, spans, source))
+        partial[i] = parse_quotes(content)
+        return partial[i]
+
+    results = await asyncio.gather(*(extract(i, chunk) for i, (_, chunk) in enumerate(chunks)), return_exceptions=True)
+    failed = [e for e in results if isinstance(e, Exception)]
+    if failed and len(failed) == len(results):
+        raise failed[0]
+    for e in failed:
+        logger.error(f"Quote extraction failed for a chunk: {e}")
+    return merge_quotes([r for r in results if not isinstance(r, Exception)], text, spans, source)
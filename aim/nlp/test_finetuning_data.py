@@ -0,0 +1,60 @@
+import json
+
+import pandas as pd
+import tiktoken
+
+from aim.nlp.create_finetuning_data import build_finetuning_data
+
+BYTES = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+def notes_frame(n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "id": range(n),
+        "headline": [f"Story {i}" for i in range(n)],
+        "n_words_round_100": ["<100" if i % 3 == 0 else str(100 * (i % 3)) for i in range(n)],
+        "gpt_notes": [None if i == 5 else f"- fact {i}" for i in range(n)],
+        "full_article": [f"<headline>Story {i}</headline>\n<text>{'word ' * i}</text>" for i in range(n)],
+    })
+
+def build(tmp_path, path, **kwargs) -> dict:
+    return build_finetuning_data(
+        str(path), str(tmp_path / "train.jsonl"), str(tmp_path / "validation.jsonl"), str(tmp_path / "tokens.json"),
+        encoding=BYTES, **kwargs
+    )
+
+def test_build_dedupes_and_splits(tmp_path):
+    stories = notes_frame(200)
+    # the same story generated twice
+    stories = pd.concat([stories, stories.iloc[[10, 20]]])
+    stories.to_csv(tmp_path / "notes.csv", index=False)
+
+    stats = build(tmp_path, tmp_path / "notes.csv", chunk_size=32)
+    assert (stats["duplicates"], stats["missing_notes"]) == (2, 1)
+    assert stats["train"] + stats["validation"] == 199
+    assert 0 < stats["validation"] < 60
+    assert sum(stats["token_histogram"].values()) == 199
+
+    train = (tmp_path / "train.jsonl").read_text()
+    validation = (tmp_path / "validation.jsonl").read_text()
+    examples = [json.loads(line) for line in (train + validation).splitlines()]
+    assert len({json.dumps(e) for e in examples}) == 199
+    assert examples[0]["messages"][1]["content"].startswith("write a <100 word news article")
+
+    # rerunning gives identical files rather than appending
+    build(tmp_path, tmp_path / "notes.csv", chunk_size=7)
+    assert (tmp_path / "train.jsonl").read_text() == train
+    assert (tmp_path / "validation.jsonl").read_text() == validation
+
+def test_build_from_parquet_matches_csv(tmp_path):
+    stories = notes_frame(50)
+    stories.to_csv(tmp_path / "notes.csv", index=False)
+    stories.to_parquet(tmp_path / "notes.parquet")
+    csv_stats = build(tmp_path, tmp_path / "notes.csv")
+    train = (tmp_path / "train.jsonl").read_text()
+    assert build(tmp_path, tmp_path / "notes.parquet", chunk_size=8) == csv_stats
+    assert (tmp_path / "train.jsonl").read_text() == train
@@ -0,0 +1,79 @@
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from aim.nlp.llm_cache import LLMCache, cache_key, create_chat_completion, stream_chat_completion
+
+def completion(content: str) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    })
+
+class FakeClient:
+    """Just enough of OpenAI for client.chat.completions.create, counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, stream: bool = False, stream_options: dict = None, **params) -> ChatCompletion:
+        self.calls += 1
+        content = params["messages"][-1]["content"].upper()
+        if stream:
+            return self.stream(content)
+        return completion(content)
+
+    def stream(self, content: str):
+        for i, delta in enumerate([*content, None]):
+            yield ChatCompletionChunk.model_validate({
+                "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None if delta else "stop"}],
+            })
+
+def test_cache_key_ignores_parameter_order():
+    messages = [{"role": "user", "content": "hello"}]
+    assert cache_key({"model": "gpt-4o", "messages": messages}) == cache_key({"messages": messages, "model": "gpt-4o"})
+    assert cache_key({"model": "gpt-4o", "messages": messages}) != cache_key({"model": "gpt-4o-mini", "messages": messages})
+
+def test_create_chat_completion_hits_cache(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    client = FakeClient()
+    messages = [{"role": "user", "content": "hello"}]
+    first = create_chat_completion(client, cache, model="gpt-4o", messages=messages)
+    second = create_chat_completion(client, cache, messages=messages, model="gpt-4o")
+    assert client.calls == 1
+    assert second.choices[0].message.content == first.choices[0].message.content == "HELLO"
+    assert (cache.hits, cache.misses) == (1, 1)
+    create_chat_completion(client, cache, model="gpt-4o", messages=messages, temperature=0)
+    assert client.calls == 2
+    # entries survive reopening
+    cache.close()
+    assert len(LLMCache(str(tmp_path / "cache.db"))) == 2
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    size = len(completion("a").model_dump_json())
+    cache = LLMCache(str(tmp_path / "cache.db"), max_bytes=2 * size)
+    params = [{"model": "gpt-4o", "messages": [{"role": "user", "content": c}]} for c in "abc"]
+    cache.put(params[0], completion("a"))
+    cache.put(params[1], completion("b"))
+    assert cache.get(params[0]) is not None # a is now more recent than b
+    cache.put(params[2], completion("c"))
+    assert len(cache) == 2
+    assert cache.size <= 2 * size
+    assert cache.get(params[1]) is None
+    assert cache.get(params[0]) is not None and cache.get(params[2]) is not None
+
+def test_stream_shares_cache_with_create(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    client = FakeClient()
+    messages = [{"role": "user", "content": "hello"}]
+    assert list(stream_chat_completion(client, cache, model="gpt-4o", messages=messages)) == list("HELLO")
+    # the completed stream is cached under the unstreamed request
+    assert create_chat_completion(client, cache, model="gpt-4o", messages=messages).choices[0].message.content == "HELLO"
+    assert list(stream_chat_completion(client, cache, model="gpt-4o", messages=messages)) == ["HELLO"]
+    assert client.calls == 1
+    # a stream abandoned part way through is not cached
+    partial = stream_chat_completion(client, cache, model="gpt-4o", messages=[{"role": "user", "content": "bye"}])
+    next(partial)
+    partial.close()
+    assert len(cache) == 1
@@ -0,0 +1,202 @@
+import json
+
+import pandas as pd
+import pytest
+import pytest_asyncio
+import tiktoken
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from openai import AsyncOpenAI
+
+from aim.nlp.get_article_summaries import BatchNotesGenerator, NotesGenerator
+from aim.nlp.llm_cache import LLMCache
+
+BYTES = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+class MockOpenAI:
+    """Chat completions stand-in, notes echo the story and the first request is rate limited."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        story = body["messages"][1]["content"]
+        self.requests.append(story)
+        if len(self.requests) == 1:
+            return web.json_response({"error": {"message": "Rate limit", "type": "rate_limit"}}, status=429)
+        return web.json_response({
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"notes: {story}"}}],
+        })
+
+@pytest_asyncio.fixture
+async def mock_openai():
+    mock = MockOpenAI()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", mock.completions)
+    server = TestServer(app)
+    await server.start_server()
+    client = AsyncOpenAI(api_key="test", base_url=str(server.make_url("/v1")), max_retries=0)
+    yield mock, client
+    await client.close()
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_notes_resume_from_checkpoint(mock_openai, tmp_path):
+    mock, client = mock_openai
+    checkpoint = tmp_path / "notes.jsonl"
+    # story 1 finished before a crash that cut off the next line
+    checkpoint.write_text(json.dumps({"id": "1", "notes": "old notes"}) + '\n{"id": "2", "no')
+    stories = pd.Series({1: "story one", 2: "story two", 3: "story three", 4: "x" * 5000})
+
+    generator = NotesGenerator(client, str(checkpoint), concurrency=2, encoding=BYTES, cache=LLMCache(str(tmp_path / "llm_cache.db")))
+    notes = await generator.run(stories)
+    assert notes[[1, 2, 3]].tolist() == ["old notes", "notes: story two", "notes: story three"]
+    assert pd.isna(notes[4])
+    # the rate limited request was retried, story 1 and the long story were never sent
+    assert len(mock.requests) == 3
+    assert set(mock.requests) == {"story two", "story three"}
+
+    # the partial line was cut away before appending, every story has one complete record
+    records = [json.loads(line) for line in checkpoint.read_text().splitlines()]
+    assert sorted(r["id"] for r in records) == ["1", "2", "3", "4"]
+    assert generator.load_checkpoint()["2"] == "notes: story two"
+
+    mock.requests.clear()
+    assert (await generator.run(stories)).equals(notes)
+    assert mock.requests == []
+    assert len(checkpoint.read_text().splitlines()) == 4
+
+class MockBatchAPI:
+    """Files and batches stand-in, a batch is in progress on the first poll and completes on the second."""
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+        self.polls = 0
+
+    def completion(self, body: dict) -> dict:
+        story = body["messages"][1]["content"]
+        if story == "bad story":
+            return {"status_code": 400, "body": {"error": {"message": "Bad request"}}}
+        return {"status_code": 200, "body": {
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"notes: {story}"}}],
+        }}
+
+    def batch(self, batch_id: str) -> dict:
+        return {
+            "id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions", "completion_window": "24h",
+            "created_at": 0, **self.batches[batch_id],
+        }
+
+    async def upload(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = form["file"].file.read().decode()
+        assert form["purpose"] == "batch"
+        return web.json_response({
+            "id": file_id, "object": "file", "bytes": len(self.files[file_id]), "created_at": 0,
+            "filename": form["file"].filename, "purpose": "batch", "status": "processed",
+        })
+
+    async def content(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.files[request.match_info["file_id"]])
+
+    async def create(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        batch_id = f"batch-{len(self.batches)}"
+        self.batches[batch_id] = {"input_file_id": body["input_file_id"], "status": "in_progress"}
+        return web.json_response(self.batch(batch_id))
+
+    async def retrieve(self, request: web.Request) -> web.Response:
+        batch_id = request.match_info["batch_id"]
+        batch = self.batches[batch_id]
+        self.polls += 1
+        if batch["status"] == "in_progress" and self.polls % 2 == 0:
+            lines = [json.loads(line) for line in self.files[batch["input_file_id"]].splitlines()]
+            output = "".join(
+                json.dumps({"id": f"req-{i}", "custom_id": line["custom_id"], "response": self.completion(line["body"]), "error": None}) + "\n"
+                for i, line in enumerate(lines)
+            )
+            output_id = f"file-{len(self.files)}"
+            self.files[output_id] = output
+            batch.update(status="completed", output_file_id=output_id)
+        return web.json_response(self.batch(batch_id))
+
+@pytest_asyncio.fixture
+async def mock_batch_api():
+    mock = MockBatchAPI()
+    app = web.Application()
+    app.router.add_post("/v1/files", mock.upload)
+    app.router.add_get("/v1/files/{file_id}/content", mock.content)
+    app.router.add_post("/v1/batches", mock.create)
+    app.router.add_get("/v1/batches/{batch_id}", mock.retrieve)
+    server = TestServer(app)
+    await server.start_server()
+    client = AsyncOpenAI(api_key="test", base_url=str(server.make_url("/v1")), max_retries=0)
+    yield mock, client
+    await client.close()
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_batch_notes_merge_by_custom_id(mock_batch_api, tmp_path):
+    mock, client = mock_batch_api
+    stories = pd.Series({1: "story one", 2: "story two", 3: "bad story", 4: "x" * 5000, 5: "story five"})
+    generator = BatchNotesGenerator(
+        client, str(tmp_path / "notes.jsonl"), str(tmp_path / "batches"), max_requests=2, poll_interval=0,
+        encoding=BYTES, cache=LLMCache(str(tmp_path / "llm_cache.db"))
+    )
+    notes = await generator.run(stories)
+    assert notes[[1, 2, 5]].tolist() == ["notes: story one", "notes: story two", "notes: story five"]
+    assert pd.isna(notes[3]) and pd.isna(notes[4])
+    # four requests split over two batches, the long story is never sent
+    assert len(mock.batches) == 2
+    requests = [json.loads(line) for batch in mock.batches.values() for line in mock.files[batch["input_file_id"]].splitlines()]
+    assert sorted(r["custom_id"] for r in requests) == ["1", "2", "3", "5"]
+    assert generator.load_submitted() == {}
+
+    # only the failed request is resubmitted
+    notes = await generator.run(stories)
+    assert len(mock.batches) == 3
+    assert notes[[1, 2, 5]].tolist() == ["notes: story one", "notes: story two", "notes: story five"]
+
+@pytest.mark.asyncio
+async def test_batch_notes_split_by_bytes(mock_batch_api, tmp_path):
+    mock, client = mock_batch_api
+    stories = pd.Series({i: f"story {i} " + "word " * 200 for i in range(1, 6)})
+    generator = BatchNotesGenerator(
+        client, str(tmp_path / "notes.jsonl"), str(tmp_path / "batches"), poll_interval=0,
+        encoding=BYTES, cache=LLMCache(str(tmp_path / "llm_cache.db"))
+    )
+    # room for two requests per file, well under the request limit
+    line_bytes = len(generator.batch_line("1", generator.params(stories[1])).encode())
+    generator.max_bytes = 2 * line_bytes + 10
+    notes = await generator.run(stories)
+    assert notes.notna().all()
+    files = [mock.files[batch["input_file_id"]] for batch in mock.batches.values()]
+    assert sorted(len(f.splitlines()) for f in files) == [1, 2, 2]
+    assert all(len(f.encode()) <= generator.max_bytes for f in files)
+
+@pytest.mark.asyncio
+async def test_batch_notes_resume_submitted_batch(mock_batch_api, tmp_path):
+    mock, client = mock_batch_api
+    stories = pd.Series({1: "story one", 2: "story two"})
+    generator = BatchNotesGenerator(
+        client, str(tmp_path / "notes.jsonl"), str(tmp_path / "batches"), poll_interval=0,
+        encoding=BYTES, cache=LLMCache(str(tmp_path / "llm_cache.db"))
+    )
+    # a run that crashed after submitting its batch
+    (tmp_path / "batches").mkdir()
+    batch_id = await generator.submit([(str(i), generator.params(text)) for i, text in stories.items()])
+    generator.save_submitted({batch_id: ["1", "2"]})
+
+    notes = await generator.run(stories)
+    assert notes.tolist() == ["notes: story one", "notes: story two"]
+    assert len(mock.batches) == 1
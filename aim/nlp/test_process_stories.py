@@ -0,0 +1,26 @@
+import pandas as pd
+
+from aim.nlp.bench_process_stories import apply_process_stories, synthetic_archive
+from aim.nlp.get_article_summaries import process_stories, stratified_sample
+
+def test_process_stories_matches_apply():
+    stories = synthetic_archive(2000)
+    stories.loc[1, "headline"] = "  Gallery:  the parish"
+    stories.loc[2, "headline"] = "Re:view of the week"
+    stories.loc[3, ["headline", "text"]] = ["Short story", "  two\twords\n"]
+    expected = apply_process_stories(stories)
+    result = process_stories(stories)
+    assert result.index.equals(expected.index)
+    for column in ("full_article", "n_words", "n_words_round_100"):
+        assert result[column].tolist() == expected[column].tolist()
+    assert 2 in result.index and 1 not in result.index
+    assert result.loc[3, "n_words_round_100"] == "<100"
+
+def test_stratified_sample_caps_each_stratum():
+    stories = process_stories(synthetic_archive(2000))
+    sample = stratified_sample(stories, 5)
+    sizes = stories['n_words_round_100'].value_counts()
+    sample_sizes = sample['n_words_round_100'].value_counts()
+    assert all(sample_sizes[k] == min(5, n) for k, n in sizes.items())
+    assert sample.index.is_unique and sample.index.isin(stories.index).all()
+    pd.testing.assert_frame_equal(sample, stratified_sample(stories, 5))
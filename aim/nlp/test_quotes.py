@@ -0,0 +1,135 @@
+import re
+import json
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from openai import AsyncOpenAI
+
+from aim.nlp.llm_cache import LLMCache
+from aim.nlp import quotes as quotes_module
+from aim.nlp.quotes import find_quoted_spans, merge_quotes, normalise_source, parse_quotes, split_chunks, extract_quotes
+
+SPEECH = [
+    "The island must invest in its harbours before the next storm season arrives",
+    "We have been asking for this review for almost ten years now",
+    "Nobody in this assembly should be surprised by the figures",
+]
+
+def transcript(paragraphs: int = 60) -> str:
+    lines = []
+    for i in range(paragraphs):
+        lines.append(f"Deputy {i} rose to speak on the budget amendment and the minister replied at some length.")
+        lines.append(f'The minister said: "{SPEECH[i % len(SPEECH)]}, deputy {i % 4}."')
+    return " ".join(lines)
+
+def test_split_chunks_overlap_and_keep_quotes_whole():
+    text = transcript()
+    spans = find_quoted_spans(text)
+    assert len(spans) == 60
+    chunks = split_chunks(text, spans, chunk_chars=800, overlap_chars=100)
+    assert len(chunks) > 5
+    assert chunks[0][0] == 0 and chunks[-1][0] + len(chunks[-1][1]) == len(text)
+    for (start, chunk), (next_start, _) in zip(chunks, chunks[1:]):
+        assert start < next_start < start + len(chunk) # overlapping
+        assert text[start:start + len(chunk)] == chunk and len(chunk) <= 800
+        # no quoted span is cut at either end of a chunk
+        end = start + len(chunk)
+        assert not any(s < end < e or s < next_start < e for s, e in spans)
+
+def test_merge_quotes_matches_whole_words():
+    text = "Asked if the budget would pass, he said yes. Yesterday the vote was delayed again."
+    merged = merge_quotes([["yes"], ["Yesterday the vote was delayed again"]], text, [])
+    assert sorted(q.text for q in merged) == ["Yesterday the vote was delayed again", "yes"]
+    assert all(q.chunks == 1 for q in merged)
+
+def test_split_chunks_splits_oversized_quotes():
+    speech = " ".join(f"word{i}" for i in range(5000))
+    text = f'{"Preamble. " * 1100}The minister said: "{speech}" and sat down. {"Afterword. " * 1500}'
+    spans = find_quoted_spans(text)
+    assert spans[0][1] - spans[0][0] > 12_000
+    chunks = split_chunks(text, spans)
+    assert all(len(chunk) <= 12_000 for _, chunk in chunks)
+    assert chunks[-1][0] + len(chunks[-1][1]) == len(text)
+    # each chunk only repeats the overlap of the one before
+    for (start, chunk), (next_start, _) in zip(chunks, chunks[1:]):
+        assert start + len(chunk) - 1_000 <= next_start < start + len(chunk)
+
+def test_merge_quotes_dedupes_and_ranks():
+    text = transcript(6)
+    chunk_quotes = [
+        ["1. \"We have been asking for this review for almost ten years now\"", "- The island must invest in its harbours"],
+        ["The island must invest in its harbours before the next storm season arrives", "Deputy 1 rose to speak"],
+        ["An invented quote nobody said"],
+    ]
+    quotes = merge_quotes([parse_quotes("\n".join(q)) for q in chunk_quotes], text, find_quoted_spans(text))
+    assert [q.text for q in quotes] == [
+        "The island must invest in its harbours before the next storm season arrives",
+        "We have been asking for this review for almost ten years now",
+        "Deputy 1 rose to speak",
+        "An invented quote nobody said",
+    ]
+    assert quotes[0].chunks == 2 and quotes[0].quoted
+    assert quotes[-1].position == -1
+
+def test_parse_quotes_strips_markers():
+    assert parse_quotes('1. "One"\n\n- “Two”\n• Three\n"') == ["One", "Two", "Three"]
+    assert parse_quotes(None) == []
+
+class MockOpenAI:
+    """Streams the quoted speech in each chunk, one line per event."""
+
+    def __init__(self):
+        self.chunks = []
+
+    async def completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        chunk = body["messages"][1]["content"]
+        self.chunks.append(chunk)
+        lines = [f"- {q}\n" for q in re.findall(r'"([^"]+)"', chunk)]
+        assert body["stream"]
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, line in enumerate(lines + [None]):
+            choice = {"index": 0, "delta": {"content": line}, "finish_reason": None if line else "stop"}
+            chunk = {"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": body["model"], "choices": [choice]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+@pytest_asyncio.fixture
+async def mock_openai():
+    mock = MockOpenAI()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", mock.completions)
+    server = TestServer(app)
+    await server.start_server()
+    client = AsyncOpenAI(api_key="test", base_url=str(server.make_url("/v1")), max_retries=0)
+    yield mock, client
+    await client.close()
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_extract_quotes_long_document(mock_openai, tmp_path, monkeypatch):
+    mock, client = mock_openai
+    text = transcript()
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    updates = []
+    sources = []
+    monkeypatch.setattr(quotes_module, "normalise_source", lambda *args: sources.append(args) or normalise_source(*args))
+    quotes = await extract_quotes(client, text, chunk_chars=1000, overlap_chars=200, cache=cache, on_update=updates.append)
+    assert len(mock.chunks) > 5
+    # rendered line by line as the chunks stream in, the document is only normalised once
+    assert len(updates) > len(mock.chunks)
+    assert len(sources) == 1
+    assert len(updates[-1]) == len(quotes)
+    # three sentences to four deputies, each found once however many chunks returned it
+    assert len(quotes) == 12
+    assert all(q.quoted and q.position >= 0 for q in quotes)
+    assert {q.text for q in quotes} == {f"{s}, deputy {i}." for s in SPEECH for i in range(4)}
+
+    # streamed responses were cached, a second run makes no requests
+    mock.chunks.clear()
+    assert await extract_quotes(client, text, chunk_chars=1000, overlap_chars=200, cache=cache) == quotes
+    assert mock.chunks == []
@@ -0,0 +1,23 @@
+import pandas as pd
+import tiktoken
+
+from aim.nlp.tokens import count_tokens
+
+# byte level encoding built locally so the test does not download a vocabulary
+BYTES = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={"<|endoftext|>": 256},
+)
+
+def test_count_tokens_series_keeps_index():
+    texts = pd.Series(["abc", None, "a <|endoftext|>"], index=[10, 20, 30], name="full_article")
+    counts = count_tokens(texts, encoding=BYTES, batch_size=2)
+    assert counts.index.tolist() == [10, 20, 30]
+    assert counts.name == "full_article"
+    # special tokens are counted as text rather than raising
+    assert counts.tolist() == [3, 0, 15]
+
+def test_count_tokens_list():
+    assert count_tokens(["ab", "", "abcd"], encoding=BYTES, num_threads=2).tolist() == [2, 0, 4]
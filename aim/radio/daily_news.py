@@ -1,6 +1,7 @@
 import asyncio
 import logging
 
+from aim.news.archive import ArchiveWriter
 from aim.news.bailiwick_express_scraper import BEScraper
 from aim.news.models import NewsStory
 
@@ -16,7 +17,8 @@ class DailyNews:
 
     def __init__(self, speaker: str):
         self.speaker = speaker
-        self.be_scraper = BEScraper()
+        self.archive = ArchiveWriter()
+        self.be_scraper = BEScraper(archive=self.archive)
         self.weather_scraper = GovJeWeather()
         logger.info(f"DailyNews initialized with speaker: {speaker}")
 
@@ -34,6 +36,7 @@ class DailyNews:
     async def close(self):
         logger.info("Closing resources")
         await self.be_scraper.close()
+        await self.archive.close()
 
     async def get_all_data(self):
         logger.info("Fetching all data")
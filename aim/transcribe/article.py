@@ -0,0 +1,135 @@
+""" Hierarchical article generation from long transcripts """
+
+import re
+import asyncio
+import logging
+from typing import Optional
+
+import tiktoken
+from openai import AsyncOpenAI
+
+from aim.nlp.llm_cache import LLMCache, acreate_chat_completion
+from aim.nlp.tokens import get_encoding
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_MODEL = "gpt-4o-mini"
+ARTICLE_PROMPT = """
+    You are a professional journalist writing for a large newspaper about La Saisone Francaise.
+    You will receive a transcription of a piece of media (e.g. a press conference, a conversation, court proceedings).
+    Output a markdown formatted, long-form article, with only headers and paragraphs, based on the content of the transcription.
+    Utilise additional context if provided.
+    Preserve french phrases.
+    You do not need to mention Jersey specifically as it is implied.
+    Keep output factual, neutral and professional, avoiding any emotional phrases like "in a shocking turn of events", "surprisingly", etc.
+"""
+SEGMENT_PROMPT = """
+    You will receive one part of a longer transcription of a piece of media (e.g. a press conference, a conversation, court proceedings).
+    Summarise it as detailed shorthand notes for a journalist: who spoke, what was said, figures, dates and names.
+    Keep the most newsworthy direct quotes word for word. Preserve french phrases. Do not add anything that was not said.
+"""
+SUMMARIES_HEADER = "Notes on consecutive parts of the transcription, in order"
+
+# token budgets, each stage's prompt and completion are bounded so long media takes bounded time
+ARTICLE_INPUT_TOKENS = 24_000 # transcription or notes sent to the article stage
+ARTICLE_MAX_TOKENS = 4_000
+CONTEXT_TOKENS = 2_000 # additional context, truncated beyond this
+SEGMENT_TOKENS = 6_000
+SUMMARY_MAX_TOKENS = 800
+MAX_LEVELS = 3 # rounds of summarising summaries before the notes are truncated
+MAX_CONCURRENCY = 8
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def truncate(text: str, max_tokens: int, encoding: tiktoken.Encoding) -> str:
+    tokens = encoding.encode_ordinary(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def segment_transcript(text: str, max_tokens: int, encoding: tiktoken.Encoding) -> list[str]:
+    """
+    Split a transcript into segments of at most max_tokens, on sentence boundaries where possible.
+    """
+    segments, current, current_tokens = [], [], 0
+    for sentence in SENTENCE_END_RE.split(text.strip()):
+        tokens = encoding.encode_ordinary(sentence + " ")
+        # a run-on sentence, common without punctuation from speech to text, is cut on token boundaries
+        pieces = [tokens[i:i + max_tokens] for i in range(0, len(tokens), max_tokens)] or [[]]
+        for piece in pieces:
+            if current and current_tokens + len(piece) > max_tokens:
+                segments.append("".join(current).strip())
+                current, current_tokens = [], 0
+            current.append(encoding.decode(piece))
+            current_tokens += len(piece)
+    if current and "".join(current).strip():
+        segments.append("".join(current).strip())
+    return segments
+
+
+class ArticleWriter:
+    """
+    Writes an article from a transcript of any length.
+
+    Transcripts within the article stage's input budget are sent whole. Longer ones are split into segments that are
+    summarised concurrently, and the article is written from the segment notes. If the notes are still over budget
+    they are summarised again, up to MAX_LEVELS, then truncated.
+    """
+
+    def __init__(
+            self,
+            client: AsyncOpenAI,
+            model: str = ARTICLE_MODEL,
+            input_tokens: int = ARTICLE_INPUT_TOKENS,
+            segment_tokens: int = SEGMENT_TOKENS,
+            concurrency: int = MAX_CONCURRENCY,
+            encoding: Optional[tiktoken.Encoding] = None,
+            cache: Optional[LLMCache] = None
+        ):
+        if segment_tokens > input_tokens:
+            raise ValueError("segment_tokens must not exceed input_tokens")
+        self.client = client
+        self.model = model
+        self.input_tokens = input_tokens
+        self.segment_tokens = segment_tokens
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.encoding = encoding or get_encoding(model)
+        self.cache = cache
+
+    def n_tokens(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    async def complete(self, messages: list[dict], max_tokens: int) -> str:
+        async with self.semaphore:
+            response = await acreate_chat_completion(self.client, self.cache, model=self.model, messages=messages, max_tokens=max_tokens)
+        return response.choices[0].message.content or ""
+
+    async def summarise(self, segment: str, part: int, parts: int) -> str:
+        return await self.complete([
+            {"role": "system", "content": SEGMENT_PROMPT},
+            {"role": "user", "content": f"Part {part} of {parts}:\n\n{segment}"},
+        ], SUMMARY_MAX_TOKENS)
+
+    async def condense(self, transcription: str) -> str:
+        """
+        The transcription, or notes on it, within the article stage's input budget.
+        """
+        text = transcription
+        for level in range(1, MAX_LEVELS + 1):
+            if self.n_tokens(text) <= self.input_tokens:
+                return text
+            segments = segment_transcript(text, self.segment_tokens, self.encoding)
+            logger.info(f"Summarising {len(segments)} transcript segments, level {level}")
+            summaries = await asyncio.gather(*(self.summarise(s, i, len(segments)) for i, s in enumerate(segments, 1)))
+            text = f"{SUMMARIES_HEADER}:\n\n" + "\n\n".join(f"Part {i}:\n{s.strip()}" for i, s in enumerate(summaries, 1))
+        logger.warning(f"Notes still over {self.input_tokens} tokens after {MAX_LEVELS} levels, truncating")
+        return truncate(text, self.input_tokens, self.encoding)
+
+    async def write(self, transcription: str, additional_context: Optional[str] = None) -> str:
+        messages = [
+            {"role": "system", "content": ARTICLE_PROMPT},
+            {"role": "user", "content": f"Transcription:\n\n{await self.condense(transcription)}"},
+        ]
+        if additional_context:
+            messages.append({"role": "user", "content": f"Additional context:\n\n{truncate(additional_context, CONTEXT_TOKENS, self.encoding)}"})
+        return await self.complete(messages, ARTICLE_MAX_TOKENS)
@@ -1,9 +1,14 @@
 import os
-import frontend as st
+import asyncio
+import threading
+import streamlit as st
 from dotenv import load_dotenv, find_dotenv
 import assemblyai as aai
 import openai
-import whisper
+
+from aim.transcribe.article import ArticleWriter
+from aim.transcribe.whisper_models import REGISTRY, WHISPER_SIZE, default_device, get_model, preload_spec
+from aim.transcribe.engine import TranscriptionEngine, stitch
 
 # Load environment variables
 load_dotenv(find_dotenv())
@@ -17,47 +22,52 @@ aai.settings.api_key = os.getenv("ASSEMBLY_KEY")
 #     transcript = transcriber.transcribe(file_path, config)
 #     return transcript.text
 
-def transcribe_audio(file_path, size='base'):
-    model = whisper.load_model(size)
-    result = model.transcribe(file_path)
-    return result['text']
+@st.cache_resource
+def load_model(size=WHISPER_SIZE, device=None):
+    # shared across sessions and reruns, only the first transcription pays the load
+    return get_model(size, device)
+
+@st.cache_resource
+def load_engine(size=WHISPER_SIZE):
+    # worker processes each keep their own model, so they are only started once
+    return TranscriptionEngine(size)
+
+def transcribe_audio(file_path, size=WHISPER_SIZE, on_segment=None):
+    """
+    On CPU the audio is split at silences and transcribed in parallel, on_segment is called with the
+    segments finished so far. A GPU transcribes the whole file in process.
+    """
+    if default_device() != "cpu":
+        result = load_model(size).transcribe(file_path)
+        return result['text']
+    segments = []
+    for segment in load_engine(size).transcribe(file_path):
+        segments.append(segment)
+        if on_segment is not None:
+            on_segment(segments)
+    return stitch(segments)
+
+async def write_article(transcription, additional_context):
+    async with openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_KEY")) as client:
+        return await ArticleWriter(client).write(transcription, additional_context)
 
 def generate_article(transcription, additional_context):
-    client = openai.OpenAI(
-        api_key=os.environ.get("OPENAI_KEY"),
-    )
-    messages = [
-        {
-            "role": "system",
-            "content": 
-                """
-                You are a professional journalist writing for a large newspaper about La Saisone Francaise.
-                You will receive a transcription of a piece of media (e.g. a press conference, a conversation, court proceedings).
-                Output a markdown formatted, long-form article, with only headers and paragraphs, based on the content of the transcription.
-                Utilise additional context if provided.
-                Preserve french phrases.
-                You do not need to mention Jersey specifically as it is implied.
-                Keep output factual, neutral and professional, avoiding any emotional phrases like "in a shocking turn of events", "surprisingly", etc.
-                """
-        },
-        {
-            "role": "user",
-            "content": f"Transcription:\n\n{transcription}"
-        }
-    ]
-    if additional_context:
-        messages.append(
-            {
-                "role": "user",
-                "content": f"Additional context:\n\n{additional_context}"
-            }
-        )
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages
-    )
-    article = response.choices[0].message.content
-    return article
+    # long transcriptions are summarised in segments first, see aim.transcribe.article
+    return asyncio.run(write_article(transcription, additional_context))
+
+@st.cache_resource
+def preload_models():
+    # models listed in AIM_WHISPER_PRELOAD load in the background once per process, a transcription
+    # started meanwhile waits for its model rather than loading it again
+    if default_device() != "cpu":
+        threading.Thread(target=REGISTRY.preload, daemon=True).start()
+        return
+    # on CPU only the engine's workers transcribe, so start them with their models rather than load one here
+    for size, device in preload_spec():
+        if device in (None, "cpu"):
+            threading.Thread(target=load_engine(size).warm, daemon=True).start()
+
+preload_models()
 
 # Streamlit app
 st.title("Auto-Article")
@@ -71,8 +81,14 @@ if file_path:
 # Transcribe button
 if st.button("Transcribe"):
     if file_path:
+        # partial transcription, updated as each segment finishes
+        partial = st.empty()
         with st.spinner("Transcribing..."):
-            transcription = transcribe_audio(file_path)
+            transcription = transcribe_audio(
+                file_path,
+                on_segment=lambda segments: partial.text(f"{len(segments)} segments done\n\n{stitch(segments)}")
+            )
+        partial.empty()
         
         st.success("Transcription complete!")
         st.text_area("Transcription:", value=transcription, height=300)
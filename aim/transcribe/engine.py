@@ -0,0 +1,181 @@
+""" Parallel Whisper transcription of audio split at silences """
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from aim.transcribe.whisper_models import WHISPER_SIZE, ModelRegistry, load_whisper
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16_000 # whisper resamples everything to 16kHz mono
+FRAME_MS = 30
+SILENCE_DB = -35.0 # frames this far below the loudest frame count as silence
+MIN_SILENCE_MS = 300
+SEGMENT_SECONDS = 120 # aim for segments this long, cut at the nearest silence
+MIN_SEGMENT_SECONDS = 30
+MAX_SEGMENT_SECONDS = 180 # cut without a silence rather than exceed this
+
+WORKER_MODEL = None # the model loaded by init_worker in each pool process
+
+
+@dataclass
+class TranscribedSegment:
+    index: int
+    start: float # seconds from the start of the file
+    end: float
+    text: str
+    segments: list[dict] = field(default_factory=list) # whisper segments with timestamps stitched to the file
+
+
+def frame_db(audio: np.ndarray, frame: int) -> np.ndarray:
+    """
+    RMS energy of each frame in dB relative to the loudest frame.
+    """
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame).astype(np.float32)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10) / max(float(rms.max(initial=0)), 1e-10))
+
+
+def silence_midpoints(
+        audio: np.ndarray,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = FRAME_MS,
+        silence_db: float = SILENCE_DB,
+        min_silence_ms: int = MIN_SILENCE_MS
+    ) -> np.ndarray:
+    """
+    Sample offsets at the middle of every silence of at least min_silence_ms, a simple energy VAD.
+    """
+    frame = sample_rate * frame_ms // 1000
+    silent = frame_db(audio, frame) < silence_db
+    # starts and ends of runs of silent frames
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = (ends - starts) * frame_ms >= min_silence_ms
+    return ((starts + ends)[long_enough] * frame) // 2
+
+
+def plan_segments(
+        n_samples: int,
+        cuts: np.ndarray,
+        sample_rate: int = SAMPLE_RATE,
+        target_seconds: float = SEGMENT_SECONDS,
+        min_seconds: float = MIN_SEGMENT_SECONDS,
+        max_seconds: float = MAX_SEGMENT_SECONDS
+    ) -> list[tuple[int, int]]:
+    """
+    (start, end) samples of segments between min_seconds and max_seconds long, cut at the silence
+    nearest target_seconds. The last segment may be shorter.
+    """
+    target, low, high = (int(s * sample_rate) for s in (target_seconds, min_seconds, max_seconds))
+    segments = []
+    start = 0
+    while n_samples - start > high:
+        candidates = cuts[(cuts >= start + low) & (cuts <= start + high)]
+        end = int(candidates[np.argmin(np.abs(candidates - start - target))]) if len(candidates) else start + high
+        segments.append((start, end))
+        start = end
+    if start < n_samples:
+        segments.append((start, n_samples))
+    return segments
+
+
+def init_worker(size: str, device: str, loader: Callable, num_threads: Optional[int]) -> None:
+    """
+    Load the model once per pool process, every segment the process transcribes reuses it.
+    """
+    global WORKER_MODEL
+    if num_threads:
+        try:
+            import torch
+            torch.set_num_threads(num_threads)
+        except ImportError:
+            pass
+    WORKER_MODEL = ModelRegistry(loader).get(size, device)
+
+
+def worker_ready() -> bool:
+    return WORKER_MODEL is not None
+
+
+def transcribe_segment(index: int, audio: np.ndarray, offset: float, options: dict) -> TranscribedSegment:
+    result = WORKER_MODEL.transcribe(audio, **options)
+    segments = [
+        {**segment, "start": segment["start"] + offset, "end": segment["end"] + offset}
+        for segment in result.get("segments", [])
+    ]
+    return TranscribedSegment(index, offset, offset + len(audio) / SAMPLE_RATE, result["text"].strip(), segments)
+
+
+def stitch(segments: list[TranscribedSegment]) -> str:
+    """
+    Full transcript from segments finished in any order.
+    """
+    return " ".join(s.text for s in sorted(segments, key=lambda s: s.index) if s.text)
+
+
+class TranscriptionEngine:
+    """
+    Transcribes audio across a pool of processes, each with its own copy of the model loaded at startup.
+
+    Audio is split at silences into segments of about SEGMENT_SECONDS so no word is cut in half, and segments
+    are transcribed in parallel. Results are yielded as segments finish, with timestamps relative to the file.
+    The pool is kept between files, keep one engine per process.
+    """
+
+    def __init__(
+            self,
+            size: str = WHISPER_SIZE,
+            device: str = "cpu",
+            workers: Optional[int] = None,
+            loader: Callable = load_whisper,
+            options: Optional[dict] = None
+        ):
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        # split the cores between workers rather than every worker's torch using all of them
+        num_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.options = {"fp16": device != "cpu", **(options or {})}
+        self.pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"), # forking a process with torch or streamlit threads can deadlock
+            initializer=init_worker,
+            initargs=(size, device, loader, num_threads),
+        )
+
+    def close(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+    def warm(self) -> int:
+        """
+        Start every worker and wait for its model to load, so the first file doesn't pay for it.
+        The pool starts a process per task submitted while none are idle, so one task each starts them all.
+        """
+        return sum(future.result() for future in [self.pool.submit(worker_ready) for _ in range(self.workers)])
+
+    def transcribe_array(self, audio: np.ndarray) -> Iterator[TranscribedSegment]:
+        plan = plan_segments(len(audio), silence_midpoints(audio))
+        logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio in {len(plan)} segments on {self.workers} workers")
+        futures = [
+            self.pool.submit(transcribe_segment, i, audio[start:end], start / SAMPLE_RATE, self.options)
+            for i, (start, end) in enumerate(plan)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def transcribe(self, path: str) -> Iterator[TranscribedSegment]:
+        """
+        Segments of a media file in the order they finish, decoded to 16kHz mono with ffmpeg.
+        """
+        from whisper.audio import load_audio
+        yield from self.transcribe_array(load_audio(path, SAMPLE_RATE))
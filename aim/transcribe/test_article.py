@@ -0,0 +1,96 @@
+import pytest
+import pytest_asyncio
+import tiktoken
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from openai import AsyncOpenAI
+
+from aim.nlp.llm_cache import LLMCache
+from aim.transcribe.article import ArticleWriter, SUMMARIES_HEADER, segment_transcript
+
+BYTES = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+def transcript(n: int) -> str:
+    return " ".join(f"Speaker {i % 3} made point number {i}." for i in range(n))
+
+def test_segment_transcript_respects_budget():
+    text = transcript(200)
+    segments = segment_transcript(text, 300, BYTES)
+    assert all(len(BYTES.encode_ordinary(s)) <= 300 for s in segments)
+    # split between sentences, nothing lost
+    assert all(s.endswith(".") for s in segments)
+    assert " ".join(segments) == text
+
+def test_segment_transcript_cuts_run_on_speech():
+    text = "word " * 500
+    segments = segment_transcript(text, 128, BYTES)
+    assert len(segments) == 20
+    assert all(len(BYTES.encode_ordinary(s)) <= 128 for s in segments)
+
+class MockOpenAI:
+    """Summaries are a fixed length, the article reports how many characters of transcription it was given."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.requests.append(body)
+        user = body["messages"][1]["content"]
+        if user.startswith("Part"):
+            content = f"notes on {user.split(':')[0].lower()}"
+        else:
+            content = f"article from {len(user)} characters"
+        return web.json_response({
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        })
+
+@pytest_asyncio.fixture
+async def mock_openai():
+    mock = MockOpenAI()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", mock.completions)
+    server = TestServer(app)
+    await server.start_server()
+    client = AsyncOpenAI(api_key="test", base_url=str(server.make_url("/v1")), max_retries=0)
+    yield mock, client
+    await client.close()
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_short_transcript_sent_whole(mock_openai, tmp_path):
+    mock, client = mock_openai
+    writer = ArticleWriter(client, input_tokens=5000, segment_tokens=1000, encoding=BYTES, cache=LLMCache(str(tmp_path / "cache.db")))
+    text = transcript(50)
+    await writer.write(text, "context")
+    assert len(mock.requests) == 1
+    assert text in mock.requests[0]["messages"][1]["content"]
+    assert mock.requests[0]["messages"][2]["content"] == "Additional context:\n\ncontext"
+
+@pytest.mark.asyncio
+async def test_long_transcript_summarised_in_segments(mock_openai, tmp_path):
+    mock, client = mock_openai
+    writer = ArticleWriter(client, input_tokens=2000, segment_tokens=1000, encoding=BYTES, cache=LLMCache(str(tmp_path / "cache.db")))
+    await writer.write(transcript(500))
+    summaries, article = mock.requests[:-1], mock.requests[-1]
+    assert len(summaries) == 17
+    assert all(r["max_tokens"] <= 800 for r in summaries)
+    prompt = article["messages"][1]["content"]
+    assert SUMMARIES_HEADER in prompt and "Part 17:\nnotes on part 17 of 17" in prompt
+    assert len(BYTES.encode_ordinary(prompt)) <= 2000 + 20
+
+@pytest.mark.asyncio
+async def test_notes_summarised_again_until_within_budget(mock_openai, tmp_path):
+    mock, client = mock_openai
+    # notes on 100 segments are still over a 1000 token budget, so they are summarised a second time
+    writer = ArticleWriter(client, input_tokens=1000, segment_tokens=100, encoding=BYTES, cache=LLMCache(str(tmp_path / "cache.db")))
+    await writer.write(transcript(300))
+    prompt = mock.requests[-1]["messages"][1]["content"]
+    assert len(BYTES.encode_ordinary(prompt)) <= 1000 + 20
+    assert len(mock.requests) > 100
@@ -0,0 +1,50 @@
+import numpy as np
+
+from aim.transcribe.engine import SAMPLE_RATE, TranscriptionEngine, plan_segments, silence_midpoints, stitch
+
+def speech(seconds: float, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(-0.5, 0.5, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+class LengthModel:
+    """Transcribes audio as its length in seconds, one whisper style segment per call."""
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        seconds = len(audio) / SAMPLE_RATE
+        return {"text": f" {seconds:.1f}s", "segments": [{"id": 0, "start": 0.0, "end": seconds, "text": f"{seconds:.1f}s"}]}
+
+def load_length_model(size: str, device: str) -> LengthModel:
+    return LengthModel()
+
+def test_silence_midpoints():
+    audio = np.concatenate([speech(5), silence(1), speech(5), silence(0.1), speech(5)])
+    cuts = silence_midpoints(audio)
+    # the 0.1s pause is too short to cut at
+    assert len(cuts) == 1
+    assert abs(cuts[0] / SAMPLE_RATE - 5.5) < 0.05
+
+def test_plan_segments_cut_at_silence_nearest_target():
+    cuts = np.array([20, 50, 110, 130, 250, 400]) * SAMPLE_RATE
+    plan = plan_segments(500 * SAMPLE_RATE, cuts, target_seconds=120, min_seconds=30, max_seconds=180)
+    assert [(s // SAMPLE_RATE, e // SAMPLE_RATE) for s, e in plan] == [(0, 110), (110, 250), (250, 400), (400, 500)]
+    # no silence within reach, cut at the maximum length
+    plan = plan_segments(400 * SAMPLE_RATE, np.array([], dtype=int), max_seconds=180)
+    assert [(s // SAMPLE_RATE, e // SAMPLE_RATE) for s, e in plan] == [(0, 180), (180, 360), (360, 400)]
+
+def test_engine_stitches_timestamps():
+    # four minutes of speech with a pause every 50 seconds
+    audio = np.concatenate([np.concatenate([speech(50, i), silence(1)]) for i in range(5)])
+    engine = TranscriptionEngine(workers=2, loader=load_length_model)
+    try:
+        assert engine.warm() == 2
+        segments = list(engine.transcribe_array(audio))
+    finally:
+        engine.close()
+    segments.sort(key=lambda s: s.index)
+    assert len(segments) == 2
+    assert segments[0].start == 0 and segments[1].start == segments[0].end
+    assert segments[1].segments[0]["start"] == segments[1].start
+    assert segments[-1].end == len(audio) / SAMPLE_RATE
+    assert stitch(segments[::-1]) == " ".join(s.text for s in segments)
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from aim.transcribe.whisper_models import PRELOAD_ENV, ModelRegistry
+
+class CountingLoader:
+    """Loads are slow and counted per key."""
+
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, size: str, device: str):
+        self.loads.append((size, device))
+        time.sleep(0.05)
+        return object()
+
+def test_registry_loads_each_key_once():
+    loader = CountingLoader()
+    registry = ModelRegistry(loader)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get("base", "cpu"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.loads == [("base", "cpu")]
+    assert all(m is models[0] for m in models)
+    assert registry.get("small", "cpu") is not models[0]
+    assert loader.loads == [("base", "cpu"), ("small", "cpu")]
+
+def test_preload_from_env(monkeypatch):
+    loader = CountingLoader()
+    registry = ModelRegistry(loader)
+    monkeypatch.setenv(PRELOAD_ENV, "base:cpu, small:cuda,")
+    registry.preload()
+    assert loader.loads == [("base", "cpu"), ("small", "cuda")]
+    registry.get("small", "cuda")
+    assert len(loader.loads) == 2
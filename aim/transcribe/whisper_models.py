@@ -0,0 +1,71 @@
+""" Process-wide registry of loaded Whisper models """
+
+import os
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SIZE = "base"
+# comma separated size or size:device entries loaded by preload, e.g. "base,small:cpu"
+PRELOAD_ENV = "AIM_WHISPER_PRELOAD"
+
+
+def default_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_whisper(size: str, device: str):
+    import whisper
+    return whisper.load_model(size, device=device)
+
+
+def preload_spec(spec: Optional[str] = None) -> list[tuple[str, Optional[str]]]:
+    """
+    (size, device) pairs from spec, by default the PRELOAD_ENV environment variable, device None if not given.
+    """
+    spec = os.getenv(PRELOAD_ENV, "") if spec is None else spec
+    entries = filter(None, (e.strip() for e in spec.split(",")))
+    return [(size, device or None) for size, _, device in (entry.partition(":") for entry in entries)]
+
+
+class ModelRegistry:
+    """
+    Loaded models by (size, device), each loaded at most once per process.
+    A model being loaded blocks other callers asking for the same key only.
+    """
+
+    def __init__(self, loader: Callable = load_whisper):
+        self.loader = loader
+        self.models = {}
+        self.locks: dict[tuple[str, str], threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def get(self, size: str = WHISPER_SIZE, device: Optional[str] = None):
+        key = (size, device or default_device())
+        model = self.models.get(key)
+        if model is not None:
+            return model
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.models:
+                logger.info(f"Loading Whisper {key[0]} on {key[1]}")
+                self.models[key] = self.loader(*key)
+            return self.models[key]
+
+    def preload(self, spec: Optional[str] = None) -> None:
+        """
+        Load the models in spec, by default the PRELOAD_ENV environment variable, so the first transcription is warm.
+        """
+        for size, device in preload_spec(spec):
+            self.get(size, device)
+
+
+REGISTRY = ModelRegistry()
+
+
+def get_model(size: str = WHISPER_SIZE, device: Optional[str] = None):
+    return REGISTRY.get(size, device)
@@ -0,0 +1,45 @@
+""" Benchmark weather report extraction against the saved gov.je fixtures """
+
+import os
+import timeit
+
+from bs4 import BeautifulSoup
+
+from aim.weather.report import WeatherReport
+from aim.weather.tides import parse_time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FIXTURES = ("gov_je.html", "gov_ge.html")
+NUMBER = 200
+
+
+def repeated_find(soup: BeautifulSoup) -> None:
+    """
+    The previous approach, each field looked up with its own find/find_all for both the email and radio.
+    """
+    for _ in ("email", "radio"):
+        soup.find_all('span', class_='boldWeather')
+        soup.find('div', class_='weathergrid').find('div', class_='borderLeft')
+        soup.find('table', class_='tide-mobile').find_all('tr')
+        soup.find_all('p', class_='description')
+
+
+def bench(name: str, fn, number: int = NUMBER) -> None:
+    seconds = timeit.timeit(fn, number=number)
+    print(f"  {name:<20} {seconds / number * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+
+    for fixture in FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, fixture)) as f:
+            html = f.read()
+        soup = BeautifulSoup(html, "html.parser")
+        report = WeatherReport.from_soup(soup, parse_time=parse_time)
+
+        print(fixture)
+        bench("parse html", lambda: BeautifulSoup(html, "html.parser"), number=NUMBER // 10)
+        bench("repeated find", lambda: repeated_find(soup))
+        bench("single pass", lambda: WeatherReport.from_soup(soup, parse_time=parse_time))
+        bench("render email", report.to_email)
+        bench("render radio", report.to_radio)
@@ -1,16 +1,76 @@
 import aiohttp
+import base64
 import os
-from datetime import datetime, timedelta
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 import asyncio
 
+import numpy as np
 from urllib.parse import urljoin
 
+logger = logging.getLogger(__name__)
+
+# forecasts by request url, shared by every client in the process since a client is made per build
+FORECAST_CACHE: dict[str, tuple[float, "MeteoForecast"]] = {}
+MAX_CACHED_FORECASTS = 64 # oldest entries are dropped beyond this, expired ones on every insert
+
+@dataclass
+class MeteoForecast:
+    """
+    Decoded Meteomatics response, one array per parameter per location, aligned with times.
+    """
+    times: np.ndarray
+    locations: dict[str, dict[str, np.ndarray]] = field(default_factory=dict)
+
+    def __getitem__(self, location: str) -> dict[str, np.ndarray]:
+        return self.locations[location]
+
+    def nearest(self, now: Optional[datetime] = None) -> int:
+        """
+        Index of the forecast hour nearest now, times are UTC.
+        """
+        now = now or datetime.now(timezone.utc)
+        if now.tzinfo:
+            now = now.astimezone(timezone.utc).replace(tzinfo=None)
+        return int(np.abs(self.times - np.datetime64(now, 's')).argmin())
+
+    def summary(self, location: str) -> str:
+        """
+        Summarise the forecast for a location as a short human readable string.
+        """
+        values = self.locations[location]
+        symbols = values[MeteoWeather.WEATHER_SYMBOL].astype(int) % 100 # night symbols are offset by 100
+        symbol = np.bincount(symbols).argmax()
+        temps = values[MeteoWeather.TEMPERATURE]
+        wind = values[MeteoWeather.WIND_SPEED].mean()
+        direction = MeteoWeather.compass(float(values[MeteoWeather.WIND_DIRECTION].mean()))
+        rain = values[MeteoWeather.PRECIPITATION].sum()
+        return (
+            f"{MeteoWeather.WEATHER_SYMBOL_MAP.get(int(symbol), 'Unknown')}, "
+            f"{temps.min():.0f}-{temps.max():.0f}°C, "
+            f"wind {direction} {wind:.0f}m/s, "
+            f"{rain:.1f}mm rain"
+        )
+
 class MeteoWeather:
 
     BASE_URL = "https://api.meteomatics.com/"
     ST_HELIER_COORDS = (49.1856637,-2.1102277)
+    ST_PETER_PORT_COORDS = (49.4551, -2.5365)
     ST_HELIER_ABOVE_SEALEVEL = "2m"
+    LOCATIONS = {
+        "jsy": ST_HELIER_COORDS,
+        "gsy": ST_PETER_PORT_COORDS,
+    }
+    TEMPERATURE = "t_2m:C"
+    WEATHER_SYMBOL = "weather_symbol_1h:idx"
+    WIND_SPEED = "wind_speed_10m:ms"
+    WIND_DIRECTION = "wind_dir_10m:d"
+    PRECIPITATION = "precip_1h:mm"
+    FORECAST_PARAMETERS = (TEMPERATURE, WEATHER_SYMBOL, WIND_SPEED, WIND_DIRECTION, PRECIPITATION)
     WEATHER_SYMBOL_MAP = {
         0: "A weather symbol could not be determined",
         1: "Clear sky",
@@ -31,11 +91,53 @@ class MeteoWeather:
         16: "Sandstorm"
     }
 
-    def __init__(self, user, password):
+    def __init__(self, user, password, base_url: str = BASE_URL, cache_ttl: float = 15 * 60):
         self.session = aiohttp.ClientSession()
-        self.base_url = "https://api.meteomatics.com/"
+        self.base_url = base_url
         self.user = user
         self.password = password
+        self.cache_ttl = cache_ttl
+        self.cache = FORECAST_CACHE
+        credentials = base64.b64encode(f"{user}:{password}".encode()).decode()
+        self.headers = {"Authorization": f"Basic {credentials}"}
+
+    async def close(self):
+        await self.session.close()
+
+    async def get_forecast(self, locations: Optional[list[str]] = None, timerange: Optional[str] = None, interval: str = "PT1H") -> MeteoForecast:
+        """
+        Get temperature, weather symbol, wind and precipitation for all locations in a single request.
+        """
+        locations = locations or list(self.LOCATIONS)
+        timerange = timerange or self.timerange_today()
+        url = self.make_url(
+            timerange=f"{timerange}:{interval}",
+            parameters=self.join_param_strings(*self.FORECAST_PARAMETERS),
+            location='+'.join(','.join(map(str, self.LOCATIONS[loc])) for loc in locations),
+            output='json'
+        )
+        cached = self.cache.get(url)
+        if cached and cached[0] > time.monotonic():
+            logger.debug(f"Meteomatics cache hit for {url}")
+            return cached[1]
+        async with self.session.get(url, headers=self.headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+        forecast = self.parse_weather_response(data, locations)
+        self.cache_forecast(url, forecast)
+        return forecast
+
+    def cache_forecast(self, url: str, forecast: MeteoForecast) -> None:
+        """
+        Cache a forecast, dropping expired entries and then the oldest beyond MAX_CACHED_FORECASTS.
+        """
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self.cache.items() if expires <= now]:
+            del self.cache[key]
+        self.cache.pop(url, None)
+        self.cache[url] = (now + self.cache_ttl, forecast)
+        while len(self.cache) > MAX_CACHED_FORECASTS:
+            del self.cache[next(iter(self.cache))]
 
     async def get_weather_symbol(self, location: Optional[tuple[str]] = None, timerange: Optional[str] = None):
         """
@@ -51,22 +153,34 @@ class MeteoWeather:
             location=','.join(map(str,location)),
             output='json'
         )
-        async with self.session.get(url, auth=aiohttp.BasicAuth(self.user, self.password)) as response:
+        async with self.session.get(url, headers=self.headers) as response:
             return await response.json()
-        
-    def parse_weather_response(self, response):
+
+    def parse_weather_response(self, response: dict, locations: Optional[list[str]] = None) -> MeteoForecast:
         """
-        Parse the weather response and return a human readable string.
+        Decode the weather response into arrays per location and parameter.
+        Coordinates are returned in the order they were requested.
         """
-        data = response['data'][0]
-        
-        
+        locations = locations or list(self.LOCATIONS)
+        data = response['data']
+        dates = data[0]['coordinates'][0]['dates']
+        forecast = MeteoForecast(
+            times=np.array([d['date'].rstrip('Z') for d in dates], dtype='datetime64[s]'),
+            locations={loc: {} for loc in locations}
+        )
+        for parameter in data:
+            for loc, coordinate in zip(locations, parameter['coordinates']):
+                forecast.locations[loc][parameter['parameter']] = np.array(
+                    [d['value'] for d in coordinate['dates']], dtype=float
+                )
+        return forecast
+
     def join_param_strings(self, *params):
         """
         Generate a parameter string for the given parameters.
         """
         return ",".join(params)
-    
+
     def weather_symbol_param(self, period: str = "24h"):
         """
         Generate the parameter string for weather symbols.
@@ -74,7 +188,7 @@ class MeteoWeather:
         if period not in ["24h", "1h"]:
             raise ValueError(f"Invalid period, must be one of '24h' or '1h', got {period}")
         return f"weather_symbol_{period}:idx"
-        
+
     def temperature_param(self, altitude: str, unit: str):
         """
         Generate the parameter string for temperature at a given altitude.
@@ -87,22 +201,29 @@ class MeteoWeather:
         """
         tail = "/".join([timerange, parameters, location, output + '?' + optionals])
         return urljoin(self.base_url, tail)
-        
+
     def timerange_today(self):
         """
         Get the timerange for today.
         """
         return (
-            datetime.today().date().strftime("%Y-%m-%dT%H:%M:%SZ") 
+            datetime.today().date().strftime("%Y-%m-%dT%H:%M:%SZ")
             + "--" + (datetime.today().date() + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
         )
 
     def timestamp(self):
         """
-        Get timestamp in meteomatic format: 2024-12-31T23:59:59Z 
+        Get timestamp in meteomatic format: 2024-12-31T23:59:59Z
         """
         return datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
 
+    @staticmethod
+    def compass(degrees: float) -> str:
+        """
+        Convert a wind direction in degrees to an 8 point compass direction.
+        """
+        return ["N", "NE", "E", "SE", "S", "SW", "W", "NW"][round(degrees / 45) % 8]
+
 
 if __name__=="__main__":
 
@@ -111,8 +232,10 @@ if __name__=="__main__":
 
     async def main():
         weather = MeteoWeather(os.getenv("METEO_USER"), os.getenv("METEO_PASSWORD"))
-        response = await weather.get_weather_symbol()
-        breakpoint()
+        forecast = await weather.get_forecast()
+        for location in weather.LOCATIONS:
+            print(location, forecast.summary(location))
+        await weather.close()
 
     import uvloop
-    uvloop.run(main())
\ No newline at end of file
+    uvloop.run(main())
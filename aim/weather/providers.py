@@ -0,0 +1,217 @@
+""" Hedged weather providers, all sources race under one deadline and the first complete report wins """
+
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from aim.weather.gov_je import GovJeWeather
+from aim.weather.gov_ge import GovGeWeather
+from aim.weather.meteo import MeteoWeather
+from aim.weather.report import WeatherReport
+from aim.weather.tides import TideIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderStats:
+    """
+    Running latency and win rate for a weather provider.
+    """
+    attempts: int = 0
+    wins: int = 0
+    failures: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=100))
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.attempts if self.attempts else 0.0
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+
+# shared across builds in the same process
+PROVIDER_STATS: dict[str, ProviderStats] = {}
+
+
+class IncompleteReportError(ValueError):
+    """
+    Raised by a provider whose report is missing fields, carries the partial report.
+    """
+
+    def __init__(self, report: WeatherReport):
+        super().__init__("Incomplete weather report")
+        self.report = report
+
+    @property
+    def n_fields(self) -> int:
+        return sum(map(bool, (self.report.temperatures, self.report.summary, self.report.descriptions, self.report.tides)))
+
+
+class WeatherProvider(ABC):
+
+    name: str = ""
+
+    @abstractmethod
+    async def get_report(self) -> WeatherReport:
+        """
+        Get a complete weather report, raising if any field is missing.
+        """
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @staticmethod
+    def check_complete(report: WeatherReport) -> WeatherReport:
+        if not (report.temperatures and report.summary and report.descriptions and report.tides):
+            raise IncompleteReportError(report)
+        return report
+
+
+class GovHttpProvider(WeatherProvider):
+    """
+    gov.je fetched with a plain http request, fast but only works when the page is server rendered.
+    """
+
+    def __init__(self, weather: GovJeWeather):
+        self.weather = weather
+        self.name = f"gov_http_{weather.LOCATION}"
+
+    async def get_report(self) -> WeatherReport:
+        soup = await self.weather.get_http()
+        return self.check_complete(self.weather.parse_report(soup))
+
+
+class GovBrowserProvider(WeatherProvider):
+    """
+    gov.je rendered in headless Chrome.
+    """
+
+    def __init__(self, weather: GovJeWeather):
+        self.weather = weather
+        self.name = f"gov_browser_{weather.LOCATION}"
+
+    async def get_report(self) -> WeatherReport:
+        return self.check_complete(await self.weather.get_report())
+
+
+class MeteoProvider(WeatherProvider):
+    """
+    Meteomatics forecast, with tides from the local tide index.
+    """
+
+    def __init__(self, meteo: MeteoWeather, location: str, tide_index: Optional[TideIndex] = None):
+        self.meteo = meteo
+        self.location = location
+        self.tide_index = tide_index or TideIndex.load()
+        self.name = f"meteo_{location}"
+
+    async def get_report(self) -> WeatherReport:
+        # tides only come from the index, don't pay for a forecast that can't make a complete report
+        if not self.tide_index.covers(self.location):
+            raise ValueError(f"No tides indexed for {self.location} today")
+        forecast = await self.meteo.get_forecast([self.location])
+        values = forecast[self.location]
+        # the timerange starts at midnight, report from the current hour on
+        hour = forecast.nearest()
+        symbol = int(values[MeteoWeather.WEATHER_SYMBOL][hour]) % 100
+        report = WeatherReport(
+            temperatures=[f"{temp:.0f}°C" for temp in values[MeteoWeather.TEMPERATURE][hour:]],
+            summary=MeteoWeather.WEATHER_SYMBOL_MAP.get(symbol, "").lower(),
+            descriptions=[forecast.summary(self.location)],
+            tides=self.tide_index.get_tides(self.location),
+        )
+        return self.check_complete(report)
+
+    async def close(self) -> None:
+        await self.meteo.close()
+
+
+class HedgedWeather:
+    """
+    Fire every provider concurrently, return the first complete report and cancel the rest.
+    """
+
+    def __init__(self, providers: list[WeatherProvider], deadline: float = 30):
+        self.providers = providers
+        self.deadline = deadline
+
+    @classmethod
+    def for_location(cls, weather: GovJeWeather, deadline: float = 30) -> "HedgedWeather":
+        """
+        Default providers for a location, Meteomatics is only used when credentials are configured
+        and the tide index covers today.
+        """
+        providers = [GovHttpProvider(weather), GovBrowserProvider(weather)]
+        if os.getenv("METEO_USER") and os.getenv("METEO_PASSWORD") and weather.tide_index.covers(weather.LOCATION):
+            meteo = MeteoWeather(os.getenv("METEO_USER"), os.getenv("METEO_PASSWORD"))
+            providers.append(MeteoProvider(meteo, weather.LOCATION, weather.tide_index))
+        return cls(providers, deadline)
+
+    @classmethod
+    def jersey(cls, deadline: float = 30) -> "HedgedWeather":
+        return cls.for_location(GovJeWeather(), deadline)
+
+    @classmethod
+    def guernsey(cls, deadline: float = 30) -> "HedgedWeather":
+        return cls.for_location(GovGeWeather(), deadline)
+
+    async def get_to_email(self) -> dict:
+        report = await self.get_report()
+        return report.to_email()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(provider.close() for provider in self.providers))
+
+    async def _timed(self, provider: WeatherProvider) -> tuple[WeatherProvider, WeatherReport]:
+        stats = PROVIDER_STATS.setdefault(provider.name, ProviderStats())
+        stats.attempts += 1
+        start = time.perf_counter()
+        try:
+            report = await provider.get_report()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats.failures += 1
+            logger.info(f"Weather provider {provider.name} failed: {e}")
+            raise
+        stats.latencies.append(time.perf_counter() - start)
+        return provider, report
+
+    async def get_report(self) -> WeatherReport:
+        """
+        Race all providers under the deadline. If none complete in time, logs the failure and returns the
+        most complete partial report, or an empty report, so a weather outage doesn't fail the whole build.
+        """
+        pending = {asyncio.create_task(self._timed(provider)) for provider in self.providers}
+        partial: Optional[IncompleteReportError] = None
+        try:
+            async with asyncio.timeout(self.deadline):
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        error = task.exception()
+                        if error is None:
+                            provider, report = task.result()
+                            stats = PROVIDER_STATS[provider.name]
+                            stats.wins += 1
+                            logger.info(f"Weather from {provider.name} in {stats.latencies[-1]:.2f}s, win rate {stats.win_rate:.0%}")
+                            return report
+                        if isinstance(error, IncompleteReportError) and (partial is None or error.n_fields > partial.n_fields):
+                            partial = error
+            logger.error("All weather providers failed")
+        except TimeoutError:
+            logger.error(f"No complete weather report within {self.deadline}s")
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return partial.report if partial is not None else WeatherReport()
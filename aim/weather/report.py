@@ -0,0 +1,116 @@
+""" Structured weather report shared by the gov.je Jersey and Guernsey forecasts """
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from bs4 import BeautifulSoup
+
+
+def replace_force(report: str) -> str:
+    """
+    Replace capital F followed by number with "Force {n}".
+    """
+    return re.sub(r'F(\d)', r'Force \1', report)
+
+
+@dataclass
+class Tide:
+    direction: str
+    time: str
+    height: str
+
+
+@dataclass
+class WeatherReport:
+    """
+    Everything the email and radio script need from a forecast page, extracted in one pass.
+    """
+    temperatures: list[str] = field(default_factory=list)
+    summary: str = ""
+    descriptions: list[str] = field(default_factory=list)
+    tides: list[Tide] = field(default_factory=list)
+    date: datetime = field(default_factory=datetime.now)
+
+    @classmethod
+    def from_soup(cls, soup: BeautifulSoup, parse_time: Optional[Callable[[str], str]] = None) -> "WeatherReport":
+        """
+        Walk the document once, collecting temperatures, the weathergrid summary, forecast descriptions and tides.
+        """
+        report = cls()
+        weathergrid_found = tides_found = False
+        for tag in soup.find_all(True):
+            classes = tag.get('class') or ()
+            if tag.name == 'span' and 'boldWeather' in classes:
+                report.temperatures.append(tag.text)
+            elif tag.name == 'p' and 'description' in classes:
+                report.descriptions.append(tag.text)
+            elif tag.name == 'div' and 'weathergrid' in classes and not weathergrid_found:
+                weathergrid_found = True
+                summary = tag.find('div', class_='borderLeft')
+                report.summary = summary.text.strip() if summary else ""
+            elif tag.name == 'table' and 'tide-mobile' in classes and not tides_found:
+                tides_found = True
+                for row in tag.find_all('tr')[1:]:
+                    cols = row.find_all('td')
+                    report.tides.append(Tide(
+                        direction=cols[0].text.lower().split()[0],
+                        time=parse_time(cols[1].text) if parse_time else cols[1].text.strip(),
+                        height=cols[2].text
+                    ))
+        return report
+
+    @property
+    def high_tides(self) -> list[Tide]:
+        return [t for t in self.tides if t.direction == 'high']
+
+    @property
+    def low_tides(self) -> list[Tide]:
+        return [t for t in self.tides if t.direction == 'low']
+
+    @property
+    def forecast(self) -> str:
+        """
+        Join the morning, afternoon and night descriptions into a single forecast.
+        """
+        reports = self.descriptions
+        if len(reports) == 0:
+            raise ValueError("No weather report found.")
+        if len(reports) == 1: # only night
+            output = reports[0]
+        elif len(reports) == 2: # afternoon and night.
+            output = reports[0] + " Tonight, " + reports[1]
+        elif len(reports) == 3: # morning, afternoon and night.
+            output = reports[0] + " This afternoon, " + reports[1] + ". Tonight, " + reports[2]
+        else:
+            raise ValueError(f"Too many weather reports found, expected 1-3, got {len(reports)}")
+        return replace_force(output)
+
+    def to_radio(self) -> str:
+        """
+        Render the forecast and tides as a line of the radio script.
+        """
+        high_tides = [t.time for t in self.high_tides]
+        low_tides = [t.time for t in self.low_tides]
+        tide_script = f"High tides today at around {', '.join(high_tides)}, with low tides around {', '.join(low_tides)}."
+        return f"{self.forecast} {tide_script}"
+
+    def to_email(self) -> dict:
+        """
+        News email requires weather to be rendered in jinja template:
+            Today's weather: 6°c, few clouds
+            Tide: Low 13:14 (1.7m) High 18:51 (10.3m)
+            Wednesday 12 February 2025
+        Fields missing from a partial report are left blank.
+        """
+        return {
+            'todays_weather': ", ".join(filter(None, [self.temperatures[0] if self.temperatures else "", self.summary])),
+            'tides': (
+                f"Low " +
+                ', '.join([f"{t.time} ({t.height})" for t in self.low_tides]) +
+                ". High " +
+                ', '.join([f"{t.time} ({t.height})" for t in self.high_tides])
+            ) if self.tides else "",
+            'date': self.date.strftime("%A %d %B %Y")
+        }
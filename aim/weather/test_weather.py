@@ -0,0 +1,230 @@
+import asyncio
+import base64
+import os
+import warnings
+from datetime import date, datetime, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from bs4 import BeautifulSoup
+
+from aim.weather.report import Tide, WeatherReport
+from aim.weather.providers import HedgedWeather, MeteoProvider, WeatherProvider, PROVIDER_STATS
+from aim.weather.tides import TideIndex
+from aim.weather.gov_je import GovJeWeather
+from aim.weather.gov_ge import GovGeWeather
+from aim.weather.meteo import FORECAST_CACHE, MAX_CACHED_FORECASTS, MeteoWeather
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def load_fixture(name: str) -> BeautifulSoup:
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return BeautifulSoup(f.read(), "html.parser")
+
+TIDE_ROWS = [
+    {"Date": "01/06/2025", "Time": "13:14", "Height": "1.7m", "Direction": "Low Water"},
+    {"Date": "01/06/2025", "Time": "07:02", "Height": "10.3m", "Direction": "High Water"},
+    {"Date": "02/06/2025", "Time": "07:51", "Height": "10.1m", "Direction": "High Water"},
+]
+
+def test_tide_index_lookup(tmp_path):
+    index = TideIndex(str(tmp_path / "tides.json"))
+    assert index.import_rows("jsy", TIDE_ROWS) == 2
+    index.save()
+
+    index = TideIndex.load(str(tmp_path / "tides.json"))
+    assert index.covers("jsy", date(2025, 6, 1))
+    assert not index.covers("gsy", date(2025, 6, 1))
+    assert index.get_tides("jsy", date(2025, 6, 1)) == [
+        Tide(direction="high", time="7:00am", height="10.3m"),
+        Tide(direction="low", time="1:00pm", height="1.7m"),
+    ]
+    assert index.get_tides("jsy", date(2025, 7, 1)) == []
+
+def test_tide_index_unpadded_times(tmp_path):
+    index = TideIndex(str(tmp_path / "tides.json"))
+    index.import_rows("jsy", [
+        {"date": "01/06/2025", "time": "13:14", "height": "1.7", "direction": "low"},
+        {"date": "01/06/2025", "time": "1:30", "height": "10", "direction": "high"},
+    ])
+    assert index.get_tides("jsy", date(2025, 6, 1)) == [
+        Tide(direction="high", time="1:30am", height="10m"),
+        Tide(direction="low", time="1:00pm", height="1.7m"),
+    ]
+
+def test_weather_prefers_tide_index(tmp_path):
+    index = TideIndex(str(tmp_path / "tides.json"))
+    today = date.today().strftime("%d/%m/%Y")
+    index.import_rows("jsy", [{"date": today, "time": "09:40", "height": "9.8", "direction": "high"}])
+    weather = GovJeWeather(tide_index=index)
+    report = weather.parse_report(load_fixture("gov_je.html"))
+    assert report.tides == [Tide(direction="high", time="9:30am", height="9.8m")]
+
+def test_jersey_report():
+    weather = GovJeWeather(tide_index=TideIndex())
+    soup = load_fixture("gov_je.html")
+    email = weather.to_email(soup)
+    assert email["todays_weather"] == "15°C, Sunny spells"
+    assert email["tides"] == "Low 1:15am (2.1m), 1:00pm (1.7m). High 7:00am (10.3m), 7:15pm (10.6m)"
+    assert weather.to_radio(soup) == (
+        "Bright with sunny spells, wind W Force 4 This afternoon, Cloud increasing later, wind SW Force 5 occasionally Force 6. "
+        "Tonight, Outbreaks of rain, wind SW Force 5 "
+        "High tides today at around 7:00am, 7:15pm, with low tides around 1:15am, 1:00pm."
+    )
+
+def test_guernsey_report():
+    weather = GovGeWeather(tide_index=TideIndex())
+    report = weather.parse_report(load_fixture("gov_ge.html"))
+    assert report.temperatures == ["14°C", "9°C"]
+    assert report.forecast == "Mostly cloudy, wind NW Force 3 Tonight, Clear spells, wind N Force 2"
+    assert [t.time for t in report.high_tides] == ["5:45am", "6:15pm"]
+
+def meteo_app(requests: list) -> web.Application:
+    """Local stand-in for the Meteomatics API, answers any query with two hours of data per coordinate."""
+    async def handler(request: web.Request) -> web.Response:
+        if request.headers.get("Authorization") != "Basic " + base64.b64encode(b"user:password").decode():
+            raise web.HTTPUnauthorized()
+        requests.append(request.path)
+        _, parameters, locations, _ = request.path.strip("/").split("/")
+        values = {"t_2m:C": [12.0, 15.0], "weather_symbol_1h:idx": [103, 3], "wind_speed_10m:ms": [4.0, 6.0],
+                  "wind_dir_10m:d": [225.0, 225.0], "precip_1h:mm": [0.0, 0.4]}
+        def coordinates(parameter: str) -> list[dict]:
+            return [{"lat": float(loc.split(",")[0]), "lon": float(loc.split(",")[1]),
+                     "dates": [{"date": f"2025-06-01T0{i}:00:00Z", "value": v} for i, v in enumerate(values[parameter])]}
+                    for loc in locations.split("+")]
+        return web.json_response({"status": "OK", "data": [
+            {"parameter": p, "coordinates": coordinates(p)} for p in parameters.split(",")
+        ]})
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    return app
+
+@pytest.mark.asyncio
+async def test_meteo_forecast():
+    requests = []
+    server = TestServer(meteo_app(requests))
+    await server.start_server()
+    weather = MeteoWeather("user", "password", base_url=str(server.make_url("/")))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            forecast = await weather.get_forecast()
+        await weather.get_forecast() # served from cache
+    finally:
+        await weather.close()
+        await server.close()
+
+    assert len(requests) == 1
+    assert forecast.times.shape == (2,)
+    assert set(forecast.locations) == {"jsy", "gsy"}
+    assert forecast["gsy"]["t_2m:C"].tolist() == [12.0, 15.0]
+    assert forecast.summary("jsy") == "Partly cloudy, 12-15°C, wind SW 5m/s, 0.4mm rain"
+    assert forecast.nearest(datetime(2025, 6, 1, 0, 20)) == 0
+    assert forecast.nearest(datetime(2025, 6, 1, 2, 40, tzinfo=timezone.utc)) == 1
+
+class FakeProvider(WeatherProvider):
+
+    def __init__(self, name: str, delay: float, fail: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.cancelled = False
+
+    async def get_report(self) -> WeatherReport:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise ValueError("Incomplete weather report")
+        return WeatherReport(temperatures=["15°C"], summary=self.name, descriptions=["Sunny"], tides=[])
+
+@pytest.mark.asyncio
+async def test_hedged_weather_fastest_wins():
+    failing, fast, slow = FakeProvider("failing", 0, fail=True), FakeProvider("fast", 0.01), FakeProvider("slow", 10)
+    report = await HedgedWeather([failing, fast, slow], deadline=5).get_report()
+    assert report.summary == "fast"
+    assert slow.cancelled
+    assert PROVIDER_STATS["fast"].wins == 1 and PROVIDER_STATS["fast"].mean_latency < 1
+    assert PROVIDER_STATS["failing"].failures == 1
+    assert PROVIDER_STATS["slow"].win_rate == 0
+
+@pytest.mark.asyncio
+async def test_hedged_weather_deadline():
+    slow = FakeProvider("deadline", 10)
+    report = await HedgedWeather([slow], deadline=0.05).get_report()
+    assert report == WeatherReport(date=report.date)
+    assert report.to_email()["todays_weather"] == ""
+    assert slow.cancelled
+
+class PartialProvider(WeatherProvider):
+
+    name = "partial"
+
+    async def get_report(self) -> WeatherReport:
+        return self.check_complete(WeatherReport(temperatures=["15°C"], summary="sunny"))
+
+@pytest.mark.asyncio
+async def test_hedged_weather_all_failed_returns_partial():
+    report = await HedgedWeather([FakeProvider("broken", 0, fail=True), PartialProvider()], deadline=5).get_report()
+    assert report.temperatures == ["15°C"] and report.tides == []
+    assert report.to_email()["todays_weather"] == "15°C, sunny"
+
+@pytest.mark.asyncio
+async def test_meteo_provider_skips_request_without_tides():
+    requests = []
+    server = TestServer(meteo_app(requests))
+    await server.start_server()
+    provider = MeteoProvider(MeteoWeather("user", "password", base_url=str(server.make_url("/"))), "jsy", TideIndex())
+    try:
+        with pytest.raises(ValueError):
+            await provider.get_report()
+    finally:
+        await provider.close()
+        await server.close()
+    assert requests == []
+
+@pytest.mark.asyncio
+async def test_meteo_cache_shared_between_clients():
+    requests = []
+    server = TestServer(meteo_app(requests))
+    await server.start_server()
+    clients = [MeteoWeather("user", "password", base_url=str(server.make_url("/"))) for _ in range(2)]
+    try:
+        for client in clients:
+            await client.get_forecast(["jsy"])
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+        await server.close()
+    assert len(requests) == 1
+
+@pytest.mark.asyncio
+async def test_meteo_provider_reports_current_hour(tmp_path):
+    requests = []
+    server = TestServer(meteo_app(requests))
+    await server.start_server()
+    index = TideIndex(str(tmp_path / "tides.json"))
+    index.import_rows("jsy", [{"date": date.today().strftime("%d/%m/%Y"), "time": "09:40", "height": "9.8", "direction": "high"}])
+    provider = MeteoProvider(MeteoWeather("user", "password", base_url=str(server.make_url("/"))), "jsy", index)
+    FORECAST_CACHE.clear()
+    try:
+        report = await provider.get_report()
+    finally:
+        await provider.close()
+        await server.close()
+    # the stand-in's hours are all in the past, so the last one is nearest, not the midnight night symbol
+    assert report.temperatures == ["15°C"]
+    assert report.summary == "partly cloudy"
+
+@pytest.mark.asyncio
+async def test_meteo_cache_bounded():
+    weather = MeteoWeather("user", "password", cache_ttl=60)
+    cache = weather.cache = {"expired": (0.0, None)}
+    for i in range(MAX_CACHED_FORECASTS + 5):
+        weather.cache_forecast(f"url{i}", None)
+    assert "expired" not in cache
+    assert len(cache) == MAX_CACHED_FORECASTS
+    assert next(iter(cache)) == "url5"
+    await weather.close()
@@ -0,0 +1,142 @@
+""" Local index of published tide tables """
+
+import argparse
+import csv
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Iterable, Optional, Union
+
+from aim.weather.report import Tide
+
+logger = logging.getLogger(__name__)
+
+TIDES_INDEX_PATH = os.path.join(os.path.dirname(__file__), "tide_tables", "tides.json")
+LOCATIONS = ("jsy", "gsy")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d %B %Y", "%d %b %Y")
+
+
+def parse_time(time: str) -> str:
+    """
+    Round a HH:MM time down to the nearest 15 minutes and return it as a 12-hour string, e.g. 13:14 -> 1:00pm.
+    """
+    time_object = datetime.strptime(time.strip(), '%H:%M')
+    round_minutes = time_object.minute // 15 * 15
+    rounded_time = time_object.replace(minute=round_minutes)
+    output = rounded_time.strftime("%I:%M%p").lower()
+    if output.startswith('0'):
+        output = output[1:]
+    return output
+
+
+def parse_date(value: str) -> date:
+    """
+    Parse a date from any of the formats used by the published tide tables.
+    """
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised tide table date: {value}")
+
+
+class TideIndex:
+    """
+    Compact index of tide times keyed by location and day.
+
+    Stored as JSON: {"locations": {"jsy": {"2025-06-01": [["low", "01:23", 1.7], ...]}}}
+    Times are stored unrounded so that the lookup can apply the same rounding as the scraped page.
+    """
+
+    def __init__(self, path: str = TIDES_INDEX_PATH):
+        self.path = path
+        self.locations: dict[str, dict[str, list[list]]] = {}
+
+    @classmethod
+    def load(cls, path: str = TIDES_INDEX_PATH) -> "TideIndex":
+        """
+        Load an index from disk, returns an empty index if the file does not exist.
+        """
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                index.locations = json.load(f).get("locations", {})
+            logger.debug(f"Loaded tide index from {path} for {list(index.locations)}")
+        return index
+
+    def save(self) -> None:
+        """
+        Write the index to disk.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({"version": 1, "locations": self.locations}, f, separators=(",", ":"))
+        logger.info(f"Saved tide index to {self.path}")
+
+    def import_rows(self, location: str, rows: Iterable[dict]) -> int:
+        """
+        Import tide table rows with date, time, height and direction columns, replacing any existing days.
+        """
+        if location not in LOCATIONS:
+            raise ValueError(f"Invalid location {location}, must be one of {LOCATIONS}")
+        days: dict[str, list[list]] = {}
+        for row in rows:
+            row = {k.strip().lower(): v for k, v in row.items() if k}
+            day = parse_date(row["date"]).isoformat()
+            direction = row["direction"].lower().split()[0]
+            if direction not in ("high", "low"):
+                raise ValueError(f"Invalid tide direction: {row['direction']}")
+            height = float(row["height"].lower().rstrip("m"))
+            days.setdefault(day, []).append([direction, row["time"].strip(), height])
+        for tides in days.values():
+            tides.sort(key=lambda t: datetime.strptime(t[1], '%H:%M').time()) # unpadded times don't sort as strings
+        self.locations.setdefault(location, {}).update(days)
+        logger.info(f"Imported {sum(len(t) for t in days.values())} tides over {len(days)} days for {location}")
+        return len(days)
+
+    def import_csv(self, location: str, path: str) -> int:
+        """
+        Import a published tide table saved as CSV.
+        """
+        with open(path, newline="") as f:
+            return self.import_rows(location, csv.DictReader(f))
+
+    def covers(self, location: str, day: Optional[Union[date, datetime]] = None) -> bool:
+        """
+        Check whether the index has tides for the given day.
+        """
+        day = day or datetime.now()
+        if isinstance(day, datetime):
+            day = day.date()
+        return day.isoformat() in self.locations.get(location, {})
+
+    def get_tides(self, location: str, day: Optional[Union[date, datetime]] = None) -> list[Tide]:
+        """
+        Get the tides for a day, rounded as they are on the gov.je page.
+        """
+        day = day or datetime.now()
+        if isinstance(day, datetime):
+            day = day.date()
+        tides = self.locations.get(location, {}).get(day.isoformat(), [])
+        return [
+            Tide(direction=direction, time=parse_time(time), height=f"{height:g}m") # 10 -> 10m, as on the page
+            for direction, time, height in tides
+        ]
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Import published tide tables into the local tide index.")
+    parser.add_argument("location", choices=LOCATIONS)
+    parser.add_argument("csv_paths", nargs="+", help="CSV files with date, time, height and direction columns")
+    parser.add_argument("--index", default=TIDES_INDEX_PATH)
+    args = parser.parse_args()
+
+    index = TideIndex.load(args.index)
+    for csv_path in args.csv_paths:
+        index.import_csv(args.location, csv_path)
+    index.save()
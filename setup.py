@@ -15,5 +15,11 @@ setup(
         'tqdm',
         'python-dotenv',
         'openai',
+        'orjson',
+        'pyarrow',
+        'tiktoken',
     ],
+    entry_points={
+        'console_scripts': ['aim=aim.cli:main'],
+    },
 )
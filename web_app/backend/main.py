@@ -1,10 +1,11 @@
 import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
@@ -13,15 +14,48 @@ from pydantic import BaseModel, Field
 
 from aim.news.bailiwick_express_scraper import BEScraper
 from aim.news.jep_scraper import JEPScraper
-from aim.weather.gov_je import GovJeWeather
-from aim.weather.gov_ge import GovGeWeather
-from aim.family_notices import FamilyNotices
+from aim.weather.providers import HedgedWeather
+from aim.family_notices import FamilyNotices, NoticeIndex
 from aim.news.models import NewsStory, FamilyNotice, TopImage, Advert
+from aim.news.responses import StoryJSONResponse
+from aim.news.text import story_summary
+from aim.news.story_cache import STORY_CACHE
+from aim.news.archive import ArchiveWriter
+from aim.news.dedupe import NearDuplicateIndex, dedupe_sections, dedupe_stories
+from aim.news.related import RelatedIndex
+from aim.news.database import get_stories_by_url
 from aim.emailer.base import EmailBuilder
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="BE Email Generator", description="Internal tool for generating BE emails")
+# every story scraped by an endpoint is archived to news.db in the background and added to the duplicate index
+DUPLICATE_INDEX = NearDuplicateIndex.load()
+ARCHIVE = ArchiveWriter(index=DUPLICATE_INDEX)
+RELATED_INDEX = RelatedIndex()
+RELATED_LOCK = asyncio.Lock() # one update or query of the related index at a time
+RELATED_REFRESH_SECONDS = 10 * 60
+
+async def refresh_related_index():
+    """Re-index changed stories and rebuild the related postings off the request path, queries scan newer rows"""
+    while True:
+        try:
+            async with RELATED_LOCK:
+                await asyncio.to_thread(RELATED_INDEX.update_from_db, ARCHIVE.db_path, changed=True)
+            await asyncio.to_thread(RELATED_INDEX.build_postings)
+        except Exception as e:
+            logger.error(f"Related index refresh failed: {e}")
+        await asyncio.sleep(RELATED_REFRESH_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    refresh_task = asyncio.create_task(refresh_related_index())
+    yield
+    refresh_task.cancel()
+    await asyncio.gather(refresh_task, return_exceptions=True)
+    await ARCHIVE.close()
+    DUPLICATE_INDEX.save()
+
+app = FastAPI(title="BE Email Generator", description="Internal tool for generating BE emails", lifespan=lifespan)
 
 # CORS middleware for local development
 app.add_middleware(
@@ -66,6 +100,22 @@ class NewsStoryResponse(BaseModel):
     url: str
     image_url: str
 
+class StorySummaryResponse(BaseModel):
+    id: str
+    order: int
+    headline: str
+    first_sentence: str
+    author: str
+    url: str
+    image_url: Optional[str] = None
+
+class StoryIdsRequest(BaseModel):
+    ids: List[str]
+
+class DuplicateResponse(BaseModel):
+    url: str
+    similarity: float
+
 class FamilyNoticeResponse(BaseModel):
     name: str
     funeral_director: str
@@ -92,6 +142,7 @@ class EmailDataRequest(BaseModel):
     num_podcast: int = Field(default=1, ge=1, le=20)
     deaths_start: str = ""  # ISO date string - optional for JEP/GE
     deaths_end: str = ""    # ISO date string - optional for JEP/GE
+    summary: bool = False  # send story summaries, full text is fetched from /api/stories on demand
 
 class WeatherResponse(BaseModel):
     todays_weather: str = ""
@@ -100,11 +151,11 @@ class WeatherResponse(BaseModel):
 
 class EmailDataResponse(BaseModel):
     email_type: str
-    news_stories: List[NewsStoryResponse]
-    business_stories: List[NewsStoryResponse] = []
-    sports_stories: List[NewsStoryResponse] = []
-    community_stories: List[NewsStoryResponse] = []
-    podcast_stories: List[NewsStoryResponse] = []
+    news_stories: List[NewsStoryResponse | StorySummaryResponse]
+    business_stories: List[NewsStoryResponse | StorySummaryResponse] = []
+    sports_stories: List[NewsStoryResponse | StorySummaryResponse] = []
+    community_stories: List[NewsStoryResponse | StorySummaryResponse] = []
+    podcast_stories: List[NewsStoryResponse | StorySummaryResponse] = []
     weather: WeatherResponse = WeatherResponse()
     family_notices: List[FamilyNoticeResponse] = []
     connect_cover_image: str = ""
@@ -112,6 +163,35 @@ class EmailDataResponse(BaseModel):
     publication: str = ""  # For JEP emails
     date: str = ""  # For JEP emails
 
+# defaults for fields an email type does not fill, stories are serialized by StoryJSONResponse directly
+EMAIL_DATA_DEFAULTS = EmailDataResponse(email_type="", news_stories=[]).model_dump()
+
+STORY_SECTIONS = ["news_stories", "business_stories", "sports_stories", "community_stories", "podcast_stories"]
+DEDUPE_SPARE = 2 # extra stories fetched per section to backfill duplicates dropped by dedupe_sections
+
+def with_spare(n: int) -> int:
+    return n + DEDUPE_SPARE if n else 0
+
+def section_sizes(request) -> dict[str, int]:
+    return {
+        "news_stories": request.num_news,
+        "business_stories": request.num_business,
+        "sports_stories": request.num_sports,
+        "community_stories": request.num_community,
+        "podcast_stories": request.num_podcast,
+    }
+
+def stories_payload(stories: List[NewsStory], summary: bool) -> list:
+    """Cache full stories for /api/stories and return either the stories or their summaries"""
+    STORY_CACHE.put(stories)
+    if summary:
+        return [story_summary(s) for s in stories]
+    return stories
+
+def with_story_text(stories: List[dict]) -> List[dict]:
+    """Summary stories carry first_sentence instead of text, which is all the templates use"""
+    return [s if s.get("text") else {**s, "text": s.get("first_sentence", "")} for s in stories]
+
 class ManualUrlsRequest(BaseModel):
     urls: List[str]
 
@@ -142,111 +222,96 @@ async def read_root():
     with open(html_path, "r") as f:
         return HTMLResponse(content=f.read())
 
-@app.post("/api/fetch-data")
+@app.post("/api/fetch-data", response_model=EmailDataResponse, response_class=StoryJSONResponse)
 async def fetch_email_data(
     request: EmailDataRequest,
     credentials: HTTPBasicCredentials = Depends(verify_credentials)
-) -> EmailDataResponse:
+):
     """Fetch all data for email generation"""
     try:
-        # Convert helper functions
-        def story_to_response(story: NewsStory) -> NewsStoryResponse:
-            return NewsStoryResponse(
-                order=story.order,
-                headline=story.headline,
-                text=story.text,
-                author=story.author,
-                date=story.date.isoformat() if hasattr(story.date, 'isoformat') else str(story.date),
-                url=story.url,
-                image_url=story.image_url
-            )
-
-        def notice_to_response(notice: FamilyNotice) -> FamilyNoticeResponse:
-            return FamilyNoticeResponse(
-                name=notice.name,
-                funeral_director=notice.funeral_director,
-                additional_text=notice.additional_text,
-                url=notice.url
-            )
-        
         # Handle different email types
         if request.email_type == "be":
             # BE Email - Jersey focused
             deaths_start = datetime.fromisoformat(request.deaths_start) if request.deaths_start else None
             deaths_end = datetime.fromisoformat(request.deaths_end) if request.deaths_end else None
             
-            news_scraper = BEScraper()
-            weather_scraper = GovJeWeather()
-            deaths_scraper = FamilyNotices() if deaths_start and deaths_end else None
+            news_scraper = BEScraper(archive=ARCHIVE)
+            weather_scraper = HedgedWeather.jersey()
+            deaths_scraper = FamilyNotices(index=NoticeIndex()) if deaths_start and deaths_end else None
 
             tasks = {
-                "news_stories": news_scraper.get_n_stories_for_region("jsy", request.num_news),
-                "business_stories": news_scraper.get_n_stories_for_region("jsy_business", request.num_business),
-                "sports_stories": news_scraper.get_n_stories_for_region("jsy_sport", request.num_sports),
-                "community_stories": news_scraper.get_n_stories_for_region("jsy_community", request.num_community),
-                "podcast_stories": news_scraper.get_n_stories_for_region("jsy_podcasts", request.num_podcast),
+                "news_stories": news_scraper.get_n_stories_for_region("jsy", with_spare(request.num_news)),
+                "business_stories": news_scraper.get_n_stories_for_region("jsy_business", with_spare(request.num_business)),
+                "sports_stories": news_scraper.get_n_stories_for_region("jsy_sport", with_spare(request.num_sports)),
+                "community_stories": news_scraper.get_n_stories_for_region("jsy_community", with_spare(request.num_community)),
+                "podcast_stories": news_scraper.get_n_stories_for_region("jsy_podcasts", with_spare(request.num_podcast)),
                 "connect_cover_image": news_scraper.get_jsy_connect_cover(),
                 "weather": weather_scraper.get_to_email(),
             }
             
             if deaths_scraper:
-                tasks["family_notices"] = deaths_scraper.get_notices(deaths_start, deaths_end)
+                tasks["family_notices"] = deaths_scraper.get_notices(deaths_start, deaths_end, enrich=True)
             
             values = await asyncio.gather(*tasks.values())
             results = dict(zip(tasks.keys(), values))
+            results.update(dedupe_sections({section: results[section] for section in STORY_SECTIONS}, section_sizes(request)))
             
             # Close scrapers
-            close_tasks = [news_scraper.close()]
+            close_tasks = [news_scraper.close(), weather_scraper.close()]
             if deaths_scraper:
                 close_tasks.append(deaths_scraper.close())
+                deaths_scraper.index.close()
             await asyncio.gather(*close_tasks)
             
-            return EmailDataResponse(
-                email_type="be",
-                news_stories=[story_to_response(s) for s in results["news_stories"]],
-                business_stories=[story_to_response(s) for s in results["business_stories"]],
-                sports_stories=[story_to_response(s) for s in results["sports_stories"]],
-                community_stories=[story_to_response(s) for s in results["community_stories"]],
-                podcast_stories=[story_to_response(s) for s in results["podcast_stories"]],
-                weather=WeatherResponse(**results["weather"]) if results["weather"] else WeatherResponse(),
-                family_notices=[notice_to_response(n) for n in results.get("family_notices", [])],
-                connect_cover_image=results["connect_cover_image"]
-            )
+            return StoryJSONResponse({
+                **EMAIL_DATA_DEFAULTS,
+                "email_type": "be",
+                "news_stories": stories_payload(results["news_stories"], request.summary),
+                "business_stories": stories_payload(results["business_stories"], request.summary),
+                "sports_stories": stories_payload(results["sports_stories"], request.summary),
+                "community_stories": stories_payload(results["community_stories"], request.summary),
+                "podcast_stories": stories_payload(results["podcast_stories"], request.summary),
+                "weather": results["weather"] or WeatherResponse().model_dump(),
+                "family_notices": results.get("family_notices", []),
+                "connect_cover_image": results["connect_cover_image"]
+            })
             
         elif request.email_type == "ge":
             # GE Email - Guernsey focused
-            news_scraper = BEScraper()
-            weather_scraper = GovGeWeather()
+            news_scraper = BEScraper(archive=ARCHIVE)
+            weather_scraper = HedgedWeather.guernsey()
 
             tasks = {
-                "news_stories": news_scraper.get_n_stories_for_region("gsy", request.num_news),
-                "business_stories": news_scraper.get_n_stories_for_region("gsy_business", request.num_business),
-                "sports_stories": news_scraper.get_n_stories_for_region("gsy_sport", request.num_sports),
-                "community_stories": news_scraper.get_n_stories_for_region("gsy_community", request.num_community),
-                "podcast_stories": news_scraper.get_n_stories_for_region("jsy_podcasts", request.num_podcast),
+                "news_stories": news_scraper.get_n_stories_for_region("gsy", with_spare(request.num_news)),
+                "business_stories": news_scraper.get_n_stories_for_region("gsy_business", with_spare(request.num_business)),
+                "sports_stories": news_scraper.get_n_stories_for_region("gsy_sport", with_spare(request.num_sports)),
+                "community_stories": news_scraper.get_n_stories_for_region("gsy_community", with_spare(request.num_community)),
+                "podcast_stories": news_scraper.get_n_stories_for_region("jsy_podcasts", with_spare(request.num_podcast)),
                 "connect_cover_image": news_scraper.get_gsy_connect_cover(),
                 "weather": weather_scraper.get_to_email(),
             }
             
             values = await asyncio.gather(*tasks.values())
             results = dict(zip(tasks.keys(), values))
+            results.update(dedupe_sections({section: results[section] for section in STORY_SECTIONS}, section_sizes(request)))
             
-            await news_scraper.close()
+            await asyncio.gather(news_scraper.close(), weather_scraper.close())
             
-            return EmailDataResponse(
-                email_type="ge",
-                news_stories=[story_to_response(s) for s in results["news_stories"]],
-                business_stories=[story_to_response(s) for s in results["business_stories"]],
-                sports_stories=[story_to_response(s) for s in results["sports_stories"]],
-                community_stories=[story_to_response(s) for s in results["community_stories"]],
-                podcast_stories=[story_to_response(s) for s in results["podcast_stories"]],
-                weather=WeatherResponse(**results["weather"]) if results["weather"] else WeatherResponse(),
-                connect_cover_image=results["connect_cover_image"]
-            )
+            return StoryJSONResponse({
+                **EMAIL_DATA_DEFAULTS,
+                "email_type": "ge",
+                "news_stories": stories_payload(results["news_stories"], request.summary),
+                "business_stories": stories_payload(results["business_stories"], request.summary),
+                "sports_stories": stories_payload(results["sports_stories"], request.summary),
+                "community_stories": stories_payload(results["community_stories"], request.summary),
+                "podcast_stories": stories_payload(results["podcast_stories"], request.summary),
+                "weather": results["weather"] or WeatherResponse().model_dump(),
+                "connect_cover_image": results["connect_cover_image"]
+            })
             
         elif request.email_type == "jep":
             # JEP Email - Different structure
-            news_scraper = JEPScraper()
+            news_scraper = JEPScraper(archive=ARCHIVE)
             
             tasks = {
                 "news_stories": news_scraper.get_n_stories_for_region("jsy_news", request.num_news),
@@ -262,15 +327,16 @@ async def fetch_email_data(
             await news_scraper.close()
             
             # Combine all stories for JEP (they use single news_stories list)
-            all_news = results["news_stories"] + results["business_stories"] + results["sports_stories"]
+            all_news = dedupe_stories(results["news_stories"] + results["business_stories"] + results["sports_stories"])
             
-            return EmailDataResponse(
-                email_type="jep",
-                news_stories=[story_to_response(s) for s in all_news],
-                jep_cover=results["jep_cover"],
-                publication=results["publication"],
-                date=datetime.now().strftime("%A %-d %B %Y")
-            )
+            return StoryJSONResponse({
+                **EMAIL_DATA_DEFAULTS,
+                "email_type": "jep",
+                "news_stories": stories_payload(all_news, request.summary),
+                "jep_cover": results["jep_cover"],
+                "publication": results["publication"],
+                "date": datetime.now().strftime("%A %-d %B %Y")
+            })
         
         else:
             raise HTTPException(status_code=400, detail=f"Invalid email type: {request.email_type}")
@@ -279,36 +345,82 @@ async def fetch_email_data(
         logger.error(f"Error fetching email data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/scrape-urls")
+@app.post("/api/scrape-urls", response_model=List[NewsStoryResponse], response_class=StoryJSONResponse)
 async def scrape_manual_urls(
     request: ManualUrlsRequest,
     credentials: HTTPBasicCredentials = Depends(verify_credentials)
-) -> List[NewsStoryResponse]:
+):
     """Manually scrape a list of URLs"""
     try:
-        scraper = BEScraper()
+        scraper = BEScraper(archive=ARCHIVE)
         stories = await scraper.fetch_and_parse_stories(request.urls)
         await scraper.close()
         
         valid_stories = [s for s in stories if s and not isinstance(s, Exception)]
+        STORY_CACHE.put(valid_stories)
         
-        def story_to_response(story: NewsStory) -> NewsStoryResponse:
-            return NewsStoryResponse(
-                order=story.order,
-                headline=story.headline,
-                text=story.text,
-                author=story.author,
-                date=story.date.isoformat() if hasattr(story.date, 'isoformat') else str(story.date),
-                url=story.url,
-                image_url=story.image_url
-            )
-        
-        return [story_to_response(s) for s in valid_stories]
+        return StoryJSONResponse(valid_stories)
 
     except Exception as e:
         logger.error(f"Error scraping URLs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stories/{story_id}", response_model=NewsStoryResponse, response_class=StoryJSONResponse)
+async def get_story(
+    story_id: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Full story from the story cache"""
+    story = STORY_CACHE.get(story_id)
+    if story is None:
+        raise HTTPException(status_code=404, detail=f"Story {story_id} not in cache")
+    return StoryJSONResponse(story)
+
+@app.post("/api/stories", response_model=List[NewsStoryResponse], response_class=StoryJSONResponse)
+async def get_stories(
+    request: StoryIdsRequest,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Full stories from the story cache, ids not in the cache are skipped"""
+    return StoryJSONResponse(STORY_CACHE.get_many(request.ids))
+
+@app.get("/api/stories/{story_id}/duplicates", response_model=List[DuplicateResponse])
+async def get_story_duplicates(
+    story_id: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Archived stories with near-identical text, e.g. the same press release run by BE and JEP"""
+    story = STORY_CACHE.get(story_id)
+    if story is None:
+        raise HTTPException(status_code=404, detail=f"Story {story_id} not in cache")
+    return [DuplicateResponse(url=url, similarity=similarity) for url, similarity in DUPLICATE_INDEX.query_story(story)]
+
+@app.get("/api/related", response_model=List[NewsStoryResponse], response_class=StoryJSONResponse)
+async def get_related_stories(
+    url: str = "",
+    text: str = "",
+    k: int = Query(default=10, ge=1, le=50),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Archived stories most similar to a story url or free text, for padding email sections"""
+    if not url and not text:
+        raise HTTPException(status_code=400, detail="Provide a url or text")
+
+    def query() -> list[tuple[str, float]]:
+        RELATED_INDEX.update_from_db(ARCHIVE.db_path)
+        return RELATED_INDEX.query_url(url, k) if url else RELATED_INDEX.query_text(text, k)
+
+    # stories scraped moments ago may still be queued for the archive
+    await ARCHIVE.flush()
+    async with RELATED_LOCK:
+        try:
+            matches = await asyncio.to_thread(query)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    stories = await asyncio.to_thread(get_stories_by_url, ARCHIVE.db_path, [match_url for match_url, _ in matches])
+    STORY_CACHE.put(stories)
+    return StoryJSONResponse(stories)
+
 @app.get("/api/test-html")
 async def test_html():
     """Test endpoint that returns simple HTML"""
@@ -365,11 +477,11 @@ async def generate_email(
                 horizontal_adverts: list = None
             
             template_data = BEEmailData(
-                news_stories=request.news_stories,
-                business_stories=request.business_stories,
-                sports_stories=request.sports_stories,
-                community_stories=request.community_stories,
-                podcast_stories=request.podcast_stories,
+                news_stories=with_story_text(request.news_stories),
+                business_stories=with_story_text(request.business_stories),
+                sports_stories=with_story_text(request.sports_stories),
+                community_stories=with_story_text(request.community_stories),
+                podcast_stories=with_story_text(request.podcast_stories),
                 weather=request.weather,
                 family_notices=request.family_notices,
                 connect_cover_image=request.connect_cover_image,
@@ -395,11 +507,11 @@ async def generate_email(
                 horizontal_adverts: list = None
 
             template_data = GEEmailData(
-                news_stories=request.news_stories,
-                business_stories=request.business_stories,
-                sports_stories=request.sports_stories,
-                community_stories=request.community_stories,
-                podcast_stories=request.podcast_stories,
+                news_stories=with_story_text(request.news_stories),
+                business_stories=with_story_text(request.business_stories),
+                sports_stories=with_story_text(request.sports_stories),
+                community_stories=with_story_text(request.community_stories),
+                podcast_stories=with_story_text(request.podcast_stories),
                 weather=request.weather,
                 connect_cover_image=request.connect_cover_image,
                 top_image=request.top_image,
@@ -419,7 +531,7 @@ async def generate_email(
                 date: str
 
             template_data = JEPEmailData(
-                news_stories=request.news_stories,
+                news_stories=with_story_text(request.news_stories),
                 adverts=request.adverts,
                 jep_cover=request.jep_cover,
                 publication=request.publication,
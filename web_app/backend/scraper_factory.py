@@ -8,9 +8,9 @@ import logging
 
 from aim.news.bailiwick_express_scraper import BEScraper
 from aim.news.jep_scraper import JEPScraper
-from aim.weather.gov_je import GovJeWeather
-from aim.weather.gov_ge import GovGeWeather
-from aim.family_notices import FamilyNotices
+from aim.weather.providers import HedgedWeather
+from aim.family_notices import FamilyNotices, NoticeIndex
+from aim.news.archive import ArchiveWriter
 
 # Handle both relative and absolute imports
 try:
@@ -30,19 +30,19 @@ class ScraperFactory:
     }
     
     WEATHER_SCRAPERS = {
-        "GovJeWeather": GovJeWeather,
-        "GovGeWeather": GovGeWeather
+        "GovJeWeather": HedgedWeather.jersey,
+        "GovGeWeather": HedgedWeather.guernsey
     }
     
     @classmethod
-    async def create_scrapers_for_config(cls, config: EmailTypeConfig) -> Dict[str, Any]:
-        """Create all required scrapers for an email configuration"""
+    async def create_scrapers_for_config(cls, config: EmailTypeConfig, archive: Optional[ArchiveWriter] = None) -> Dict[str, Any]:
+        """Create all required scrapers for an email configuration, scraped stories are pushed to archive if given"""
         scrapers = {}
         
         # Create news scraper
         news_scraper_class = cls.NEWS_SCRAPERS.get(config.scraper_config.news_scraper)
         if news_scraper_class:
-            scrapers["news"] = news_scraper_class()
+            scrapers["news"] = news_scraper_class(archive=archive)
         else:
             raise ValueError(f"Unknown news scraper: {config.scraper_config.news_scraper}")
         
@@ -56,7 +56,7 @@ class ScraperFactory:
         
         # Create deaths scraper if needed (BE only currently)
         if config.scraper_config.deaths_scraper == "FamilyNoticesScraper":
-            scrapers["deaths"] = FamilyNotices()
+            scrapers["deaths"] = FamilyNotices(index=NoticeIndex())
         
         return scrapers
     
@@ -70,14 +70,18 @@ class ScraperFactory:
         
         if close_tasks:
             await asyncio.gather(*close_tasks)
+        # the deaths scraper's notice index holds a SQLite connection opened per build
+        deaths_scraper = scrapers.get("deaths")
+        if deaths_scraper is not None and deaths_scraper.index is not None:
+            deaths_scraper.index.close()
 
 class EmailDataBuilder:
     """Builds email data using configuration-driven approach"""
     
     @classmethod
-    async def build_email_data(cls, config: EmailTypeConfig, request) -> Dict[str, Any]:
+    async def build_email_data(cls, config: EmailTypeConfig, request, archive: Optional[ArchiveWriter] = None) -> Dict[str, Any]:
         """Build email data based on configuration and request"""
-        scrapers = await ScraperFactory.create_scrapers_for_config(config)
+        scrapers = await ScraperFactory.create_scrapers_for_config(config, archive)
         
         try:
             # Build tasks based on configuration
@@ -99,7 +103,7 @@ class EmailDataBuilder:
                 from datetime import datetime
                 start_date = datetime.fromisoformat(request.deaths_start) if request.deaths_start else None
                 end_date = datetime.fromisoformat(request.deaths_end) if request.deaths_end else None
-                tasks["family_notices"] = scrapers["deaths"].get_notices(start_date, end_date)
+                tasks["family_notices"] = scrapers["deaths"].get_notices(start_date, end_date, enrich=True)
             
             # Add extra fields from configuration
             for field_name, value in config.scraper_config.extra_fields.items():
@@ -300,7 +300,8 @@ async function fetchData() {
             num_community: parseInt(document.getElementById('numCommunity').value),
             num_podcast: parseInt(document.getElementById('numPodcast').value),
             deaths_start: document.getElementById('deathsStart').value || '',
-            deaths_end: document.getElementById('deathsEnd').value || ''
+            deaths_end: document.getElementById('deathsEnd').value || '',
+            summary: true  // full story text is loaded when a story is edited
         };
         
         const response = await apiCall('/fetch-data', 'POST', requestData);
@@ -427,8 +428,27 @@ function updateStoryOrder(storyType, index, newOrder) {
     updatePreview();
 }
 
-function editStory(storyType, index) {
+// Summary stories only carry first_sentence, load the full story from the cache or rescrape it
+async function loadStoryText(storyType, index) {
     const story = emailData[storyType][index];
+    if (story.text !== undefined) {
+        return story;
+    }
+    // the batch endpoint skips ids that have been evicted rather than returning 404
+    const cached = await apiCall('/stories', 'POST', { ids: [story.id] });
+    let full = cached && cached[0];
+    if (!full) {
+        console.log('Story not in cache, rescraping:', story.url);
+        const scraped = await apiCall('/scrape-urls', 'POST', { urls: [story.url] });
+        full = scraped && scraped[0];
+    }
+    // keep any edits already made to the summary
+    emailData[storyType][index] = { ...story, text: full ? full.text : story.first_sentence };
+    return emailData[storyType][index];
+}
+
+async function editStory(storyType, index) {
+    const story = await loadStoryText(storyType, index);
     
     // Populate the edit modal
     document.getElementById('editOrder').value = story.order;